@@ -0,0 +1,110 @@
+"""
+重複車位 benchmark：歷史期數增加時，比較載入本期各表後以 pandas duplicated 找重複車位，
+與查詢觸發程序維護的車位佔用（conflicts）的耗時，以及寫入時檢查（guard）增加的成本。
+
+    python benchmarks/bench_conflicts.py [員工數] [最多期數]
+
+同時檢查兩種做法找到的重複車位相同，以及造成重複的寫入（含沒有姓名代號的公務車）會被回滾。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.conflicts import SpaceConflict, conflicts, guard
+from parking_common.migrations import migrate
+from parking_common.repository import Repository
+from synthetic_db import build, quarters
+
+# 舊做法：本期各表持有的車位
+HOLDERS = """
+    SELECT 車位編號, 姓名代號 FROM 抽籤繳費 WHERE 期別 = ?1
+    UNION SELECT 車位編號, 姓名代號 FROM 免申請 WHERE 期別 = ?1 OR 期別 IS NULL
+    UNION SELECT 車位編號, 姓名代號 FROM 免申請繳費 WHERE 期別 = ?1
+    UNION SELECT 車位編號, 姓名代號 FROM 繳費紀錄 WHERE 期別 = ?1
+    """
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def scan(repository, period):
+    df = repository.query_df(HOLDERS, (period,))
+    df = df[df['車位編號'].fillna('') != '']
+    df = df[df.duplicated(subset='車位編號', keep=False)].sort_values(['車位編號', '姓名代號'])
+    return {space: list(group['姓名代號']) for space, group in df.groupby('車位編號')}
+
+
+def update(repository, period, rows):
+    repository.executemany("UPDATE 抽籤繳費 SET 車位編號 = ? WHERE 期別 = ? AND 姓名代號 = ?",
+                           [(space, period, employee_id) for employee_id, space in rows])
+
+
+def main(employees=2000, max_periods=48):
+    periods = 4
+    with tempfile.TemporaryDirectory() as tmp:
+        while periods <= max_periods:
+            path = os.path.join(tmp, f'{periods}.db')
+            conn, _ = build(path, employees=employees, periods=periods)
+            conn.isolation_level = None
+            migrate(conn)
+            conn.close()
+
+            repository = Repository(path, cache_entries=0)
+            current = quarters(1)[0]
+            scan_time, expected = timed(lambda: scan(repository, current))
+            index_time, found = timed(lambda: conflicts(repository, current))
+            assert found == expected, (found, expected)
+
+            rows = [(employee_id, f'N{i:03d}') for i, (employee_id,) in enumerate(repository.query(
+                "SELECT 姓名代號 FROM 抽籤繳費 WHERE 期別 = ? LIMIT 50", (current,)))]
+
+            def plain():
+                with repository.transaction():
+                    update(repository, current, rows)
+
+            def guarded():
+                with repository.transaction():
+                    with guard(repository, current):
+                        update(repository, current, rows)
+
+            plain_time, _ = timed(plain)
+            guarded_time, _ = timed(guarded)
+            print(f"{periods:3d} 期  重複車位 {len(found):3d} 個：pandas {scan_time * 1000:6.1f} ms，"
+                  f"車位佔用 {index_time * 1000:5.1f} ms；寫入 50 筆 {plain_time * 1000:5.1f} ms，"
+                  f"含檢查 {guarded_time * 1000:5.1f} ms")
+
+            try:
+                with repository.transaction():
+                    with guard(repository, current):
+                        update(repository, current, [(employee_id, 'N000') for employee_id, _ in rows[:2]])
+            except SpaceConflict:
+                pass
+            else:
+                raise AssertionError("重複分配未被阻擋")
+            assert conflicts(repository, current) == found
+
+            # 沒有姓名代號的資料（公務車）與員工持有同一車位也算重複
+            try:
+                with repository.transaction():
+                    with guard(repository, current):
+                        repository.execute("INSERT INTO 免申請 (期別, 姓名, 車牌號碼, 車位編號) VALUES (?, '公務車', 'OFFICIAL-1', ?)",
+                                           (current, rows[0][1]))
+            except SpaceConflict:
+                pass
+            else:
+                raise AssertionError("公務車與員工重複分配未被阻擋")
+            periods *= 2
+    print("車位佔用找到的重複車位與 pandas 相同，造成重複的寫入已回滾")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 48)
@@ -0,0 +1,38 @@
+"""
+資格判斷 micro-benchmark：以合成資料庫跑數千位申請人。
+
+    python benchmarks/bench_eligibility.py [申請人數]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.eligibility import evaluate
+from parking_common.migrations import migrate
+from synthetic_db import build, quarters
+
+
+def main(applicants=5000):
+    conn, staff = build(employees=applicants)
+    migrate(conn)
+    cursor = conn.cursor()
+    previous2, previous1, current = quarters(3, last='11402')
+    rng = random.Random(1)
+
+    routes = Counter()
+    start = time.perf_counter()
+    for employee_id, name, unit, car in staff:
+        decision = evaluate(cursor, employee_id, car, rng.choice(['一般', '一般', '孕婦', '身心障礙']),
+                            current, previous1, previous2)
+        routes[decision.route] += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(staff)} 位申請人，共 {elapsed:.3f} 秒，平均 {elapsed / len(staff) * 1e6:.0f} µs/人")
+    print(dict(routes))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
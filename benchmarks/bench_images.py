@@ -0,0 +1,77 @@
+"""
+附件圖片前處理 benchmark：以合成的手機照片比較處理前後的大小與耗時。
+
+    python benchmarks/bench_images.py [張數] [圖片資料夾]
+
+未指定資料夾時產生 4000x3000、帶 EXIF（含方向）的合成照片；
+指定資料夾時使用其中的 jpg/jpeg/png。
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.images import ImageSettings, prepare
+from parking_common.uploads import UploadJob
+
+
+def synthetic_photo(seed, size=(4000, 3000)):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    # 漸層 + 雜訊，壓縮難度接近實拍照片
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 25, base.shape), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    exif = Image.Exif()
+    exif[0x0112] = 6                # 方向：需旋轉 90 度
+    exif[0x010F] = 'PhoneMaker'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def load_jobs(count, folder=None):
+    if folder:
+        names = sorted(name for name in os.listdir(folder) if name.lower().endswith(('.jpg', '.jpeg', '.png')))[:count]
+        return [UploadJob(name, open(os.path.join(folder, name), 'rb').read(),
+                          'image/png' if name.lower().endswith('.png') else 'image/jpeg') for name in names]
+    return [UploadJob(f"秘書處_王小明_{i}.jpg", synthetic_photo(i), 'image/jpeg') for i in range(1, count + 1)]
+
+
+def main(count=4, folder=None):
+    jobs = load_jobs(count, folder)
+    before = sum(job.size for job in jobs)
+    print(f"{len(jobs)} 張原始照片，共 {before / 1024 / 1024:.1f} MB")
+
+    for settings in [ImageSettings(workers=1), ImageSettings(), ImageSettings(max_side=1600, quality=70),
+                     ImageSettings(combine_pdf=True)]:
+        start = time.perf_counter()
+        prepared = prepare(jobs, settings, pdf_name='秘書處_王小明.pdf')
+        elapsed = time.perf_counter() - start
+        after = sum(job.size for job in prepared)
+        print(f"max_side={settings.max_side} quality={settings.quality} workers={settings.workers} "
+              f"combine_pdf={settings.combine_pdf}: {elapsed:.2f} 秒，{len(prepared)} 個檔案 "
+              f"{after / 1024 / 1024:.2f} MB（{after / before:.0%}）")
+
+    image = Image.open(io.BytesIO(prepare(jobs[:1])[0].data))
+    assert not image.getexif(), "EXIF 未移除"
+    assert max(image.size) <= ImageSettings().max_side
+    assert image.size[1] > image.size[0], "未依 EXIF 方向轉正"
+    print("EXIF 已移除、尺寸與方向正確")
+
+    # 損毀或副檔名與內容不符的圖片原樣保留，不影響其他檔案
+    broken = [UploadJob('a.png', b'not an image', 'image/png'), UploadJob('b.jpg', jobs[0].data[:1000], 'image/jpeg')]
+    for settings in [ImageSettings(), ImageSettings(combine_pdf=True)]:
+        prepared = prepare(broken + jobs[:2], settings, pdf_name='秘書處_王小明.pdf')
+        assert all(job in prepared for job in broken), "無法解碼的圖片未原樣保留"
+    print("無法解碼的圖片原樣保留")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,101 @@
+"""
+免申請批次匯入 benchmark：產生 N 列的 CSV／XLSX，量測逐段檢查後在一個交易內寫入的耗時，
+並與舊做法（每列各自 INSERT 並提交）比較。
+
+    python benchmarks/bench_import.py [列數]
+
+XLSX 需要 openpyxl；未安裝時只量測 CSV。
+"""
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.imports import COLUMNS, INSERT_NO_APPLICATION, read_rows, validate
+from parking_common.migrations import migrate
+from parking_common.repository import Repository
+from synthetic_db import build, quarters
+
+IDENTITIES = ["公務車", "公務車(電動)", "值班", "高階主管", "獨董", "公務保留", "孕婦", "一般(轉讓)", "專案"]
+
+
+def sample_rows(count, spaces):
+    for i in range(count):
+        yield ['', f'7{i:05d}', f'匯入{i}', '總處', f'IMP-{i:04d}', '02-1234', IDENTITIES[i % len(IDENTITIES)],
+               spaces[i] if i < len(spaces) else '']
+
+
+def to_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+    return out.getvalue().encode('utf-8-sig')
+
+
+def to_xlsx(rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def bulk(path, data, filename, period):
+    repository = Repository(path, cache_entries=0)
+    start = time.perf_counter()
+    with repository.transaction():
+        report = validate(repository, read_rows(io.BytesIO(data), filename), IDENTITIES, period)
+        repository.executemany(INSERT_NO_APPLICATION, report.rows)
+    return time.perf_counter() - start, report
+
+
+def row_by_row(path, rows):
+    repository = Repository(path, cache_entries=0)
+    start = time.perf_counter()
+    for row in rows:
+        repository.execute(INSERT_NO_APPLICATION, [value or None for value in row])
+    return time.perf_counter() - start
+
+
+def main(count=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'base.db')
+        conn, _ = build(base, employees=2000, periods=12)
+        conn.isolation_level = None
+        migrate(conn)
+        spaces = [space for (space,) in conn.execute(
+            "SELECT 車位編號 FROM 停車位 WHERE 車位編號 NOT IN (SELECT 車位編號 FROM 車位佔用)")]
+        conn.close()
+        rows = list(sample_rows(count, spaces))
+        period = quarters(1)[0]
+
+        formats = [('CSV', 'import.csv', to_csv)]
+        try:
+            import openpyxl
+            formats.append(('XLSX', 'import.xlsx', to_xlsx))
+        except ImportError:
+            print("未安裝 openpyxl，略過 XLSX")
+        for label, filename, convert in formats:
+            path = os.path.join(tmp, filename + '.db')
+            shutil.copy(base, path)
+            elapsed, report = bulk(path, convert(rows), filename, period)
+            assert len(report.rows) == count and not report.errors, report.errors[:5]
+            print(f"{label:4s} {count} 列：檢查並寫入 {elapsed * 1000:7.1f} ms（一個交易）")
+
+        path = os.path.join(tmp, 'rows.db')
+        shutil.copy(base, path)
+        print(f"逐列 INSERT 並提交 {count} 列：{row_by_row(path, rows) * 1000:7.1f} ms（不含每列上傳）")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,59 @@
+"""
+抽籤引擎 benchmark：比較各抽籤方式的速度與公平性。
+
+    python benchmarks/bench_lottery.py [申請人數] [車位數] [重複次數]
+
+公平性指標：
+- 各單位中籤率與申請人數比例的差距
+- 依連續未中籤期數分組的中籤率
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.lottery import STRATEGIES, draw
+
+UNITS = ['秘書處', '公眾服務處', '資訊處', '財務處', '法務室']
+
+
+def synthetic_participants(count, seed=0):
+    rng = np.random.default_rng(seed)
+    units = rng.choice(UNITS, size=count, p=[0.4, 0.3, 0.15, 0.1, 0.05])
+    participants = [(str(unit), f"員工{i}", str(100000 + i)) for i, unit in enumerate(units)]
+    losses = np.minimum(rng.geometric(0.5, size=count) - 1, 6)
+    return participants, losses
+
+
+def main(applicants=20000, spaces=2000, rounds=20):
+    participants, losses = synthetic_participants(applicants)
+    space_ids = [f"B{i:05d}" for i in range(spaces)]
+    index = {participant[2]: i for i, participant in enumerate(participants)}
+    units = np.array([participant[0] for participant in participants])
+    unit_share = {unit: np.mean(units == unit) for unit in UNITS}
+
+    print(f"{applicants} 位申請人、{spaces} 個車位，各方式抽 {rounds} 次")
+    for strategy in STRATEGIES:
+        wins = np.zeros(applicants)
+        start = time.perf_counter()
+        for seed in range(rounds):
+            lottery = draw(participants, space_ids, strategy=strategy, seed=seed, losses=losses)
+            wins[[index[participant[2]] for _, participant in lottery.results]] += 1
+        elapsed = time.perf_counter() - start
+
+        print(f"\n[{strategy}] {elapsed / rounds * 1000:.1f} ms/次，{applicants * rounds / elapsed:,.0f} 人/秒")
+        won = wins.sum()
+        for unit in UNITS:
+            share = wins[units == unit].sum() / won
+            print(f"  {unit}: 中籤占比 {share:.3f}（申請占比 {unit_share[unit]:.3f}）")
+        for k in range(int(losses.max()) + 1):
+            mask = losses == k
+            if mask.any():
+                print(f"  連續未中籤 {k} 期: 中籤率 {wins[mask].mean() / rounds:.3f}（{mask.sum()} 人）")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:4]]
+    main(*args)
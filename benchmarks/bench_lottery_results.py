@@ -0,0 +1,104 @@
+"""
+抽籤結果寫入 benchmark 與正確性檢查：以 1 萬名申請人抽籤後整批寫入。
+
+    python benchmarks/bench_lottery_results.py [申請人數] [車位數]
+
+檢查項目：
+- 寫入筆數等於參與人數，中籤者對應車位、其餘為備取
+- 同一期重複寫入會被拒絕，指定 replace 後結果被取代而不重複
+- 已有人繳費時拒絕取代
+"""
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.lottery import LotteryAlreadyDrawn, draw, result_rows, write_results
+from parking_common.migrations import migrate
+from synthetic_db import SCHEMA
+
+
+def per_row_insert(conn, current, lottery):
+    # 改寫前的作法：每位參與者一次 execute
+    cursor = conn.cursor()
+    for period, employee_id, space in result_rows(current, lottery):
+        cursor.execute("INSERT INTO 抽籤繳費 (期別, 姓名代號, 車位編號, 繳費狀態) VALUES (?, ?, ?, '未繳費')",
+                       (period, employee_id, space))
+    conn.commit()
+
+
+def count_rows(conn, current):
+    return conn.execute("SELECT COUNT(*) FROM 抽籤繳費 WHERE 期別 = ?", (current,)).fetchone()[0]
+
+
+def main(applicants=10000, spaces=800):
+    path = '/tmp/bench_lottery_results.db'
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    migrate(conn)
+
+    current = '11402'
+    participants = [('秘書處', f"員工{i}", str(100000 + i)) for i in range(applicants)]
+    space_ids = [f"B{i:04d}" for i in range(spaces)]
+    lottery = draw(participants, space_ids, seed=1)
+
+    start = time.perf_counter()
+    per_row_insert(conn, '00000', lottery)
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    written = write_results(conn, current, lottery, '2025-01-01T00:00:00')
+    bulk = time.perf_counter() - start
+    print(f"{applicants} 筆：逐筆寫入 {per_row * 1000:.1f} ms，整批寫入 {bulk * 1000:.1f} ms")
+
+    assert written == applicants == count_rows(conn, current)
+    assert conn.execute("SELECT COUNT(*) FROM 抽籤繳費 WHERE 期別 = ? AND 車位編號 LIKE '備取%'",
+                        (current,)).fetchone()[0] == applicants - spaces
+
+    try:
+        write_results(conn, current, lottery, '2025-01-01T00:01:00')
+        raise AssertionError("重複寫入未被拒絕")
+    except LotteryAlreadyDrawn:
+        pass
+    assert count_rows(conn, current) == applicants
+
+    again = draw(participants, space_ids, seed=2)
+    write_results(conn, current, again, '2025-01-01T00:02:00', replace=True)
+    assert count_rows(conn, current) == applicants
+    winner = again.results[0]
+    assert conn.execute("SELECT 車位編號 FROM 抽籤繳費 WHERE 期別 = ? AND 姓名代號 = ?",
+                        (current, winner[1][2])).fetchone()[0] == winner[0]
+
+    conn.execute("UPDATE 抽籤繳費 SET 繳費狀態 = '已繳費' WHERE 期別 = ? AND 姓名代號 = ?", (current, winner[1][2]))
+    conn.commit()
+    try:
+        write_results(conn, current, lottery, '2025-01-01T00:03:00', replace=True)
+        raise AssertionError("已繳費後仍可取代")
+    except LotteryAlreadyDrawn:
+        pass
+    assert count_rows(conn, current) == applicants
+    assert conn.execute("SELECT COUNT(*) FROM 抽籤紀錄 WHERE 期別 = ?", (current,)).fetchone()[0] == 2
+
+    # 抽籤紀錄建立前抽的期別（只有抽籤繳費）也視為已抽籤
+    try:
+        write_results(conn, '00000', lottery, '2025-01-01T00:04:00')
+        raise AssertionError("未建立抽籤紀錄的期別被重複寫入")
+    except LotteryAlreadyDrawn:
+        pass
+    assert count_rows(conn, '00000') == applicants
+
+    # 不參加抽籤的人（保障、孕婦、身障）已由審核頁面分配車位，不影響本期抽籤
+    conn.execute("INSERT INTO 抽籤繳費 (期別, 姓名代號, 車位編號, 繳費狀態) VALUES ('11403', '保障01', 'B0000', '未繳費')")
+    conn.commit()
+    write_results(conn, '11403', lottery, '2025-01-01T00:05:00')
+    assert count_rows(conn, '11403') == applicants + 1
+    print("正確性檢查通過")
+    conn.close()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
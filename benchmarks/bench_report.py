@@ -0,0 +1,58 @@
+"""
+PDF 報表 benchmark：產生 5,000 列的停車名冊。
+
+    python benchmarks/bench_report.py [列數] [字型檔路徑]
+
+未指定字型檔時使用 reportlab 內建的 MSung-Light，不需解析 TTF。
+"""
+import os
+import sys
+import time
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.report import register_font, styles, table_pdf
+
+TITLE = "總管理處114年第2期地下停車場員工停車名冊"
+NOTE = "備註：本處<font color='red'>審核申請</font>時會扣除前期停過人員名單。"
+
+
+def roster(count):
+    units = ['秘書處', '公眾服務處', '資訊處', '財務處']
+    return [[units[i % len(units)], f"陳○明{i}", f"B{i:04d}"] for i in range(count)]
+
+
+def legacy_pdf(rows, font_name):
+    # 改寫前的作法：每格都包成 Paragraph，整張表用 Table
+    style = styles(font_name)['cell']
+    data = [[Paragraph(str(cell), style) for cell in ['單位', '姓名', '車位編號']]]
+    data += [[Paragraph(str(cell), style) for cell in row] for row in rows]
+    table = Table(data)
+    table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 1, colors.black)]))
+    SimpleDocTemplate(__import__('io').BytesIO(), pagesize=letter).build([table])
+
+
+def main(count=5000, font_path=None):
+    rows = roster(count)
+
+    start = time.perf_counter()
+    font_name = register_font(font_path)
+    print(f"字型註冊（每個行程一次）：{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        pdf = table_pdf(TITLE, ['單位', '姓名', '車位編號'], rows, NOTE, font_path)
+        timings.append(time.perf_counter() - start)
+    print(f"{count} 列：{min(timings) * 1000:.0f} ms（{len(pdf.getvalue()) / 1024:.0f} KB）")
+
+    start = time.perf_counter()
+    legacy_pdf(rows, font_name)
+    print(f"逐格 Paragraph + Table：{(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, sys.argv[2] if len(sys.argv) > 2 else None)
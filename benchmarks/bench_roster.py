@@ -0,0 +1,63 @@
+"""
+地下停車一覽表 benchmark：歷史期數增加時，比較每次即時計算一覽表（三段 UNION 再排序），
+與讀取實體化的停車一覽第一頁的耗時，以及資料異動後重算一期的成本。
+
+    python benchmarks/bench_roster.py [員工數] [最多期數]
+
+同時以 roster.check 檢查實體化資料與即時查詢一致。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common import roster
+from parking_common.migrations import migrate
+from parking_common.repository import Repository
+from parking_common.views import OVERVIEW_VIEW
+from synthetic_db import build, quarters
+
+LIVE = f"SELECT * FROM ({roster.ROSTER_QUERY}) ORDER BY {', '.join(roster.KEY)}"
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(employees=2000, max_periods=48):
+    periods = 4
+    with tempfile.TemporaryDirectory() as tmp:
+        while periods <= max_periods:
+            path = os.path.join(tmp, f'{periods}.db')
+            conn, _ = build(path, employees=employees, periods=periods)
+            conn.isolation_level = None
+            migrate(conn)
+            conn.close()
+
+            repository = Repository(path, cache_entries=0)
+            current = quarters(1)[0]
+
+            def refresh():
+                with repository.transaction():
+                    roster.refresh(repository, current)
+
+            refresh_time, _ = timed(refresh)
+            live_time, live = timed(lambda: repository.query_df(LIVE, (current,)))
+            page_time, page = timed(lambda: OVERVIEW_VIEW.page(repository, (current,)))
+            assert roster.check(repository, current) == {'缺少': 0, '多出': 0}
+            assert len(OVERVIEW_VIEW.all(repository, (current,))) == len(live)
+            print(f"{periods:3d} 期  即時計算 {live_time * 1000:6.1f} ms / {len(live)} 筆，"
+                  f"停車一覽第一頁 {page_time * 1000:5.1f} ms / {len(page.df)} 筆，重算一期 {refresh_time * 1000:6.1f} ms")
+            periods *= 2
+    print("停車一覽與即時查詢一致")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 48)
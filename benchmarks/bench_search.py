@@ -0,0 +1,81 @@
+"""
+快速查詢 benchmark：歷史期數增加時，比較整表載入後以 pandas 比對姓名/員工編號/車牌，
+與 trigram 全文檢索索引（lookup）的耗時。
+
+    python benchmarks/bench_search.py [員工數] [最多期數]
+
+同時檢查索引查詢的結果與逐列比對相同，以及新增、修改、刪除後索引隨觸發程序同步。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.migrations import migrate
+from parking_common.repository import Repository
+from parking_common.search import SEARCH_TABLES, lookup
+from synthetic_db import build
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def scan(repository, text):
+    """舊做法：整表載入後以 pandas 比對。"""
+    results = {}
+    for table in SEARCH_TABLES:
+        df = repository.query_df(f"SELECT * FROM {table}")
+        mask = False
+        for column in ('姓名', '姓名代號', '車牌號碼'):
+            if column in df.columns:
+                mask = mask | df[column].fillna('').str.lower().str.contains(text.lower(), regex=False)
+        if mask.any():
+            results[table] = df[mask]
+    return results
+
+
+def counts(results):
+    return {table: len(df) for table, df in results.items()}
+
+
+def main(employees=2000, max_periods=48):
+    periods = 4
+    with tempfile.TemporaryDirectory() as tmp:
+        while periods <= max_periods:
+            path = os.path.join(tmp, f'{periods}.db')
+            conn, _ = build(path, employees=employees, periods=periods)
+            conn.isolation_level = None
+            migrate(conn)
+            # 同一筆資料重複查詢會命中結果快取，這裡關閉快取量測實際查詢
+            repository = Repository(path, cache_entries=0)
+            name, plate = conn.execute("SELECT 姓名, 車牌號碼 FROM 申請紀錄 LIMIT 1").fetchone()
+
+            for label, text in [('姓名', name), ('兩字姓名', name[:2]), ('車牌片段', plate[1:])]:
+                scan_time, expected = timed(lambda: scan(repository, text), repeat=3)
+                lookup_time, found = timed(lambda: lookup(repository, text, limit=10 ** 6))
+                assert counts(found) == counts(expected), (text, counts(found), counts(expected))
+                print(f"{periods:3d} 期  {label:6s}：整表比對 {scan_time * 1000:7.1f} ms，"
+                      f"索引查詢 {lookup_time * 1000:6.1f} ms，{counts(found)}")
+
+            conn.execute("INSERT INTO 免申請 (姓名代號, 姓名, 車牌號碼) VALUES ('T00001', '測試人員', 'TST-0001')")
+            assert counts(lookup(repository, 'TST-0001')) == {'免申請': 1}
+            conn.execute("UPDATE 免申請 SET 車牌號碼 = 'TST-0002' WHERE 姓名代號 = 'T00001'")
+            assert counts(lookup(repository, 'TST-0001')) == {}
+            assert counts(lookup(repository, 'TST-0002')) == {'免申請': 1}
+            conn.execute("DELETE FROM 免申請 WHERE 姓名代號 = 'T00001'")
+            assert counts(lookup(repository, '測試人員')) == {}
+            conn.close()
+            periods *= 2
+    print("索引查詢結果與整表比對一致，新增、修改、刪除後索引已同步")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 48)
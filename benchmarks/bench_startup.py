@@ -0,0 +1,144 @@
+"""
+啟動時間 benchmark：每個應用程式在全新的 Python 行程中以 streamlit.testing 執行一次，
+量測「開始 import 到第一次畫面完成」的時間，並列出第一次畫面後已載入的重量級套件。
+
+    python benchmarks/bench_startup.py [次數]
+
+Drive 以本機的假 service 取代（事先登記到 parking_common.services），資料庫為合成資料；
+各應用程式會把資料庫下載到 /tmp/test.db。
+最後另外量測 pandas、reportlab、googleapiclient 單獨 import 的時間，即延後載入省下的時間。
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ['parking_application/parking_application.py', 'parking_lottery/parking_lottery.py',
+        'parking_review/parking_review.py']
+HEAVY = ['pandas', 'reportlab', 'googleapiclient', 'google.oauth2']
+
+
+class Response(dict):
+    """對應 httplib2.Response：dict 形式的標頭加上 status。"""
+
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class MediaHttp:
+    """回應 MediaIoBaseDownload 的 Range 請求。"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        start, end = (int(value) for value in headers['range'].split('=')[1].split('-'))
+        content = self.data[start:end + 1]
+        return Response(206, {'content-range': f"bytes {start}-{start + len(content) - 1}/{len(self.data)}"}), content
+
+
+class Request:
+    def __init__(self, response, http=None):
+        self.response = response
+        self.http = http
+        self.uri = 'fake://media'
+        self.headers = {}
+
+    def execute(self):
+        return self.response
+
+
+class SnapshotFiles:
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, fileId=None, fields=None):
+        return Request({'headRevisionId': 'r1'})
+
+    def get_media(self, fileId=None):
+        return Request(None, MediaHttp(self.data))
+
+    def list(self, **kwargs):
+        return Request({'files': [{'id': 'folder', 'name': 'folder'}]})
+
+
+class SnapshotDrive:
+    """只讀的假 Drive：資料庫檔案固定為 data，資料夾查詢一律回傳同一個 ID。"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def files(self):
+        return SnapshotFiles(self.data)
+
+
+def child(app, db_path):
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    from parking_common import services
+
+    with open(db_path, 'rb') as f:
+        services.register('drive', SnapshotDrive(f.read()))
+    ready = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, app), default_timeout=120)
+    at.secrets['image_settings'] = {}
+    at.run()
+    done = time.perf_counter()
+    print(json.dumps({
+        'streamlit': ready - start,
+        'first_render': done - ready,
+        'errors': [str(e.value) for e in at.exception],
+        'loaded': [name for name in HEAVY if name in sys.modules],
+    }, ensure_ascii=False))
+
+
+def import_time(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout)
+
+
+def main(repeat=3):
+    from synthetic_db import build
+
+    from parking_common.migrations import migrate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'remote.db')
+        conn = build(db_path, employees=2000, periods=8)[0]
+        # 正式資料庫已升級到最新版本，第一次畫面不會觸發升級與上傳
+        conn.isolation_level = None
+        migrate(conn)
+        conn.close()
+        for app in APPS:
+            runs = []
+            for _ in range(repeat):
+                out = subprocess.run([sys.executable, __file__, '--child', app, db_path], cwd=ROOT,
+                                     capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(out.strip().splitlines()[-1]))
+            best = min(runs, key=lambda run: run['first_render'])
+            print(f"{app}: import streamlit {best['streamlit']:.2f} 秒，"
+                  f"app import + 第一次畫面 {best['first_render']:.2f} 秒，"
+                  f"已載入：{', '.join(best['loaded']) or '無'}")
+            for error in best['errors']:
+                print(f"  例外：{error}")
+
+    print("延後載入的套件（單獨 import）：")
+    for module in ['pandas', 'reportlab.platypus', 'googleapiclient.discovery']:
+        try:
+            print(f"  {module}: {import_time(module):.2f} 秒")
+        except subprocess.CalledProcessError:
+            print(f"  {module}: 未安裝")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
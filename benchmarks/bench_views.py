@@ -0,0 +1,77 @@
+"""
+審核頁面資料檢視 benchmark：歷史期數增加時，比較整表載入後以 pandas 篩選，
+與 SQL 篩選 + keyset 分頁只取一頁的耗時與取回筆數。
+
+    python benchmarks/bench_views.py [員工數] [最多期數]
+
+同時檢查逐頁取回的結果與一次取回全部的結果相同。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.migrations import migrate
+from parking_common.repository import Repository
+from parking_common.views import PAGE_SIZE, PAYMENT_VIEW, PENDING_VIEW
+from synthetic_db import build, quarters
+
+FULL_PENDING = "SELECT * FROM 申請紀錄 WHERE 車牌綁定 = 0"
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def walk(view, repository, params, values, size):
+    rows, after = 0, None
+    while True:
+        page = view.page(repository, params, values, after, size=size)
+        rows += len(page.df)
+        if page.next_key is None:
+            return rows
+        after = page.next_key
+
+
+def main(employees=2000, max_periods=48):
+    periods = 4
+    with tempfile.TemporaryDirectory() as tmp:
+        while periods <= max_periods:
+            path = os.path.join(tmp, f'{periods}.db')
+            conn, _ = build(path, employees=employees, periods=periods)
+            conn.isolation_level = None
+            migrate(conn)
+            # 約 5% 的申請尚未審核
+            conn.execute("UPDATE 申請紀錄 SET 車牌綁定 = 0 WHERE rowid % 20 = 0")
+            conn.close()
+
+            repository = Repository(path, cache_entries=0)
+            current = quarters(1)[0]
+
+            full_time, full = timed(lambda: repository.query_df(FULL_PENDING))
+            page_time, page = timed(lambda: PENDING_VIEW.page(repository))
+            print(f"{periods:3d} 期  待審核：整表 {full_time * 1000:7.1f} ms / {len(full):6d} 筆，"
+                  f"第一頁 {page_time * 1000:5.1f} ms / {len(page.df)} 筆")
+
+            values = {'姓名': '陳', '繳費狀態': '已繳費'}
+            full_time, full = timed(lambda: PAYMENT_VIEW.all(repository, (current,)))
+            filtered = full[full['姓名'].str.contains('陳') & (full['繳費狀態'] == '已繳費')]
+            page_time, page = timed(lambda: PAYMENT_VIEW.page(repository, (current,), values))
+            print(f"{'':6s}繳費維護：整表 {full_time * 1000:7.1f} ms / {len(full):6d} 筆，"
+                  f"篩選第一頁 {page_time * 1000:5.1f} ms / {len(page.df)} 筆")
+
+            assert walk(PENDING_VIEW, repository, (), None, PAGE_SIZE) == len(repository.query_df(FULL_PENDING))
+            assert walk(PAYMENT_VIEW, repository, (current,), values, 7) == len(filtered)
+            periods *= 2
+    print("逐頁結果與完整結果筆數一致")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 48)
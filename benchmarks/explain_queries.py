@@ -0,0 +1,92 @@
+"""
+檢查各模組的熱門查詢在升級後的資料庫上是否走索引（EXPLAIN QUERY PLAN）。
+有查詢對資料表做全表掃描時以非 0 結束。
+
+    python benchmarks/explain_queries.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.conflicts import CONFLICT_HOLDERS
+from parking_common.eligibility import HISTORY_QUERY
+from parking_common.migrations import SCHEMA_VERSION, current_version, migrate
+from parking_common.views import APPLICATION_VIEW, GUARANTEED_VIEW, OVERVIEW_VIEW, PENDING_VIEW
+from synthetic_db import build
+
+HISTORY_PARAMS = {'employee_id': '100001', 'car_number': 'ABC1001',
+                  'current': '11402', 'previous1': '11401', 'previous2': '11304'}
+
+QUERIES = {
+    # parking_application
+    'eligibility.HISTORY_QUERY': (HISTORY_QUERY, HISTORY_PARAMS),
+    # parking_lottery
+    'perform_lottery 參加者': ("SELECT 單位, 姓名, 姓名代號 FROM 申請紀錄 WHERE 期別 = ? AND 身分註記 = '一般'", ('11402',)),
+    'perform_lottery 車位': ("SELECT 車位編號 FROM 停車位 WHERE 使用狀態 = '抽籤'", ()),
+    # parking_review
+    'load_data1': ("SELECT * FROM 申請紀錄 WHERE 車牌綁定 = 0", ()),
+    'load_data2': ("SELECT * FROM 申請紀錄 WHERE 期別 = ?", ('11402',)),
+    'update_record': ("UPDATE 申請紀錄 SET 車牌綁定 = ? WHERE 期別 = ? AND 姓名代號 = ?", (1, '11402', '100001')),
+    'delete_payment': ("DELETE FROM 繳費紀錄 WHERE 期別 = ? AND 姓名代號 = ?", ('11402', '100001')),
+    'new_approved_car_record': ("SELECT * FROM 使用者車牌 WHERE 姓名代號 = ? AND 車牌號碼 = ?", ('100001', 'ABC1001')),
+    'new_payment_record': ("SELECT * FROM 免申請繳費 WHERE 期別 = ? AND 姓名代號 = ?", ('11402', '100001')),
+    'exist_no_lottery': ("SELECT * FROM 免申請 WHERE 車牌號碼 = ?", ('GOV0001',)),
+    'exist_lottery_payment': ("SELECT * FROM 抽籤繳費 WHERE 期別 = ? AND 姓名代號 = ?", ('11402', '100001')),
+    'update_confirm_parking': ("UPDATE 繳費紀錄 SET 車位編號 = ? WHERE 期別 = ? AND 姓名代號 = ?", ('B001', '11402', '100001')),
+    'load_data4': ("""
+        SELECT A.期別, A.姓名代號, B.車位編號, C.車位備註, B.繳費狀態
+        FROM 申請紀錄 A
+        INNER JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
+        LEFT JOIN 停車位 C ON B.車位編號 = C.車位編號
+        WHERE A.期別 = ? AND A.身分註記 != '一般'""", ('11402',)),
+    'load_data5 免申請': ("""
+        SELECT E.期別, D.姓名代號, D.車位編號, E.繳費狀態, C.車位排序
+        FROM 免申請 D
+        INNER JOIN 免申請繳費 E ON D.姓名代號 = E.姓名代號
+        LEFT JOIN 停車位 C ON D.車位編號 = C.車位編號
+        WHERE E.期別 = ?""", ('11402',)),
+    'load_data6 繳費紀錄': ("""
+        SELECT C.姓名代號, D.車位編號, B.車位排序
+        FROM 申請紀錄 C
+        INNER JOIN 繳費紀錄 D ON C.期別 = D.期別 AND C.姓名代號 = D.姓名代號
+        LEFT JOIN 停車位 B ON D.車位編號 = B.車位編號
+        WHERE C.期別 = ?""", ('11402',)),
+    # 重複車位（車位佔用）
+    'conflicts': (CONFLICT_HOLDERS, ('11402',)),
+}
+
+# 審核頁面的分頁查詢（從中間某一頁開始）
+for view, params, after in [(PENDING_VIEW, (), ('11401', '100100', 1)),
+                            (APPLICATION_VIEW, ('11402',), ('100100', 1)),
+                            (GUARANTEED_VIEW, ('11402',), ('100100', 1)),
+                            (OVERVIEW_VIEW, ('11402',), (5, 'B005', '100100', 'ABC1001'))]:
+    sql, args = view._query(params, {}, False, after)
+    QUERIES[f'{view.name} 分頁'] = (f"{sql} LIMIT 51", args)
+
+
+def main():
+    conn, _ = build(employees=500, periods=8)
+    migrate(conn)
+    assert current_version(conn) == SCHEMA_VERSION
+    assert migrate(conn) == []  # 重複執行不應再套用
+
+    failures = []
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+        print(f"{name}:")
+        for step in plan:
+            print(f"    {step}")
+        if scans:
+            failures.append((name, scans))
+
+    if failures:
+        print("\n全表掃描：")
+        for name, scans in failures:
+            print(f"    {name}: {scans}")
+        sys.exit(1)
+    print(f"\n所有查詢皆使用索引（schema 版本 {SCHEMA_VERSION}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+本機的假 Google Drive service，行為模仿 googleapiclient：
+files().create(...).execute() 整檔上傳；resumable 時以 next_chunk() 分段上傳，
+中斷後再呼叫 next_chunk() 會從最後一個已確認的位置續傳。
+"""
+import threading
+import time
+import uuid
+
+
+class FakeMedia:
+    """對應 MediaIoBaseUpload 的最小介面。"""
+
+    def __init__(self, fh, mimetype, chunksize, resumable):
+        self.data = fh.read()
+        self.mimetype = mimetype
+        self._chunksize = chunksize
+        self._resumable = resumable
+
+    def size(self):
+        return len(self.data)
+
+    def chunksize(self):
+        return self._chunksize
+
+    def resumable(self):
+        return self._resumable
+
+
+class FakeStatus:
+    def __init__(self, progress, total):
+        self.resumable_progress = progress
+        self.total_size = total
+
+
+class FakeRequest:
+    def __init__(self, drive, body, media):
+        self.drive = drive
+        self.body = body
+        self.media = media
+        self.offset = 0
+
+    def _send(self, length):
+        self.drive.transfer(length)
+
+    def execute(self):
+        self._send(self.media.size())
+        return self.drive.store(self.body, self.media.data)
+
+    def next_chunk(self):
+        end = min(self.offset + self.media.chunksize(), self.media.size())
+        self._send(end - self.offset)
+        self.offset = end
+        if end < self.media.size():
+            return FakeStatus(end, self.media.size()), None
+        return None, self.drive.store(self.body, self.media.data)
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def create(self, body=None, media_body=None, fields=None):
+        return FakeRequest(self.drive, body, media_body)
+
+
+class FakeDrive:
+    """
+    bandwidth：每條連線每秒可傳的位元組數；
+    drop_every：全部連線合計每傳送這麼多位元組，正在傳的那一次就中斷（0 表示不中斷）。
+    同一個 FakeDrive 可給多個執行緒共用，files 存在 self.files。
+    """
+
+    def __init__(self, bandwidth=8 * 1024 * 1024, latency=0.05, drop_every=0):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.drop_every = drop_every
+        self.files = {}
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def transfer(self, length):
+        with self._lock:
+            before, self.bytes_sent = self.bytes_sent, self.bytes_sent + length
+            dropped = self.drop_every and before // self.drop_every != self.bytes_sent // self.drop_every
+        time.sleep(self.latency + length / self.bandwidth)
+        if dropped:
+            raise ConnectionResetError("模擬連線中斷")
+
+    def store(self, body, data):
+        file_id = uuid.uuid4().hex
+        with self._lock:
+            self.files[file_id] = (body['name'], body['parents'], data)
+        return {'id': file_id}
+
+
+class FakeService:
+    """service_factory 每次呼叫產生一個 service，共用同一個 FakeDrive。"""
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def files(self):
+        return FakeFiles(self.drive)
@@ -0,0 +1,75 @@
+"""
+建立與正式環境相同結構的合成資料庫，供 benchmarks 使用。
+正式資料庫沒有 schema 檔，以下欄位依三個應用程式的 SQL 整理而來。
+"""
+import random
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS 申請紀錄 (日期 TEXT, 期別 TEXT, 姓名代號 TEXT, 姓名 TEXT, 單位 TEXT,
+    車牌號碼 TEXT, 聯絡電話 TEXT, 身分註記 TEXT, 車牌綁定 INTEGER);
+CREATE TABLE IF NOT EXISTS 抽籤繳費 (期別 TEXT, 姓名代號 TEXT, 車位編號 TEXT, 繳費狀態 TEXT, 發票號碼 TEXT);
+CREATE TABLE IF NOT EXISTS 免申請 (期別 TEXT, 姓名代號 TEXT, 姓名 TEXT, 單位 TEXT, 車牌號碼 TEXT,
+    聯絡電話 TEXT, 身分註記 TEXT, 車位編號 TEXT);
+CREATE TABLE IF NOT EXISTS 免申請繳費 (期別 TEXT, 姓名代號 TEXT, 車位編號 TEXT, 繳費狀態 TEXT, 發票號碼 TEXT);
+CREATE TABLE IF NOT EXISTS 繳費紀錄 (期別 TEXT, 姓名代號 TEXT, 車位編號 TEXT);
+CREATE TABLE IF NOT EXISTS 使用者車牌 (姓名代號 TEXT, 車牌號碼 TEXT);
+CREATE TABLE IF NOT EXISTS 停車位 (車位編號 TEXT, 使用狀態 TEXT, 車位備註 TEXT, 車位排序 INTEGER);
+"""
+
+UNITS = ['秘書處', '公眾服務處']
+IDENTITIES = ['一般'] * 90 + ['孕婦'] * 5 + ['身心障礙'] * 3 + ['保障'] * 2
+SURNAMES = '陳林黃張李王吳劉蔡楊'
+GIVEN = '志明春嬌淑芬家豪怡君冠宇雅婷俊傑'
+
+
+def quarters(count, last='11401'):
+    """由 last 往前推 count 期（民國年 + 期數）。"""
+    year, quarter = int(last[:-2]), int(last[-2:])
+    result = []
+    for _ in range(count):
+        result.append(f"{year}{quarter:02}")
+        quarter -= 1
+        if quarter == 0:
+            year, quarter = year - 1, 4
+    return result[::-1]
+
+
+def build(path=':memory:', employees=2000, periods=12, spaces=300, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    conn.executemany("INSERT INTO 停車位 VALUES (?,?,?,?)", [
+        (f"B{i:03d}", '抽籤' if i > spaces // 5 else rng.choice(['公務車', '值班', '高階主管', '身心障礙', '孕婦', '保障']), '', i)
+        for i in range(1, spaces + 1)
+    ])
+
+    staff = [(str(100000 + i), rng.choice(SURNAMES) + rng.choice(GIVEN) + rng.choice(GIVEN),
+              rng.choice(UNITS), f"ABC{1000 + i}") for i in range(employees)]
+    conn.executemany("INSERT INTO 使用者車牌 VALUES (?,?)",
+                     [(employee_id, car) for employee_id, _, _, car in staff if rng.random() < 0.7])
+
+    applications, payments, confirmed = [], [], []
+    for period in quarters(periods):
+        for employee_id, name, unit, car in staff:
+            if rng.random() > 0.6:
+                continue
+            identity = rng.choice(IDENTITIES)
+            applications.append(('2025-01-01', period, employee_id, name, unit, car, '6395', identity, 1))
+            status = rng.choice(['已繳費', '未繳費', '未繳費', '放棄'])
+            space = f"B{rng.randint(1, spaces):03d}" if status == '已繳費' else None
+            payments.append((period, employee_id, space, status, None))
+            if space:
+                confirmed.append((period, employee_id, space))
+    conn.executemany("INSERT INTO 申請紀錄 VALUES (?,?,?,?,?,?,?,?,?)", applications)
+    conn.executemany("INSERT INTO 抽籤繳費 VALUES (?,?,?,?,?)", payments)
+    conn.executemany("INSERT INTO 繳費紀錄 VALUES (?,?,?)", confirmed)
+
+    conn.executemany("INSERT INTO 免申請 VALUES (?,?,?,?,?,?,?,?)", [
+        (None, str(900000 + i), f"主管{i}", rng.choice(UNITS), f"GOV{i:04d}", '6395',
+         rng.choice(['公務車', '值班', '高階主管']), f"B{i + 1:03d}")
+        for i in range(spaces // 5)
+    ])
+    conn.commit()
+    return conn, staff
@@ -1,30 +1,223 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
+"""
+每小時由 GitHub Actions 呼叫，喚醒各 Streamlit 應用程式並確認背景預熱正常。
+
+    python keep_alive.py [網址 ...]
+
+只用標準函式庫，不需要瀏覽器：
+1. 請求 Streamlit 的健康檢查端點，確認伺服器已啟動（剛被喚醒時會重試）
+2. 健康檢查端點不會執行頁面程式，因此再以 WebSocket 開一個 session 執行 ?health=1 頁面：
+   頁面會啟動背景預熱（資料庫同步、Drive 連線、字型），等第一輪完成後回報狀態
+預熱狀態不是 ok（或取不到）時以非 0 結束讓工作流程顯示失敗。
+未指定網址時使用環境變數 STREAMLIT_APP_URLS（以空白或逗號分隔），再沒有則使用申請頁面。
+"""
+import base64
+import json
+import os
+import socket
+import ssl
+import struct
+import sys
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_URLS = ["https://parking-application0.streamlit.app/"]
+# Streamlit Community Cloud 把應用程式本身的路徑放在 /~/+/ 之下；自行架設時直接在根目錄
+APP_PREFIXES = ["~/+/", ""]
+RETRIES = 3
+TIMEOUT = 60
+# 頁面最多等 60 秒第一輪預熱，再加上執行頁面本身的時間
+WARMUP_TIMEOUT = 120
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": "parking-keep-alive"})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        return response.status, response.read().decode("utf-8", "replace").strip()
+
+####################################################################
+# 最小的 WebSocket 用戶端（RFC 6455）與 Streamlit 訊息
+####################################################################
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, data):
+    # protobuf 長度前綴欄位（wire type 2）
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def rerun_message(query_string):
+    """BackMsg{rerun_script: ClientState{query_string}}：要求伺服器以指定的查詢字串執行頁面。"""
+    return _field(11, _field(1, query_string.encode("utf-8")))
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("WebSocket 連線中斷")
+        data += chunk
+    return bytes(data)
+
+
+def _send_frame(sock, opcode, payload):
+    # 用戶端送出的資料必須加上遮罩
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+    sock.sendall(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+
+def _recv_message(sock):
+    """讀取一則完整訊息（合併分段），自動回應 ping；對方關閉時回傳 None。"""
+    message = bytearray()
+    while True:
+        first, second = _recv_exact(sock, 2)
+        opcode, length = first & 0x0F, second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", _recv_exact(sock, 2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+        payload = _recv_exact(sock, length)
+        if opcode == 0x8:
+            return None
+        if opcode == 0x9:
+            _send_frame(sock, 0xA, payload)
+            continue
+        if opcode == 0xA:
+            continue
+        message += payload
+        if first & 0x80:
+            return bytes(message)
+
+
+def _connect(url, timeout):
+    parts = urllib.parse.urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = (parts.path.rstrip("/") + "/_stcore/stream").lstrip("/")
+    request = (
+        f"GET /{path} HTTP/1.1\r\n"
+        f"Host: {parts.netloc}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "Sec-WebSocket-Protocol: streamlit\r\n"
+        "User-Agent: parking-keep-alive\r\n\r\n"
+    )
+    sock.sendall(request.encode())
+    response = bytearray()
+    while b"\r\n\r\n" not in response:
+        response += _recv_exact(sock, 1)
+    status_line = response.split(b"\r\n", 1)[0].decode("latin-1")
+    if " 101 " not in status_line + " ":
+        sock.close()
+        raise ConnectionError(f"WebSocket 握手失敗：{status_line}")
+    return sock
+
+
+def _find_status(message):
+    # st.json 的內容以 UTF-8 原文出現在 ForwardMsg 中，直接找 Warmup.status() 的 JSON
+    text = message.decode("utf-8", "ignore")
+    start = text.find('{"status"')
+    if start < 0:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+
+def warmup_status(app_url, timeout=WARMUP_TIMEOUT):
+    """以一個 WebSocket session 執行 ?health=1 頁面，回傳 Warmup.status()；取不到時回傳 None。"""
+    deadline = time.monotonic() + timeout
+    sock = _connect(app_url, timeout)
+    try:
+        _send_frame(sock, 0x2, rerun_message("health=1"))
+        while time.monotonic() < deadline:
+            sock.settimeout(max(deadline - time.monotonic(), 0.1))
+            message = _recv_message(sock)
+            if message is None:
+                return None
+            status = _find_status(message)
+            if status is not None:
+                return status
+        return None
+    finally:
+        sock.close()
 
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
+####################################################################
+# 檢查流程
+####################################################################
+def wake(base_url):
+    """請求健康檢查端點直到伺服器回應 ok，回傳 (應用程式網址, 說明)；失敗時網址為 None。"""
+    error = None
+    for attempt in range(1, RETRIES + 1):
+        for prefix in APP_PREFIXES:
+            start = time.perf_counter()
+            try:
+                status, body = fetch(base_url + prefix + "_stcore/health")
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                error = f"{prefix}_stcore/health: {e}"
+                continue
+            if status == 200 and body == "ok":
+                elapsed = time.perf_counter() - start
+                return base_url + prefix, f"伺服器回應 ok（{elapsed:.2f} 秒，第 {attempt} 次）"
+            error = f"{prefix}_stcore/health: HTTP {status} {body[:80]!r}"
+        if attempt < RETRIES:
+            # 應用程式剛被喚醒時可能還在啟動
+            time.sleep(10 * attempt)
+    return None, error
 
-# 修正這裡
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=options)
 
-try:
-    driver.get("https://parking-application0.streamlit.app/")
-    time.sleep(10)  
+def ping(base_url):
+    """回傳 (是否正常, 說明)。"""
+    app_url, message = wake(base_url.rstrip("/") + "/")
+    if app_url is None:
+        return False, message
+    start = time.perf_counter()
+    try:
+        status = warmup_status(app_url)
+    except (OSError, ValueError) as e:
+        return False, f"{message}；無法執行 ?health=1：{e}"
+    if status is None:
+        return False, f"{message}；?health=1 未回報預熱狀態"
+    elapsed = time.perf_counter() - start
+    steps = "、".join(f"{name} {result['耗時']} 秒" + (f"（{result['錯誤']}）" if result['錯誤'] else "")
+                     for name, result in status.get("步驟", {}).items())
+    return status.get("status") == "ok", f"{message}；預熱 {status.get('status')}（{elapsed:.2f} 秒）{steps}"
 
-    # 模擬點擊（可選）
-    ActionChains(driver).move_by_offset(10, 10).click().perform()
 
-    print("Successfully visited and clicked!")
+def main(urls):
+    failed = 0
+    for url in urls:
+        ok, message = ping(url)
+        print(f"{'OK  ' if ok else 'FAIL'} {url} {message}")
+        failed += not ok
+    return 1 if failed else 0
 
-except Exception as e:
-    print(f"Error occurred: {e}")
 
-finally:
-    driver.quit()
+if __name__ == "__main__":
+    urls = sys.argv[1:] or os.getenv("STREAMLIT_APP_URLS", "").replace(",", " ").split() or DEFAULT_URLS
+    sys.exit(main(urls))
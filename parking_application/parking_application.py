@@ -2,44 +2,68 @@ import streamlit as st
 import sqlite3
 import os
 import re
-import io
-import time
-import smtplib
-from filelock import FileLock
+import sys
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload, MediaIoBaseUpload
-
-# 建立 Google Drive API 連線
-creds = Credentials.from_service_account_info(st.secrets["google_drive"])
-service = build('drive', 'v3', credentials=creds)
+# 讓三個應用程式共用 parking_common 模組
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.admission import AdmissionQueue, AdmissionTimeout
+from parking_common.changelog import Changelog
+from parking_common.eligibility import evaluate
+from parking_common.folders import FolderCache
+from parking_common.images import ImageSettings, prepare as prepare_images
+from parking_common.mailer import Mailer, SMTPConnectionPool
+from parking_common.migrations import ensure_schema
+from parking_common.services import drive_service
+from parking_common.storage import DriveStorage, SyncedDatabase
+from parking_common.uploads import UploadJob, UploadPipeline, UploadProgress
+from parking_common.warmup import Warmup
+
+# Google Drive API 連線：第一次呼叫 Drive 時才建立，同一個行程共用憑證
+service = drive_service(lambda: st.secrets["google_drive"])
 
 # 指定「主資料夾」ID（Service Account 可寫入）
 drive_folder_id = '1RlnOdNPo5hWDz-ccKCR8R-ef1Gw2B3US'
 
-# 上傳/下載資料庫用的檔案鎖
-lockfile_path = "/tmp/operation.lock"
+# 已受理申請的寫入日誌
+changelog_path = "/tmp/changelog.jsonl"
+
+# 寄信佇列
+outbox_path = "/tmp/outbox.db"
+
+# 每期附件子資料夾 ID 快取
+folder_cache_path = "/tmp/folder_cache.json"
+
+# 附件照片的縮圖與壓縮設定，可在 secrets 的 [image_settings] 調整（max_side、quality、combine_pdf）
+image_settings = ImageSettings(**st.secrets.get("image_settings", {}))
 
 
 ####################################################################
 # 資料庫讀寫函式
 ####################################################################
+@st.cache_resource
+def get_database(file_id, local_path):
+    # 所有 session 共用同一份本機副本
+    return SyncedDatabase(DriveStorage(service, file_id), local_path)
+
+@st.cache_resource
+def get_changelog(file_id, local_path):
+    # 啟動時先取得最新資料庫並補寫未上傳的日誌，之後每 5 秒整批上傳一次
+    database = get_database(file_id, local_path)
+    database.sync()
+    ensure_schema(database)
+    changelog = Changelog(changelog_path, database, interval=5)
+    # 遠端被審核、抽籤程式更新過時，把日誌重新套用到最新版再上傳，不覆蓋對方的資料
+    database.merge = changelog.rebase
+    changelog.start()
+    return changelog
+
 def download_db(file_id, destination):
-    request = service.files().get_media(fileId=file_id)
-    fh = io.FileIO(destination, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-
-def upload_db(source, file_id):
-    file_metadata = {'name': 'test.db'}
-    media = MediaFileUpload(source, mimetype='application/x-sqlite3')
-    service.files().update(fileId=file_id, media_body=media).execute()
+    # 遠端版本未變時不重新下載
+    get_changelog(file_id, destination)
+    database = get_database(file_id, destination)
+    database.sync()
+    ensure_schema(database)
 
 ####################################################################
 # 計算期別
@@ -76,27 +100,20 @@ def previous_quarters(year, quarter):
 ####################################################################
 # email 發送
 ####################################################################
-def send_email(employee_id, name, text, subject_text):
+@st.cache_resource
+def get_mailer():
+    # 所有 session 共用一個寄信佇列與 SMTP 連線，由背景執行緒寄出
     sender_email = os.getenv("EMAIL_USER")
-    sender_password = os.getenv("EMAIL_PASS")
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 465
+    pool = SMTPConnectionPool("smtp.gmail.com", 465, sender_email, os.getenv("EMAIL_PASS"))
+    mailer = Mailer(outbox_path, pool, sender_email)
+    mailer.start()
+    return mailer
 
-    subject = subject_text
+def send_email(employee_id, name, text, subject_text):
     body = f"{name}您好,\n{text}\n秘書處 大樓管理組 敬上\n聯絡電話:(02)2366-6395"
-
-    message = MIMEMultipart()
-    message["From"] = sender_email
-    message["To"] = f"u{employee_id}@taipower.com.tw"
-    message["Subject"] = subject
-    message.attach(MIMEText(body, "plain"))
-
     try:
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email, f"u{employee_id}@taipower.com.tw", message.as_string())
-        server.close()
-        return "郵件已發送成功！"
+        get_mailer().enqueue(f"u{employee_id}@taipower.com.tw", subject_text, body)
+        return "郵件已排入寄送佇列！"
     except Exception as e:
         return f"發送郵件時發生錯誤: {e}"
 
@@ -106,87 +123,98 @@ def send_email(employee_id, name, text, subject_text):
 def insert_apply(conn, cursor, unit, name, car_number, employee_id,
                  special_needs, contact_info, car_bind, current,
                  local_db_path, db_file_id):
+    # 寫入日誌與本機資料庫後立即返回，由背景執行緒整批上傳
     current_date = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
+    insert_query = '''
     INSERT INTO 申請紀錄 (日期,期別,姓名代號,姓名,單位,車牌號碼,聯絡電話,身分註記,車牌綁定)
     VALUES (?,?,?,?,?,?,?,?,?)
-    ''', (current_date, current, employee_id, name, unit,
-          car_number, contact_info, special_needs, car_bind))
-    conn.commit()
-    upload_db(local_db_path, db_file_id)
+    '''
+    get_changelog(db_file_id, local_db_path).record([
+        (insert_query, (current_date, current, employee_id, name, unit,
+                        car_number, contact_info, special_needs, car_bind))
+    ])
 
 def insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id):
     insert_query = """
     INSERT INTO 抽籤繳費 (期別,姓名代號,繳費狀態)
     VALUES (?,?,'未繳費')
     """
-    cursor.execute(insert_query, (current, employee_id))
-    conn.commit()
-    upload_db(local_db_path, db_file_id)
+    get_changelog(db_file_id, local_db_path).record([(insert_query, (current, employee_id))])
 
 ####################################################################
-# 資料庫邏輯判斷
+# 補件時的檔案上傳資料夾管理
 ####################################################################
-def check_user_eligibility(employee_id, conn, cursor, previous1, previous2):
-    # 判斷是否連兩期 '未繳費' => 未抽中
-    cursor.execute('''
-        SELECT COUNT(*)
-        FROM 抽籤繳費
-        WHERE 姓名代號 = ? AND 期別 = ? AND 繳費狀態 = '未繳費'
-    ''', (employee_id, previous2))
-    unpaid_before_last_period = cursor.fetchone()[0]
-
-    cursor.execute('''
-        SELECT COUNT(*)
-        FROM 抽籤繳費
-        WHERE 姓名代號 = ? AND 期別 = ? AND 繳費狀態 = '未繳費'
-    ''', (employee_id, previous1))
-    unpaid_last_period = cursor.fetchone()[0]
-
-    return unpaid_before_last_period > 0 and unpaid_last_period > 0
-
-def has_approved_car_record(cursor, employee_id, car_number):
-    cursor.execute("SELECT * FROM 使用者車牌 WHERE 姓名代號 = ? AND 車牌號碼 = ?", (employee_id, car_number))
-    return cursor.fetchone() is not None
-
-def get_pregnant_record_status(cursor, employee_id, last_period, before_last_period):
-    cursor.execute('''
-        SELECT 期別 FROM 申請紀錄
-        WHERE 姓名代號 = ? AND 期別 IN (?, ?) AND 身分註記 = ?
-    ''', (employee_id, last_period, before_last_period, '孕婦'))
-    records = cursor.fetchall()
-    periods = [record[0] for record in records]
-    if last_period in periods and before_last_period in periods:
-        return "both"
-    elif last_period in periods:
-        return "only_last_period"
-    elif before_last_period in periods:
-        return "only_before_last_period"
-    else:
-        return "none"
+@st.cache_resource
+def get_upload_pipeline():
+    # googleapiclient 的連線不是 thread-safe，每個上傳執行緒各自建立一個 service
+    return UploadPipeline(service.build, workers=3)
+
+def upload_documents(uploaded_files, pending):
+    """
+    同時上傳申請人的所有附件並顯示進度，回傳失敗的檔名清單。
+    已上傳成功的檔案記在 pending['uploaded']，重試時不會重複上傳。
+    """
+    uploaded = pending.setdefault('uploaded', {})
+    basename = f"{pending.get('unit','')}_{pending.get('name','')}"
+    jobs = []
+    for idx, uploaded_file in enumerate(uploaded_files, start=1):
+        file_ext = uploaded_file.name.split('.')[-1]
+        filename = basename
+        if len(uploaded_files) > 1:
+            filename += f"_{idx}"
+        filename += f".{file_ext}"
+        jobs.append(UploadJob(filename, uploaded_file.getvalue(), uploaded_file.type))
+
+    # 照片先轉正、去除 EXIF、縮圖壓縮（可合併成一個 PDF），減少上傳量與審核下載時間
+    with st.spinner('檔案處理中...'):
+        jobs = prepare_images(jobs, image_settings, pdf_name=f"{basename}.pdf")
+    jobs = [job for job in jobs if job.name not in uploaded]
+    if not jobs:
+        return []
+
+    progress = UploadProgress(jobs)
+    bar = st.progress(0.0, text="檔案上傳中...")
+    def on_progress(name, done, size):
+        bar.progress(progress.update(name, done, size), text=f"檔案上傳中...（{name}）")
+
+    results = get_upload_pipeline().upload(st.session_state['subfolder_id'], jobs, on_progress)
+    for result in results:
+        if result.ok:
+            uploaded[result.name] = result.file_id
+    bar.empty()
+    return [result.name for result in results if not result.ok]
+
+@st.cache_resource
+def get_folder_cache():
+    # 所有 session 共用；每期子資料夾 ID 查過一次就記住，並保存在 /tmp 供重新啟動後沿用
+    return FolderCache(service, folder_cache_path)
 
 ####################################################################
-# 補件時的檔案上傳資料夾管理
+# 預熱與健康檢查
 ####################################################################
-def get_or_create_subfolder(service, parent_folder_id, subfolder_name):
-    query = (
-        f"name = '{subfolder_name}' "
-        f"and '{parent_folder_id}' in parents "
-        f"and mimeType = 'application/vnd.google-apps.folder' "
-        f"and trashed=false"
-    )
-    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-    subfolders = response.get('files', [])
-    if subfolders:
-        return subfolders[0]['id']
-    else:
-        folder_metadata = {
-            'name': subfolder_name,
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [parent_folder_id]
-        }
-        folder = service.files().create(body=folder_metadata, fields='id').execute()
-        return folder['id']
+def get_title(today):
+    west_year, quarter = get_quarter(today.year, today.month)
+    return f"{west_year - 1911}年第{quarter}期台灣電力股份有限公司總管理處停車位申請"
+
+@st.cache_resource
+def get_warmup(file_id, local_path):
+    # 背景預熱：同步資料庫（順便更新 Drive 權杖）、取得本期附件資料夾、載入 Pillow，之後每 10 分鐘再跑一次
+    get_changelog(file_id, local_path)
+    database = get_database(file_id, local_path)
+    folder_cache = get_folder_cache()
+
+    def sync_database():
+        database.sync()
+        ensure_schema(database)
+
+    def resolve_folder():
+        # 換季後第一位申請人不必等待建立子資料夾
+        folder_cache.resolve(drive_folder_id, get_title(datetime.today()))
+
+    def load_pillow():
+        import PIL.Image
+
+    return Warmup({'資料庫': sync_database, '附件資料夾': resolve_folder, 'Pillow': load_pillow}).start()
 
 ####################################################################
 # 主邏輯：表單送出 => 判斷 => 若需補件 => 暫存; 若不需補件 => 直接插DB & 寄信
@@ -210,273 +238,56 @@ def submit_application(conn, cursor, unit, name, car_number, employee_id,
         st.error('您填寫的員工編號並非純數字(如:123456)，請調整後重新提交表單')
         return False
 
-    # 是否本期重覆申請
-    cursor.execute('SELECT 1 FROM 申請紀錄 WHERE 期別 = ? AND 姓名代號 = ?', (current, employee_id))
-    existing_record = cursor.fetchone()
-    if existing_record:
-        st.error('您已經在本期提交過申請，請勿重複提交，如需修正請聯繫管理組(6395)!')
+    # 一次查出歷史紀錄並判斷資格
+    decision = evaluate(cursor, employee_id, car_number, special_needs, current, previous1, previous2)
+
+    if decision.route == 'reject':
+        st.error(decision.message)
         return False
 
-    # 根據邏輯判斷
-    if special_needs == '孕婦':
-        status = get_pregnant_record_status(cursor, employee_id, previous1, previous2)
-
-        if status == 'none':
-            # ---- 需要補件，但「尚未」插DB或寄信 ----
-            st.session_state['pending_insert'] = {
-                "unit": unit,
-                "name": name,
-                "car_number": car_number,
-                "employee_id": employee_id,
-                "special_needs": special_needs,  # '孕婦'
-                "contact_info": contact_info,
-                "car_bind": False,      # 第一次申請 => False
-                "current": current,
-                "should_insert_parking_fee": False,   # 還未給予車位
-                "email_text": "您為第一次孕婦申請，請上傳孕婦手冊、行照、駕照等證明文件。",
-                "email_subject": "本期停車補證明文件通知",
-                "success_message": "本期『孕婦申請』已完成，感謝您補件。"  
-            }
-            return True
-
-        elif status == 'only_last_period':
-            if has_approved_car_record(cursor, employee_id, car_number):
-                # 直接插DB & 寄信
-                insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                             special_needs, contact_info, True, current, local_db_path, db_file_id)
-                insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id)
-                st.success('本期"孕婦"身分停車申請成功')
-                text = "您有孕婦資格，本期停車申請成功，感謝您。"
-                subject_text = "本期停車申請成功通知"
-                send_email(employee_id, name, text, subject_text)
-                return False
-            else:
-                # 需要補件 => 暫存
-                st.session_state['pending_insert'] = {
-                    "unit": unit,
-                    "name": name,
-                    "car_number": car_number,
-                    "employee_id": employee_id,
-                    "special_needs": special_needs,  # '孕婦'
-                    "contact_info": contact_info,
-                    "car_bind": False,
-                    "current": current,
-                    "should_insert_parking_fee": True, 
-                    "email_text": "您有孕婦資格，但此車為第一次申請，請上傳孕婦資格證明文件及車輛文件。",
-                    "email_subject": "本期停車補證明文件通知",
-                    "success_message": "本期『孕婦申請』已完成，感謝您補件。系統已為您預留孕婦車位。"
-                }
-                return True
-
-        else:
-            # 已過孕婦資格 => 轉一般
-            if has_approved_car_record(cursor, employee_id, car_number):
-                # 無需補件
-                insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                             '一般', contact_info, True, current, local_db_path, db_file_id)
-                st.success('您已過孕婦申請期，系統自動改為一般申請成功。')
-                text = "您已過孕婦申請期，系統自動將您轉為一般申請，感謝您。"
-                subject_text = "本期停車申請成功通知"
-                send_email(employee_id, name, text, subject_text)
-                return False
-            else:
-                # 需要補件 => 暫存
-                st.session_state['pending_insert'] = {
-                    "unit": unit,
-                    "name": name,
-                    "car_number": car_number,
-                    "employee_id": employee_id,
-                    "special_needs": '一般',
-                    "contact_info": contact_info,
-                    "car_bind": False,
-                    "current": current,
-                    "should_insert_parking_fee": False, 
-                    "email_text": "您已過孕婦申請期，但此車為第一次申請一般停車，請上傳車輛證明文件。",
-                    "email_subject": "本期停車補證明文件通知",
-                    "success_message": "本期『一般申請』已完成，感謝您補件。"
-                }
-                return True
-
-    elif special_needs == '身心障礙':
-        # 看之前是否有身障紀錄
-        cursor.execute("SELECT * FROM 申請紀錄 WHERE 姓名代號=? AND 身分註記='身心障礙'", (employee_id,))
-        disable_data = cursor.fetchone()
-        if disable_data:
-            if has_approved_car_record(cursor, employee_id, car_number):
-                insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                             special_needs, contact_info, True, current, local_db_path, db_file_id)
-                insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id)
-                st.success('本期"身心障礙"停車申請成功')
-                text = "您有身心障礙資格，本期停車申請成功。"
-                subject_text = "本期停車申請成功通知"
-                send_email(employee_id, name, text, subject_text)
-                return False
-            else:
-                # 需要補件 => 暫存
-                st.session_state['pending_insert'] = {
-                    "unit": unit,
-                    "name": name,
-                    "car_number": car_number,
-                    "employee_id": employee_id,
-                    "special_needs": special_needs,  # '身心障礙'
-                    "contact_info": contact_info,
-                    "car_bind": False,
-                    "current": current,
-                    "should_insert_parking_fee": True,
-                    "email_text": "您有身心障礙資格，但此車為第一次申請，請上傳身障證明與車輛證明文件。",
-                    "email_subject": "本期停車補證明文件通知",
-                    "success_message": "本期『身心障礙』已完成，感謝您補件。系統已為您預留身障車位。"
-                }
-                return True
-        else:
-            # 第一次身障申請 => 需補件
-            st.session_state['pending_insert'] = {
-                "unit": unit,
-                "name": name,
-                "car_number": car_number,
-                "employee_id": employee_id,
-                "special_needs": special_needs,  # '身心障礙'
-                "contact_info": contact_info,
-                "car_bind": False,
-                "current": current,
-                "should_insert_parking_fee": False,
-                "email_text": "您為第一次身心障礙申請，請上傳身障證明、行照、駕照等文件。",
-                "email_subject": "本期停車補證明文件通知",
-                "success_message": "本期『身心障礙申請』已完成，感謝您補件。"
-            }
-            return True
+    if decision.route == 'upload':
+        # ---- 需要補件，但「尚未」插DB或寄信 ----
+        st.session_state['pending_insert'] = decision.pending_insert(
+            unit, name, car_number, employee_id, contact_info, current
+        )
+        return True
 
-    else:
-        # 一般
-        cursor.execute("""
-            SELECT * FROM 抽籤繳費
-            WHERE 姓名代號 = ?
-              AND 期別 = ?
-              AND (繳費狀態 = '已繳費' OR 繳費狀態 = '轉讓')
-        """, (employee_id, previous1))
-        existing_data = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT * FROM 申請紀錄
-            WHERE 姓名代號 = ?
-              AND 身分註記 in (?,?)
-              AND 期別 = ?
-        """, (employee_id, '一般', '保障', previous1))
-        existing_application_data = cursor.fetchone()
-
-        # 上期已確定停車 => 不得申請
-        if existing_data and existing_application_data:
-            st.error('您上期已確認停車，請下期再申請停車位!')
-            return False
-        else:
-            # 是否連兩期都未抽中 => 保障
-            if check_user_eligibility(employee_id, conn, cursor, previous1, previous2):
-                if has_approved_car_record(cursor, employee_id, car_number):
-                    insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                                 '保障', contact_info, True, current, local_db_path, db_file_id)
-                    insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id)
-                    st.success('您前兩期都未抽中，本期獲得保障車位!')
-                    text = "您連續兩期都有申請，且都未中籤，本期獲得保障車位。"
-                    subject_text = "本期停車申請成功並獲得保障車位"
-                    send_email(employee_id, name, text, subject_text)
-                    return False
-                else:
-                    # 需要補件 => 暫存
-                    st.session_state['pending_insert'] = {
-                        "unit": unit,
-                        "name": name,
-                        "car_number": car_number,
-                        "employee_id": employee_id,
-                        "special_needs": '保障',
-                        "contact_info": contact_info,
-                        "car_bind": False,
-                        "current": current,
-                        "should_insert_parking_fee": True,
-                        "email_text": "您前兩期都未中籤，本期享保障車位，但此車為第一次申請。請上傳車輛證明文件。",
-                        "email_subject": "本期停車補證明文件通知",
-                        "success_message": "本期『保障車位申請』已完成，感謝您補件。系統已為您預留保障車位。"
-                    }
-                    return True
-            else:
-                # 檢查是否上期曾是孕婦 => 可能自動帶入孕婦
-                status = get_pregnant_record_status(cursor, employee_id, previous1, previous2)
-                if status == 'only_last_period':
-                    if has_approved_car_record(cursor, employee_id, car_number):
-                        insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                                     '孕婦', contact_info, True, current, local_db_path, db_file_id)
-                        insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id)
-                        st.success('您上期孕婦申請成功，本期自動帶入孕婦車位!')
-                        text = "您上期孕婦申請成功，本期自動帶入孕婦身份，獲得保障。"
-                        subject_text = "本期停車申請成功並改為孕婦身份"
-                        send_email(employee_id, name, text, subject_text)
-                        return False
-                    else:
-                        # 需要補件 => 暫存
-                        st.session_state['pending_insert'] = {
-                            "unit": unit,
-                            "name": name,
-                            "car_number": car_number,
-                            "employee_id": employee_id,
-                            "special_needs": '孕婦',
-                            "contact_info": contact_info,
-                            "car_bind": False,
-                            "current": current,
-                            "should_insert_parking_fee": True,
-                            "email_text": "您上期孕婦申請成功，但此車為第一次申請，請上傳孕婦/車輛證明文件。",
-                            "email_subject": "本期停車補證明文件通知",
-                            "success_message": "本期『孕婦申請』已完成，感謝您補件。"
-                        }
-                        return True
-                else:
-                    # 純一般申請
-                    if has_approved_car_record(cursor, employee_id, car_number):
-                        # 直接成功
-                        insert_apply(conn, cursor, unit, name, car_number, employee_id,
-                                     special_needs, contact_info, True, current, local_db_path, db_file_id)
-                        st.success('本期一般車位申請成功!')
-                        text = "本期您一般身分停車抽籤申請成功，感謝您。"
-                        subject_text = "本期停車抽籤申請成功通知"
-                        send_email(employee_id, name, text, subject_text)
-                        return False
-                    else:
-                        # 需要補件 => 暫存
-                        st.session_state['pending_insert'] = {
-                            "unit": unit,
-                            "name": name,
-                            "car_number": car_number,
-                            "employee_id": employee_id,
-                            "special_needs": special_needs,
-                            "contact_info": contact_info,
-                            "car_bind": False,
-                            "current": current,
-                            "should_insert_parking_fee": False,
-                            "email_text": "您為第一次申請一般車位，請上傳車輛證明文件。",
-                            "email_subject": "本期停車補證明文件通知",
-                            "success_message": "本期『一般申請』已完成，感謝您補件。",
-                            "upload_prompt": "該車號為第一次申請停車，請上傳相關證明檔案。"
-                        }
-                        return True
+    # 無需補件 => 直接插DB & 寄信
+    insert_apply(conn, cursor, unit, name, car_number, employee_id,
+                 decision.special_needs, contact_info, decision.car_bind, current, local_db_path, db_file_id)
+    if decision.should_insert_parking_fee:
+        insert_parking_fee(conn, cursor, current, employee_id, local_db_path, db_file_id)
+    st.success(decision.message)
+    send_email(employee_id, name, decision.email_text, decision.email_subject)
+    return False
 
 ####################################################################
-# 執行主要邏輯：加檔案鎖 & 呼叫 submit_application
+# 執行主要邏輯：排隊 & 呼叫 submit_application
 ####################################################################
+@st.cache_resource
+def get_admission_queue():
+    # 所有 session 共用同一個排隊；同一員工編號的申請彼此互斥
+    return AdmissionQueue(slots=4, max_wait=30)
+
 def perform_operation(conn, cursor, unit, name, car_number, employee_id, special_needs,
                       contact_info, previous1, previous2, current, local_db_path, db_file_id):
-    lock = FileLock(lockfile_path)
+    queue_message = st.empty()
+
+    def show_position(position, eta):
+        queue_message.info(f"目前申請人數較多，您排在第 {position} 位，預計等待約 {eta:.0f} 秒...")
+
     try:
-        lock.acquire(timeout=1)
-        time.sleep(3)
-        need_upload = submit_application(
-            conn, cursor, unit, name, car_number, employee_id, special_needs,
-            contact_info, previous1, previous2, current, local_db_path, db_file_id
-        )
-        return need_upload
-    except TimeoutError:
+        with get_admission_queue().admit(employee_id, on_wait=show_position):
+            queue_message.empty()
+            need_upload = submit_application(
+                conn, cursor, unit, name, car_number, employee_id, special_needs,
+                contact_info, previous1, previous2, current, local_db_path, db_file_id
+            )
+            return need_upload
+    except AdmissionTimeout:
+        queue_message.empty()
         st.warning("有操作正在進行，請稍後再試，或聯絡管理組(6395)。")
         return False
-    finally:
-        if lock.is_locked:
-            lock.release()
 
 ####################################################################
 # Streamlit 主程式
@@ -488,15 +299,25 @@ def main():
     Taiwan_year = west_year - 1911
     current = f"{Taiwan_year}{quarter:02}"
     previous1, previous2 = previous_quarters(Taiwan_year, quarter)
-    title = f"{Taiwan_year}年第{quarter}期台灣電力股份有限公司總管理處停車位申請"
+    title = get_title(today)
 
     st.set_page_config(layout="wide", page_title=title)
+
+    # 資料庫位置
+    db_file_id = '1_TArAUZyzzZuLX3y320VpytfBlaoUGBB'
+    local_db_path = '/tmp/test.db'
+
+    # 健康檢查：?health=1 等第一輪預熱完成後回報狀態，不顯示頁面
+    warmup = get_warmup(db_file_id, local_db_path)
+    if st.query_params.get('health'):
+        warmup.wait(timeout=60)
+        st.json(warmup.status())
+        st.stop()
+
     st.title(title)
     st.markdown("有申請過停車的同仁不需提供證明文件，若為第一次申請系統會提示需要上傳證明文件檔案，確認上傳後即完成本期停車申請。員工申請停車位所檢具之證明文件檔案，經秘書處審核後即刪除，並填報「個人資料刪除、銷燬紀錄表」備查，以符合個人資料保護法相關規定。")
 
     # 下載資料庫
-    db_file_id = '1_TArAUZyzzZuLX3y320VpytfBlaoUGBB'
-    local_db_path = '/tmp/test.db'
     download_db(db_file_id, local_db_path)
 
     conn = sqlite3.connect(local_db_path)
@@ -504,7 +325,7 @@ def main():
 
     # 若 session_state 裡沒子資料夾ID => 自動建立/取得
     if 'subfolder_id' not in st.session_state:
-        st.session_state['subfolder_id'] = get_or_create_subfolder(service, drive_folder_id, title)
+        st.session_state['subfolder_id'] = get_folder_cache().resolve(drive_folder_id, title)
 
     # 狀態初始化
     if 'need_upload' not in st.session_state:
@@ -565,20 +386,11 @@ def main():
     
         if uploaded_files:
             if st.button('確認上傳'):
-                # 上傳檔案到對應子資料夾
-                for idx, uploaded_file in enumerate(uploaded_files, start=1):
-                    file_ext = uploaded_file.name.split('.')[-1]
-                    filename = f"{pending.get('unit','')}_{pending.get('name','')}"
-                    if len(uploaded_files) > 1:
-                        filename += f"_{idx}"
-                    filename += f".{file_ext}"
-    
-                    file_metadata = {
-                        'name': filename,
-                        'parents': [st.session_state['subfolder_id']]
-                    }
-                    media = MediaIoBaseUpload(uploaded_file, mimetype=uploaded_file.type, resumable=False)
-                    service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+                # 上傳檔案到對應子資料夾（同時上傳，大檔分段續傳）
+                failed = upload_documents(uploaded_files, pending)
+                if failed:
+                    st.error(f"以下檔案上傳失敗，請再按一次確認上傳：{'、'.join(failed)}")
+                    st.stop()
     
                 # 寫入資料庫 & 寄信
                 insert_apply(
@@ -0,0 +1 @@
+"""三個停車應用程式（申請、抽籤、審核）共用的模組。"""
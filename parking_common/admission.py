@@ -0,0 +1,119 @@
+import collections
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+####################################################################
+# 送出申請的排隊機制
+####################################################################
+class AdmissionTimeout(TimeoutError):
+    """排隊超過最長等待時間。"""
+
+
+class AdmissionQueue:
+    """
+    公平的 FIFO 排隊：
+    - 每個請求取得一張號碼牌，依序進入，最多 slots 個請求同時處理
+    - 同一個 key（員工編號）的請求彼此互斥，不同員工可同時送出；等待 key 時尚未排隊，不佔用處理名額
+    - 等待期間定期呼叫 on_wait(position, eta) 回報排隊位置與預估秒數
+    - 超過 max_wait 秒仍未輪到則拋出 AdmissionTimeout
+    """
+
+    def __init__(self, slots=4, max_wait=30, poll_interval=0.5):
+        self.slots = slots
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._waiting = collections.deque()
+        self._running = 0
+        self._tickets = itertools.count(1)
+        self._avg_service_time = 1.0
+        self._key_locks = {}
+        self._key_mutex = threading.Lock()
+
+    def position(self, ticket):
+        """號碼牌目前在隊伍中的位置（1 起算），已進入處理則為 0。"""
+        with self._cond:
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def eta(self, position):
+        return position * self._avg_service_time / self.slots
+
+    def _try_admit(self, ticket, wait):
+        with self._cond:
+            if not self._ready(ticket):
+                self._cond.wait(wait)
+            if self._ready(ticket):
+                self._waiting.popleft()
+                self._running += 1
+                self._cond.notify_all()
+                return True
+            return False
+
+    def _ready(self, ticket):
+        return self._waiting[0] == ticket and self._running < self.slots
+
+    def _leave(self, ticket, service_time=None):
+        with self._cond:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            else:
+                self._running -= 1
+            if service_time is not None:
+                # 以指數移動平均估計每筆處理時間
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+            self._cond.notify_all()
+
+    def _acquire_key(self, key, deadline):
+        with self._key_mutex:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        if entry[0].acquire(timeout=max(deadline - time.monotonic(), 0)):
+            return True
+        self._release_key(key, locked=False)
+        return False
+
+    def _release_key(self, key, locked=True):
+        with self._key_mutex:
+            entry = self._key_locks[key]
+            if locked:
+                entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[key]
+
+    @contextmanager
+    def admit(self, key=None, timeout=None, on_wait=None):
+        timeout = self.max_wait if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        # 先取得員工的互斥鎖再排隊，重複送出的請求等待時不佔用處理名額
+        if key is not None and not self._acquire_key(key, deadline):
+            raise AdmissionTimeout("同一員工的申請正在處理中")
+        try:
+            ticket = next(self._tickets)
+            with self._cond:
+                self._waiting.append(ticket)
+
+            try:
+                while not self._try_admit(ticket, self.poll_interval):
+                    if time.monotonic() >= deadline:
+                        raise AdmissionTimeout("排隊等待逾時")
+                    if on_wait:
+                        position = self.position(ticket)
+                        on_wait(position, self.eta(position))
+            except BaseException:
+                self._leave(ticket)
+                raise
+
+            started = time.monotonic()
+            try:
+                yield ticket
+            finally:
+                self._leave(ticket, time.monotonic() - started)
+        finally:
+            if key is not None:
+                self._release_key(key)
@@ -0,0 +1,56 @@
+####################################################################
+# 審核頁面的批次寫入
+####################################################################
+def changed_rows(original, edited, columns, flag=None):
+    """
+    比對 data_editor 編輯前後的 DataFrame，回傳 columns 有變動的列；
+    指定 flag（例如「更新資訊」勾選欄）時，有勾選的列也一併回傳。
+    """
+    import pandas as pd
+
+    before = original.reindex(edited.index)
+    mask = pd.Series(False, index=edited.index)
+    for column in columns:
+        old, new = before[column], edited[column]
+        mask |= ~((old == new) | (old.isna() & new.isna()))
+    if flag is not None:
+        mask |= edited[flag].fillna(False).astype(bool)
+    return edited[mask]
+
+
+def records(df, columns):
+    """把 DataFrame 欄位轉成 sqlite3 可綁定的 tuple（NaN => None、numpy 型別 => Python 型別）。"""
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), None)
+    return [
+        tuple(value.item() if hasattr(value, 'item') else value for value in row)
+        for row in values.itertuples(index=False, name=None)
+    ]
+
+
+class Batch:
+    """累積多組 executemany，依序執行並回傳各組影響筆數。"""
+
+    def __init__(self):
+        self.statements = []
+
+    def add(self, label, sql, rows):
+        rows = list(rows)
+        if rows:
+            self.statements.append((label, sql, rows))
+        return self
+
+    def __bool__(self):
+        return bool(self.statements)
+
+    def execute(self, target):
+        """target 為 sqlite3 連線或 Repository；交易由呼叫端負責。"""
+        summary = {}
+        for label, sql, rows in self.statements:
+            cursor = target.executemany(sql, rows)
+            summary[label] = summary.get(label, 0) + max(cursor.rowcount, 0)
+        return summary
+
+
+def format_summary(summary):
+    return '、'.join(f"{label} {count} 筆" for label, count in summary.items()) or '沒有需要更新的資料'
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+####################################################################
+# 寫入日誌（write-ahead changelog）
+####################################################################
+class Changelog:
+    """
+    只增不改的寫入日誌：
+    - record(): 先把 SQL 寫進日誌檔並 fsync，再寫入本機資料庫，立即回傳
+    - 背景執行緒每 interval 秒把累積的變更整批上傳一次，上傳成功後只截斷確認已在上傳快照中的日誌，
+      並從 _changelog 刪除已截斷的 id
+    - 重新啟動時 replay() 會補套用尚未出現在資料庫中的日誌（以 _changelog 表去重）
+    - 上傳時遠端已被更新，則由 rebase() 把日誌重新套用到遠端最新版後再上傳
+    """
+
+    def __init__(self, path, database, interval=5):
+        self.path = path
+        self.database = database
+        self.interval = interval
+        self._lock = threading.RLock()
+        self._flusher = None
+
+    def record(self, statements):
+        """
+        statements 為 [(sql, params), ...]，於同一個交易中套用。
+        每次都在日誌鎖內重新連線：rebase() 與 sync() 會以 os.replace 替換本機檔案，
+        事先開好的連線會寫到已被取代的舊檔。
+        """
+        entry = {
+            'id': uuid.uuid4().hex,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'statements': [[sql, list(params)] for sql, params in statements],
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            conn = sqlite3.connect(self.database.local_path)
+            try:
+                self._apply(conn, entry)
+            except Exception:
+                # 沒寫入資料庫就不留在日誌中，避免呼叫端以為失敗的申請之後又被補寫
+                self._truncate({entry['id']})
+                raise
+            finally:
+                conn.close()
+            self.database.mark_dirty()
+        return entry['id']
+
+    def _apply(self, conn, entry):
+        conn.execute('CREATE TABLE IF NOT EXISTS _changelog (id TEXT PRIMARY KEY, 套用時間 TEXT)')
+        if conn.execute('SELECT 1 FROM _changelog WHERE id = ?', (entry['id'],)).fetchone():
+            return False
+        try:
+            for sql, params in entry['statements']:
+                conn.execute(sql, params)
+            conn.execute('INSERT INTO _changelog (id, 套用時間) VALUES (?, ?)',
+                         (entry['id'], datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return True
+
+    def _read(self):
+        entries = []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 寫到一半當機留下的殘行，略過
+                        break
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _truncate(self, ids):
+        """移除指定 id 的日誌（已確認在上傳的快照中）。"""
+        entries = [entry for entry in self._read() if entry['id'] not in ids]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def pending(self):
+        return len(self._read())
+
+    def replay(self):
+        """把日誌中尚未套用的變更補寫入本機資料庫，回傳補寫筆數。"""
+        with self._lock:
+            entries = self._read()
+            if not entries:
+                return 0
+            applied = 0
+            conn = sqlite3.connect(self.database.local_path)
+            try:
+                for entry in entries:
+                    try:
+                        applied += self._apply(conn, entry)
+                    except sqlite3.Error as e:
+                        # 留在日誌中，下次上傳前再試，不截斷
+                        print(f"寫入日誌 {entry['id']} 套用失敗: {e}")
+            finally:
+                conn.close()
+            if applied:
+                self.database.mark_dirty(applied)
+            return applied
+
+    @staticmethod
+    def _applied_ids(path):
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS _changelog (id TEXT PRIMARY KEY, 套用時間 TEXT)')
+            return {row[0] for row in conn.execute('SELECT id FROM _changelog')}
+        finally:
+            conn.close()
+
+    def _prune(self):
+        """
+        截斷日誌後，從 _changelog 刪除日誌中已沒有的 id（去重只需涵蓋仍可能補寫的日誌），
+        避免每筆申請在共用資料庫留下一列。不標記為待上傳，隨下一次上傳一併送出。
+        """
+        keep = [entry['id'] for entry in self._read()]
+        with self.database.writing(pending=False):
+            conn = sqlite3.connect(self.database.local_path)
+            try:
+                with conn:
+                    conn.execute('CREATE TEMP TABLE IF NOT EXISTS 保留日誌 (id TEXT PRIMARY KEY)')
+                    conn.execute('DELETE FROM 保留日誌')
+                    conn.executemany('INSERT OR IGNORE INTO 保留日誌 VALUES (?)', [(entry_id,) for entry_id in keep])
+                    conn.execute('DELETE FROM _changelog WHERE id NOT IN (SELECT id FROM 保留日誌)')
+            finally:
+                conn.close()
+
+    def rebase(self, remote_path):
+        """
+        作為 SyncedDatabase 的 merge：遠端已被其他程式更新時，
+        把日誌中尚未上傳的變更套用到遠端最新版，再以它取代本機檔案。
+        """
+        with self._lock:
+            conn = sqlite3.connect(remote_path)
+            try:
+                for entry in self._read():
+                    self._apply(conn, entry)
+            finally:
+                conn.close()
+            os.replace(remote_path, self.database.local_path)
+
+    def flush(self):
+        """
+        上傳目前為止已套用的變更。上傳前先補套用日誌中尚未出現在本機資料庫的變更，
+        上傳後只截斷確認已在上傳快照中的日誌；沒有上傳時日誌保持不動。
+        """
+        # 補寫時持有日誌鎖；上傳時不持有，新的申請仍可立即寫入
+        if not self._read() and not self.database.dirty:
+            return False
+        self.replay()
+        uploaded = set()
+        # 在實際上傳的快照上讀取已套用的日誌 id
+        pushed = self.database.flush(force=True, inspect=lambda path: uploaded.update(self._applied_ids(path)))
+        with self._lock:
+            if not pushed:
+                if self.database.dirty:
+                    return False
+                # 沒有待上傳的變更：本機資料庫即遠端版本，其中已有的日誌可以截斷
+                uploaded = self._applied_ids(self.database.local_path)
+            remaining = self._read()
+            if any(entry['id'] in uploaded for entry in remaining):
+                self._truncate(uploaded)
+                self._prune()
+        return pushed
+
+    def start(self):
+        """補寫日誌後啟動背景上傳執行緒（重複呼叫無作用）。"""
+        if self._flusher is not None:
+            return
+        self.replay()
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"寫入日誌上傳失敗: {e}")
+        self._flusher = threading.Thread(target=run, name='changelog-flush', daemon=True)
+        self._flusher.start()
@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+
+####################################################################
+# 車位重複分配檢查
+####################################################################
+# 車位佔用記錄每個期別、車位目前由誰持有，由觸發程序隨抽籤繳費、免申請、免申請繳費、繳費紀錄的寫入同步更新，
+# 查詢重複車位只需讀索引，不必重新載入各表。
+# 編號 = 來源資料列 rowid * 8 + 資料表代號；免申請的期別為 NULL 時表示每一期都佔用該車位。
+# 同一人在多個表持有同一車位（例如免申請與免申請繳費）不算重複。
+# 沒有姓名代號的資料（例如公務車、公務保留）各自算一個持有人，以「來源:rowid」表示。
+OCCUPANCY_TABLE = '車位佔用'
+HOLDER = "COALESCE(姓名代號, 來源 || ':' || (編號 / 8))"
+SOURCE_TABLES = {
+    '抽籤繳費': 1,
+    '免申請': 2,
+    '免申請繳費': 3,
+    '繳費紀錄': 4,
+}
+
+# 某一期被兩人以上持有的車位；?1 為期別
+CONFLICT_SPACES = f"""
+    SELECT 車位編號 FROM {OCCUPANCY_TABLE}
+    WHERE 期別 = ?1 OR 期別 IS NULL
+    GROUP BY 車位編號 HAVING COUNT(DISTINCT {HOLDER}) > 1
+    """
+# 上述車位各自的持有人
+CONFLICT_HOLDERS = f"""
+    SELECT 車位編號, {HOLDER} AS 持有人 FROM {OCCUPANCY_TABLE}
+    WHERE (期別 = ?1 OR 期別 IS NULL) AND 車位編號 IN ({CONFLICT_SPACES})
+    GROUP BY 車位編號, 持有人
+    ORDER BY 車位編號, 持有人
+    """
+
+
+class SpaceConflict(RuntimeError):
+    """寫入後會有車位同時分配給兩人以上，交易應回滾。"""
+
+    def __init__(self, period, conflicts):
+        self.period = period
+        self.conflicts = conflicts
+        details = '；'.join(f"{space}：{'、'.join(holders)}" for space, holders in conflicts.items())
+        super().__init__(f"{period} 期車位重複分配 {details}")
+
+
+def _values(table, prefix):
+    return (f"{prefix}.rowid * 8 + {SOURCE_TABLES[table]}, {prefix}.期別, {prefix}.車位編號, "
+            f"{prefix}.姓名代號, '{table}'")
+
+
+def occupancy_statements():
+    """建立車位佔用表、索引，以及各來源資料表同步更新的觸發程序。"""
+    insert = f"INSERT OR REPLACE INTO {OCCUPANCY_TABLE} (編號, 期別, 車位編號, 姓名代號, 來源)"
+    statements = [
+        f"""CREATE TABLE IF NOT EXISTS {OCCUPANCY_TABLE} (
+            編號 INTEGER PRIMARY KEY,
+            期別 TEXT,
+            車位編號 TEXT NOT NULL,
+            姓名代號 TEXT,
+            來源 TEXT NOT NULL
+        )""",
+        f"CREATE INDEX IF NOT EXISTS idx_{OCCUPANCY_TABLE}_期別_車位編號 ON {OCCUPANCY_TABLE} (期別, 車位編號, 姓名代號)",
+    ]
+    for table, code in SOURCE_TABLES.items():
+        # 未分配車位（NULL 或空字串）不佔用
+        assigned = "COALESCE(new.車位編號, '') != ''"
+        delete = f"DELETE FROM {OCCUPANCY_TABLE} WHERE 編號 = old.rowid * 8 + {code};"
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {OCCUPANCY_TABLE}_{table}_新增 AFTER INSERT ON {table}
+            WHEN {assigned} BEGIN
+                {insert} VALUES ({_values(table, 'new')});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {OCCUPANCY_TABLE}_{table}_修改 AFTER UPDATE OF 期別, 姓名代號, 車位編號 ON {table} BEGIN
+                {delete}
+                {insert} SELECT {_values(table, 'new')} WHERE {assigned};
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {OCCUPANCY_TABLE}_{table}_刪除 AFTER DELETE ON {table} BEGIN
+                {delete}
+            END""",
+        ]
+    return statements
+
+
+def rebuild_occupancy(conn):
+    """清空後依各來源資料表重建車位佔用（VACUUM 重新編排 rowid 後使用）。"""
+    conn.execute(f"DELETE FROM {OCCUPANCY_TABLE}")
+    for table in SOURCE_TABLES:
+        conn.execute(f"INSERT INTO {OCCUPANCY_TABLE} (編號, 期別, 車位編號, 姓名代號, 來源) "
+                     f"SELECT {_values(table, table)} FROM {table} WHERE COALESCE(車位編號, '') != ''")
+
+
+def create_occupancy(conn):
+    """資料庫升級時呼叫：建立車位佔用與觸發程序並匯入現有資料。"""
+    for statement in occupancy_statements():
+        conn.execute(statement)
+    rebuild_occupancy(conn)
+
+
+def _query(target, sql, params):
+    # target 為 Repository 或 sqlite3 連線
+    if hasattr(target, 'query'):
+        return target.query(sql, params, name='conflicts')
+    return target.execute(sql, params).fetchall()
+
+
+def conflicts(target, period):
+    """回傳 {車位編號: [持有人姓名代號, ...]}，只含該期被兩人以上持有的車位。"""
+    rows = _query(target, CONFLICT_HOLDERS, (period,))
+    result = {}
+    for space, holder in rows:
+        result.setdefault(space, []).append(holder)
+    return result
+
+
+@contextmanager
+def guard(target, period):
+    """
+    在交易內包住寫入：寫入後若該期出現新的重複車位（或既有重複車位又多了持有人）就丟出 SpaceConflict，
+    由呼叫端的交易回滾。寫入前已存在且未變動的重複不影響其他資料的更新。
+    """
+    before = conflicts(target, period)
+    yield
+    added = {space: holders for space, holders in conflicts(target, period).items()
+             if before.get(space) != holders}
+    if added:
+        raise SpaceConflict(period, added)
@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field
+
+####################################################################
+# 申請資格判斷
+####################################################################
+# 一次查出員工在本期、上期、上上期的申請與繳費紀錄，外加身障紀錄與車牌是否已審核
+HISTORY_QUERY = """
+    SELECT '申請', 期別, 身分註記, NULL FROM 申請紀錄
+    WHERE 姓名代號 = :employee_id AND 期別 IN (:current, :previous1, :previous2)
+    UNION ALL
+    SELECT '身障', 期別, 身分註記, NULL FROM 申請紀錄
+    WHERE 姓名代號 = :employee_id AND 身分註記 = '身心障礙'
+    UNION ALL
+    SELECT '繳費', 期別, NULL, 繳費狀態 FROM 抽籤繳費
+    WHERE 姓名代號 = :employee_id AND 期別 IN (:previous1, :previous2)
+    UNION ALL
+    SELECT '車牌', NULL, NULL, NULL FROM 使用者車牌
+    WHERE 姓名代號 = :employee_id AND 車牌號碼 = :car_number
+"""
+
+UPLOAD_SUBJECT = "本期停車補證明文件通知"
+
+
+@dataclass
+class History:
+    current: str
+    previous1: str
+    previous2: str
+    applications: set = field(default_factory=set)   # {(期別, 身分註記)}
+    payments: set = field(default_factory=set)       # {(期別, 繳費狀態)}
+    has_disability_record: bool = False
+    has_approved_car: bool = False
+
+    def applied(self, period, *identities):
+        return any(p == period and (not identities or identity in identities)
+                   for p, identity in self.applications)
+
+    def paid(self, period, *statuses):
+        return any(p == period and status in statuses for p, status in self.payments)
+
+    def pregnant_status(self):
+        last = self.applied(self.previous1, '孕婦')
+        before_last = self.applied(self.previous2, '孕婦')
+        if last and before_last:
+            return "both"
+        elif last:
+            return "only_last_period"
+        elif before_last:
+            return "only_before_last_period"
+        return "none"
+
+
+@dataclass
+class Decision:
+    """
+    route:
+      'reject' => 顯示 message 錯誤訊息，不寫入
+      'insert' => 直接寫入申請紀錄（車牌綁定），顯示 message 並寄信
+      'upload' => 需補件，上傳完成後才寫入，並顯示 message
+    """
+    route: str
+    message: str
+    special_needs: str = None
+    should_insert_parking_fee: bool = False
+    email_text: str = None
+    email_subject: str = None
+    upload_prompt: str = None
+
+    @property
+    def car_bind(self):
+        return self.route == 'insert'
+
+    def pending_insert(self, unit, name, car_number, employee_id, contact_info, current):
+        """補件頁面所需的暫存資料（st.session_state['pending_insert']）。"""
+        return {
+            "unit": unit,
+            "name": name,
+            "car_number": car_number,
+            "employee_id": employee_id,
+            "special_needs": self.special_needs,
+            "contact_info": contact_info,
+            "car_bind": False,
+            "current": current,
+            "should_insert_parking_fee": self.should_insert_parking_fee,
+            "email_text": self.email_text,
+            "email_subject": self.email_subject,
+            "success_message": self.message,
+            "upload_prompt": self.upload_prompt,
+        }
+
+
+def fetch_history(cursor, employee_id, car_number, current, previous1, previous2):
+    history = History(current, previous1, previous2)
+    cursor.execute(HISTORY_QUERY, {
+        'employee_id': employee_id, 'car_number': car_number,
+        'current': current, 'previous1': previous1, 'previous2': previous2,
+    })
+    for kind, period, identity, status in cursor.fetchall():
+        if kind == '申請':
+            history.applications.add((period, identity))
+        elif kind == '身障':
+            history.has_disability_record = True
+        elif kind == '繳費':
+            history.payments.add((period, status))
+        elif kind == '車牌':
+            history.has_approved_car = True
+    return history
+
+
+def decide(history, special_needs):
+    """依申請身分與歷史紀錄決定處理方式，不做任何 I/O。"""
+    if history.applied(history.current):
+        return Decision('reject', '您已經在本期提交過申請，請勿重複提交，如需修正請聯繫管理組(6395)!')
+
+    car = history.has_approved_car
+
+    if special_needs == '孕婦':
+        status = history.pregnant_status()
+        if status == 'none':
+            return Decision('upload', "本期『孕婦申請』已完成，感謝您補件。", '孕婦', False,
+                            "您為第一次孕婦申請，請上傳孕婦手冊、行照、駕照等證明文件。", UPLOAD_SUBJECT)
+        elif status == 'only_last_period':
+            if car:
+                return Decision('insert', '本期"孕婦"身分停車申請成功', '孕婦', True,
+                                "您有孕婦資格，本期停車申請成功，感謝您。", "本期停車申請成功通知")
+            return Decision('upload', "本期『孕婦申請』已完成，感謝您補件。系統已為您預留孕婦車位。", '孕婦', True,
+                            "您有孕婦資格，但此車為第一次申請，請上傳孕婦資格證明文件及車輛文件。", UPLOAD_SUBJECT)
+        else:
+            # 已過孕婦資格 => 轉一般
+            if car:
+                return Decision('insert', '您已過孕婦申請期，系統自動改為一般申請成功。', '一般', False,
+                                "您已過孕婦申請期，系統自動將您轉為一般申請，感謝您。", "本期停車申請成功通知")
+            return Decision('upload', "本期『一般申請』已完成，感謝您補件。", '一般', False,
+                            "您已過孕婦申請期，但此車為第一次申請一般停車，請上傳車輛證明文件。", UPLOAD_SUBJECT)
+
+    elif special_needs == '身心障礙':
+        if history.has_disability_record:
+            if car:
+                return Decision('insert', '本期"身心障礙"停車申請成功', '身心障礙', True,
+                                "您有身心障礙資格，本期停車申請成功。", "本期停車申請成功通知")
+            return Decision('upload', "本期『身心障礙』已完成，感謝您補件。系統已為您預留身障車位。", '身心障礙', True,
+                            "您有身心障礙資格，但此車為第一次申請，請上傳身障證明與車輛證明文件。", UPLOAD_SUBJECT)
+        # 第一次身障申請 => 需補件
+        return Decision('upload', "本期『身心障礙申請』已完成，感謝您補件。", '身心障礙', False,
+                        "您為第一次身心障礙申請，請上傳身障證明、行照、駕照等文件。", UPLOAD_SUBJECT)
+
+    # 一般：上期已確定停車 => 不得申請
+    if history.paid(history.previous1, '已繳費', '轉讓') and history.applied(history.previous1, '一般', '保障'):
+        return Decision('reject', '您上期已確認停車，請下期再申請停車位!')
+
+    # 連兩期都未抽中 => 保障
+    if history.paid(history.previous2, '未繳費') and history.paid(history.previous1, '未繳費'):
+        if car:
+            return Decision('insert', '您前兩期都未抽中，本期獲得保障車位!', '保障', True,
+                            "您連續兩期都有申請，且都未中籤，本期獲得保障車位。", "本期停車申請成功並獲得保障車位")
+        return Decision('upload', "本期『保障車位申請』已完成，感謝您補件。系統已為您預留保障車位。", '保障', True,
+                        "您前兩期都未中籤，本期享保障車位，但此車為第一次申請。請上傳車輛證明文件。", UPLOAD_SUBJECT)
+
+    # 上期曾是孕婦 => 自動帶入孕婦
+    if history.pregnant_status() == 'only_last_period':
+        if car:
+            return Decision('insert', '您上期孕婦申請成功，本期自動帶入孕婦車位!', '孕婦', True,
+                            "您上期孕婦申請成功，本期自動帶入孕婦身份，獲得保障。", "本期停車申請成功並改為孕婦身份")
+        return Decision('upload', "本期『孕婦申請』已完成，感謝您補件。", '孕婦', True,
+                        "您上期孕婦申請成功，但此車為第一次申請，請上傳孕婦/車輛證明文件。", UPLOAD_SUBJECT)
+
+    # 純一般申請
+    if car:
+        return Decision('insert', '本期一般車位申請成功!', special_needs, False,
+                        "本期您一般身分停車抽籤申請成功，感謝您。", "本期停車抽籤申請成功通知")
+    return Decision('upload', "本期『一般申請』已完成，感謝您補件。", special_needs, False,
+                    "您為第一次申請一般車位，請上傳車輛證明文件。", UPLOAD_SUBJECT,
+                    "該車號為第一次申請停車，請上傳相關證明檔案。")
+
+
+def evaluate(cursor, employee_id, car_number, special_needs, current, previous1, previous2):
+    history = fetch_history(cursor, employee_id, car_number, current, previous1, previous2)
+    return decide(history, special_needs)
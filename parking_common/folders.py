@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+####################################################################
+# Drive 子資料夾 ID 快取
+####################################################################
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def find_folders(service, parent_folder_id, name):
+    """依建立時間排序，回傳同名子資料夾的 ID 清單。"""
+    query = (
+        f"name = '{_quote(name)}' "
+        f"and '{_quote(parent_folder_id)}' in parents "
+        f"and mimeType = '{FOLDER_MIME_TYPE}' "
+        f"and trashed=false"
+    )
+    response = service.files().list(q=query, spaces='drive', orderBy='createdTime',
+                                    fields='files(id, name)').execute()
+    return [folder['id'] for folder in response.get('files', [])]
+
+
+def create_folder(service, parent_folder_id, name):
+    """
+    建立子資料夾；若其他行程同時也建立了同名資料夾，保留最早建立的一個並刪除自己建立的。
+    """
+    metadata = {'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_folder_id]}
+    folder_id = service.files().create(body=metadata, fields='id').execute()['id']
+    existing = find_folders(service, parent_folder_id, name)
+    if existing and existing[0] != folder_id:
+        service.files().update(fileId=folder_id, body={'trashed': True}).execute()
+        return existing[0]
+    return folder_id
+
+
+class FolderCache:
+    """
+    以 (parent_folder_id, 名稱) 為鍵的資料夾 ID 快取，同一個行程內共用並寫入 path 保存。
+    - 同一個鍵同時有多個 session 查詢時，只有一個會呼叫 Drive，其餘等待結果（single-flight）
+    - create=False 查無資料夾時記錄「不存在」negative_ttl 秒，避免重複查詢
+    - 資料夾被刪除等情況可呼叫 invalidate() 移除快取
+    """
+
+    def __init__(self, service, path, negative_ttl=60):
+        self.service = service
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._missing = {}
+        self._ids = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return {tuple(key.split('\x1f', 1)): value for key, value in json.load(f).items()}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'\x1f'.join(key): value for key, value in self._ids.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def resolve(self, parent_folder_id, name, create=True):
+        """回傳資料夾 ID；create=False 且不存在時回傳 None。"""
+        key = (parent_folder_id, name)
+        while True:
+            with self._lock:
+                if key in self._ids:
+                    return self._ids[key]
+                if not create and time.monotonic() < self._missing.get(key, 0):
+                    return None
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            # 其他 session 正在查詢同一個資料夾，等它完成後重新讀取快取
+            event.wait()
+
+        try:
+            folders = find_folders(self.service, parent_folder_id, name)
+            if folders:
+                folder_id = folders[0]
+            elif create:
+                folder_id = create_folder(self.service, parent_folder_id, name)
+            else:
+                folder_id = None
+            with self._lock:
+                if folder_id is None:
+                    self._missing[key] = time.monotonic() + self.negative_ttl
+                else:
+                    self._ids[key] = folder_id
+                    self._missing.pop(key, None)
+                    self._save()
+            return folder_id
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def invalidate(self, parent_folder_id, name):
+        with self._lock:
+            if self._ids.pop((parent_folder_id, name), None) is not None:
+                self._save()
+            self._missing.pop((parent_folder_id, name), None)
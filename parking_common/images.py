@@ -0,0 +1,94 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from parking_common.uploads import UploadJob
+
+####################################################################
+# 附件圖片前處理
+####################################################################
+IMAGE_TYPES = {'image/jpeg', 'image/jpg', 'image/png'}
+
+
+@dataclass
+class ImageSettings:
+    """
+    max_side：長邊縮到多少像素（證件照 2000px 已足夠審核）
+    quality：JPEG 壓縮品質
+    combine_pdf：多張照片合併成一個 PDF
+    workers：同時處理的圖片數（Pillow 解碼、縮圖、編碼時會釋放 GIL）
+    """
+    max_side: int = 2000
+    quality: int = 80
+    combine_pdf: bool = False
+    workers: int = 3
+
+
+def _load(data, max_side):
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    # JPEG 可直接以 1/2、1/4、1/8 的尺寸解碼，省下大部分解碼時間
+    if image.format == 'JPEG':
+        image.draft('RGB', (max_side, max_side))
+    # 先依 EXIF 方向轉正，之後重新編碼時不再帶 EXIF（含拍攝位置等個資）
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+def _jpeg_name(name):
+    return os.path.splitext(name)[0] + '.jpg'
+
+
+def shrink(job, settings):
+    """把一張圖片轉正、縮圖、去除 EXIF 後重新存成 JPEG；非圖片或無法解碼的檔案原樣回傳。"""
+    from PIL import UnidentifiedImageError
+
+    if job.mimetype not in IMAGE_TYPES:
+        return job
+    try:
+        image = _load(job.data, settings.max_side)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=settings.quality, optimize=True, progressive=True)
+    except (UnidentifiedImageError, OSError) as e:
+        # 檔案損毀或副檔名與內容不符：照原檔上傳，由審核人員判斷
+        print(f"圖片 {job.name} 無法處理，改上傳原檔: {e}")
+        return job
+    return UploadJob(_jpeg_name(job.name), buffer.getvalue(), 'image/jpeg')
+
+
+def combine_pdf(jobs, name, settings):
+    """把多張圖片依序合併成一個 PDF。"""
+    from PIL import Image
+
+    pages = [Image.open(io.BytesIO(job.data)) for job in jobs]
+    buffer = io.BytesIO()
+    pages[0].save(buffer, 'PDF', save_all=True, append_images=pages[1:], resolution=150.0,
+                  quality=settings.quality)
+    return UploadJob(name, buffer.getvalue(), 'application/pdf')
+
+
+def prepare(jobs, settings=None, pdf_name=None):
+    """
+    上傳前的前處理：圖片平行縮圖壓縮；combine_pdf 時把所有圖片合併成 pdf_name，
+    原本就是 PDF 的附件與無法解碼的圖片維持不變。
+    """
+    settings = settings or ImageSettings()
+    with ThreadPoolExecutor(max_workers=settings.workers, thread_name_prefix='image') as executor:
+        shrunk = list(executor.map(lambda job: shrink(job, settings), jobs))
+    # 只合併成功重新編碼的圖片；原樣回傳的檔案（PDF、無法解碼的圖片）另外上傳
+    images = [job for job, original in zip(shrunk, jobs) if job is not original]
+    others = [job for job, original in zip(shrunk, jobs) if job is original]
+    jobs = shrunk
+    if settings.combine_pdf and pdf_name and len(images) > 1:
+        jobs = [combine_pdf(images, pdf_name, settings)] + others
+    return jobs
@@ -0,0 +1,161 @@
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+
+from parking_common.conflicts import HOLDER, OCCUPANCY_TABLE
+
+####################################################################
+# 免申請停車資料批次匯入
+####################################################################
+# 逐段讀取 CSV／XLSX（不必整個檔案轉成 DataFrame），每段以一次查詢比對既有車牌、車位，
+# 通過檢查的列由呼叫端在一個交易內寫入，錯誤逐列回報。
+COLUMNS = ['期別', '姓名代號', '姓名', '單位', '車牌號碼', '聯絡電話', '身分註記', '車位編號']
+REQUIRED = ['姓名代號', '姓名', '車牌號碼', '身分註記']
+CHUNK_SIZE = 200
+PERIOD_PATTERN = re.compile(r'\d{5}')   # 民國年 3 碼 + 季 2 碼，例如 11402
+
+INSERT_NO_APPLICATION = f"""
+INSERT INTO 免申請 ({','.join(COLUMNS)})
+VALUES ({','.join('?' * len(COLUMNS))})
+"""
+
+
+class ImportFormatError(ValueError):
+    """檔案無法讀取或缺少必要欄位，整個檔案都不匯入。"""
+
+
+@dataclass
+class ImportReport:
+    rows: list = field(default_factory=list)     # 通過檢查、可寫入的資料（順序同 COLUMNS）
+    errors: list = field(default_factory=list)   # [(列號, 姓名代號, 錯誤說明)]
+    total: int = 0
+
+
+def template_csv():
+    """匯入範本：只有標題列（UTF-8 BOM，Excel 直接開啟不會亂碼）。"""
+    return (','.join(COLUMNS) + '\r\n').encode('utf-8-sig')
+
+
+def _text(value):
+    # Excel 的數字欄位（員工編號、期別）會讀成 int / float
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _rows(header, records, first_line):
+    header = [_text(name) for name in header]
+    missing = [name for name in COLUMNS if name not in header]
+    if missing:
+        raise ImportFormatError(f"缺少欄位：{'、'.join(missing)}")
+    positions = [header.index(name) for name in COLUMNS]
+    for line, record in enumerate(records, first_line):
+        record = list(record)
+        yield line, [record[i] if i < len(record) else None for i in positions]
+
+
+def read_rows(file, filename):
+    """逐列產生 (列號, [依 COLUMNS 順序的值])；列號同試算表，標題為第 1 列。空白列由 validate 略過。"""
+    if filename.lower().endswith('.xlsx'):
+        # 只有匯入 Excel 時才需要 openpyxl
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFormatError(f"無法讀取 Excel 檔案：{e}") from e
+        try:
+            records = workbook.worksheets[0].iter_rows(values_only=True)
+            yield from _rows(next(records, None) or [], records, 2)
+        finally:
+            workbook.close()
+    elif filename.lower().endswith('.csv'):
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        try:
+            yield from _rows(next(reader, None) or [], reader, 2)
+        except UnicodeDecodeError as e:
+            raise ImportFormatError("CSV 檔案須為 UTF-8 編碼") from e
+    else:
+        raise ImportFormatError("只支援 .csv 或 .xlsx 檔案")
+
+
+def chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _lookup(target, sql, values, *more):
+    # sql 中的 {placeholders} 依序代入 values 與 more 各組的參數
+    values = list(values)
+    if not values:
+        return []
+    groups = [values] + [list(group) for group in more]
+    sql = sql.format(*[','.join('?' * len(group)) for group in groups], placeholders=','.join('?' * len(values)))
+    values = [value for group in groups for value in group]
+    if hasattr(target, 'query'):
+        return target.query(sql, values, name='import_lookup')
+    return target.execute(sql, values).fetchall()
+
+
+def validate(target, rows, identities, period, chunk_size=CHUNK_SIZE):
+    """
+    檢查每一列：必填欄位、身分註記、期別格式、車牌是否已在免申請或在檔案中重複、
+    車位是否存在以及該期是否已分配給其他人。未填期別的列以 period 檢查車位。
+    rows 為 (列號, 依 COLUMNS 順序的值) 的 iterable（read_rows 或頁面表格）；target 為 Repository 或 sqlite3 連線。
+    """
+    report = ImportReport()
+    seen_cars, seen_spaces = {}, {}
+    for chunk in chunks(rows, chunk_size):
+        chunk = [(line, [_text(value) for value in values]) for line, values in chunk]
+        chunk = [(line, values) for line, values in chunk if any(values)]
+        report.total += len(chunk)
+        cars = {values[4] for _, values in chunk if values[4]}
+        spaces = {values[7] for _, values in chunk if values[7]}
+        existing_cars = {car for (car,) in _lookup(
+            target, "SELECT 車牌號碼 FROM 免申請 WHERE 車牌號碼 IN ({placeholders})", cars)}
+        known_spaces = {space for (space,) in _lookup(
+            target, "SELECT 車位編號 FROM 停車位 WHERE 車位編號 IN ({placeholders})", spaces)}
+        periods = {values[0] or period for _, values in chunk}
+        holders = {}
+        for space, holder_period, holder in _lookup(target, f"""
+                SELECT 車位編號, 期別, {HOLDER} FROM {OCCUPANCY_TABLE}
+                WHERE 車位編號 IN ({{0}}) AND (期別 IS NULL OR 期別 IN ({{1}}))
+                """, spaces, periods):
+            holders.setdefault(space, []).append((holder_period, holder))
+
+        for line, values in chunk:
+            row = dict(zip(COLUMNS, values))
+            employee_id, car, space = row['姓名代號'], row['車牌號碼'], row['車位編號']
+            row_period = row['期別'] or period
+            errors = [f"{name}未填" for name in REQUIRED if not row[name]]
+            if row['身分註記'] and row['身分註記'] not in identities:
+                errors.append(f"身分註記「{row['身分註記']}」不在可選項目內")
+            if row['期別'] and not PERIOD_PATTERN.fullmatch(row['期別']):
+                errors.append(f"期別「{row['期別']}」格式錯誤（例如 11402）")
+            if car in existing_cars:
+                errors.append(f"車牌 {car} 已在免申請名單")
+            elif car in seen_cars:
+                errors.append(f"車牌 {car} 與第 {seen_cars[car]} 列重複")
+            if space:
+                others = sorted({holder for holder_period, holder in holders.get(space, [])
+                                 if holder != employee_id and holder_period in (None, row_period)})
+                if space not in known_spaces:
+                    errors.append(f"查無車位 {space}")
+                elif others:
+                    errors.append(f"車位 {space} 已分配給 {'、'.join(others)}")
+                elif space in seen_spaces and seen_spaces[space][1] != employee_id:
+                    errors.append(f"車位 {space} 與第 {seen_spaces[space][0]} 列重複")
+            if errors:
+                report.errors.append((line, employee_id, '；'.join(errors)))
+                continue
+            seen_cars[car] = line
+            if space:
+                seen_spaces.setdefault(space, (line, employee_id))
+            report.rows.append(tuple(values))
+    return report
@@ -0,0 +1,220 @@
+import hashlib
+import secrets
+from dataclasses import dataclass, field
+
+import numpy as np
+
+####################################################################
+# 抽籤引擎
+####################################################################
+# 每種方式都是 order(rng, participants, **context) => 參與者索引的抽籤順序，
+# 前 len(spaces) 位依序分到車位，其餘依序為備取
+STRATEGY_LABELS = {
+    'uniform': '一般隨機',
+    'weighted': '依連續未中籤期數加權',
+    'stratified': '依單位人數比例分層',
+}
+
+
+def new_seed():
+    """由作業系統的密碼學亂數產生 128 位元種子，記錄下來即可重現同一次抽籤。"""
+    return secrets.randbits(128)
+
+
+def uniform_order(rng, participants, **context):
+    return rng.permutation(len(participants))
+
+
+def weighted_order(rng, participants, losses=None, base=2.0, **context):
+    """
+    連續未中籤 k 期的權重為 base ** k，以 Efraimidis–Spirakis 做不放回加權抽樣：
+    每人的鍵值為 Exp(1) / 權重，由小到大排序即為抽籤順序。
+    """
+    n = len(participants)
+    if losses is None:
+        return rng.permutation(n)
+    weights = np.power(base, np.asarray(losses, dtype=float))
+    keys = rng.standard_exponential(n) / weights
+    return np.argsort(keys, kind='stable')
+
+
+def stratified_order(rng, participants, spaces=0, **context):
+    """
+    依各單位申請人數比例分配車位（最大餘數法），單位內以隨機順序取出中籤者；
+    中籤者之後接上其餘所有人的隨機順序作為備取。
+    """
+    n = len(participants)
+    permutation = rng.permutation(n)
+    if n == 0 or spaces >= n:
+        return permutation
+    units, codes = np.unique([participant[0] for participant in participants], return_inverse=True)
+    counts = np.bincount(codes, minlength=len(units))
+    exact = counts * spaces / n
+    quotas = np.floor(exact).astype(int)
+    remainder = spaces - quotas.sum()
+    if remainder:
+        # 餘數由小數部分最大的單位依序補上，同分時隨機
+        ties = rng.random(len(units))
+        quotas[np.lexsort((ties, -(exact - quotas)))[:remainder]] += 1
+
+    # 依隨機順序走訪，計算每人在自己單位內的名次
+    shuffled_codes = codes[permutation]
+    by_unit = np.argsort(shuffled_codes, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.empty(n, dtype=int)
+    rank[by_unit] = np.arange(n) - starts[shuffled_codes[by_unit]]
+    winner = rank < quotas[shuffled_codes]
+    return np.concatenate((permutation[winner], permutation[~winner]))
+
+
+STRATEGIES = {
+    'uniform': uniform_order,
+    'weighted': weighted_order,
+    'stratified': stratified_order,
+}
+
+
+def participants_digest(participants):
+    """參與名單（依輸入順序）的 SHA-256，重現抽籤時用來確認名單相同。"""
+    digest = hashlib.sha256()
+    for participant in participants:
+        digest.update(('\x1f'.join(str(value) for value in participant) + '\x1e').encode('utf-8'))
+    return digest.hexdigest()
+
+
+@dataclass
+class Draw:
+    seed: int
+    strategy: str
+    digest: str
+    results: list = field(default_factory=list)     # [(車位編號, 參與者), ...]
+    waitlist: list = field(default_factory=list)    # [參與者, ...]
+
+
+def draw(participants, spaces, strategy='uniform', seed=None, **context):
+    """
+    participants 為 (單位, 姓名, 姓名代號) 等 tuple 的清單，需以固定順序取出（例如 ORDER BY 姓名代號），
+    同一份名單、車位與 seed 一定得到相同結果。
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知的抽籤方式：{strategy}")
+    seed = new_seed() if seed is None else int(seed)
+    rng = np.random.default_rng(seed)
+    order = STRATEGIES[strategy](rng, participants, spaces=len(spaces), **context)
+    ranked = [participants[i] for i in order]
+    return Draw(
+        seed=seed,
+        strategy=strategy,
+        digest=participants_digest(participants),
+        results=list(zip(spaces, ranked)),
+        waitlist=ranked[len(spaces):],
+    )
+
+####################################################################
+# 寫入抽籤結果
+####################################################################
+class LotteryAlreadyDrawn(RuntimeError):
+    """本期已抽過籤，未指定取代時拒絕重複寫入。"""
+
+
+def waitlist_label(index):
+    return f"備取{index + 1:02d}"
+
+
+def result_rows(current, lottery):
+    """抽籤繳費的寫入資料：中籤者為車位編號，其餘依序為備取01、備取02…"""
+    rows = [(current, participant[2], space) for space, participant in lottery.results]
+    rows += [(current, participant[2], waitlist_label(i)) for i, participant in enumerate(lottery.waitlist)]
+    return rows
+
+
+def write_results(conn, current, lottery, drawn_at, replace=False):
+    """
+    在同一個交易內寫入抽籤紀錄與抽籤繳費，回傳寫入筆數。
+    同一期已有抽籤紀錄，或本次參與者在抽籤繳費已有車位／備取（抽籤紀錄建立前抽的期別）時：
+    replace=False 丟出 LotteryAlreadyDrawn；replace=True 則刪除上次抽籤的結果後重寫（若已有人繳費則拒絕）。
+    """
+    rows = result_rows(current, lottery)
+    participants = [(current, employee_id) for _, employee_id, _ in rows]
+    with conn:
+        # 先取得寫入鎖，檢查與寫入之間不會有另一次抽籤插入
+        conn.execute("BEGIN IMMEDIATE")
+        previous = conn.execute("SELECT COUNT(*) FROM 抽籤紀錄 WHERE 期別 = ?", (current,)).fetchone()[0]
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS 本次抽籤 (期別 TEXT, 姓名代號 TEXT)")
+        conn.execute("DELETE FROM 本次抽籤")
+        conn.executemany("INSERT INTO 本次抽籤 VALUES (?, ?)", participants)
+        # 申請時寫入的抽籤繳費沒有車位編號；本次參與者已有車位編號表示已抽過籤（可能早於抽籤紀錄）。
+        # 保障、孕婦、身障等不參加抽籤的人由審核頁面分配車位，不算在內
+        drawn = conn.execute("""
+            SELECT COUNT(*) FROM 抽籤繳費
+            WHERE 期別 = ? AND COALESCE(車位編號, '') != ''
+              AND 姓名代號 IN (SELECT 姓名代號 FROM 本次抽籤)
+        """, (current,)).fetchone()[0]
+        if previous or drawn:
+            if not replace:
+                if previous:
+                    raise LotteryAlreadyDrawn(f"{current} 期已抽籤 {previous} 次")
+                raise LotteryAlreadyDrawn(f"{current} 期已有 {drawn} 筆抽籤結果")
+            settled = conn.execute("""
+                SELECT COUNT(*) FROM 抽籤繳費
+                WHERE 期別 = ? AND 繳費狀態 != '未繳費'
+                  AND 姓名代號 IN (SELECT 姓名代號 FROM 本次抽籤)
+            """, (current,)).fetchone()[0]
+            if settled:
+                raise LotteryAlreadyDrawn(f"{current} 期已有 {settled} 人完成繳費或放棄，無法重新抽籤")
+            conn.execute("""
+                DELETE FROM 抽籤繳費
+                WHERE 期別 = ? AND 姓名代號 IN (SELECT 姓名代號 FROM 本次抽籤)
+            """, (current,))
+        conn.execute(
+            "INSERT INTO 抽籤紀錄 (期別, 抽籤時間, 抽籤方式, 種子, 名單雜湊, 參與人數, 車位數) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (current, drawn_at, lottery.strategy, str(lottery.seed), lottery.digest,
+             len(lottery.results) + len(lottery.waitlist), len(lottery.results))
+        )
+        conn.executemany("INSERT INTO 抽籤繳費 (期別, 姓名代號, 車位編號, 繳費狀態) VALUES (?, ?, ?, '未繳費')", rows)
+    return len(rows)
+
+####################################################################
+# 連續未中籤期數
+####################################################################
+LOSS_HISTORY_QUERY = """
+SELECT A.姓名代號, A.期別,
+       MAX(CASE WHEN B.車位編號 IS NOT NULL AND B.車位編號 NOT LIKE '備取%' THEN 1 ELSE 0 END) AS 中籤
+FROM 申請紀錄 A
+LEFT JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
+WHERE A.期別 >= ? AND A.期別 < ? AND A.身分註記 = '一般'
+GROUP BY A.姓名代號, A.期別
+"""
+
+
+def previous_periods(current, count):
+    """current 之前的 count 個期別，由近到遠（期別格式為民國年 + 兩位數期數）。"""
+    year, quarter = int(current[:-2]), int(current[-2:])
+    periods = []
+    for _ in range(count):
+        quarter -= 1
+        if quarter == 0:
+            year, quarter = year - 1, 4
+        periods.append(f"{year}{quarter:02}")
+    return periods
+
+
+def consecutive_losses(conn, employee_ids, current, periods):
+    """
+    每位員工在 current 之前連續參加抽籤且未中籤的期數；
+    periods 為由近到遠的前幾期期別，中間有一期沒參加或中籤即中斷。
+    """
+    history = {}
+    if not periods:
+        return [0] * len(employee_ids)
+    for employee_id, period, won in conn.execute(LOSS_HISTORY_QUERY, (periods[-1], current)):
+        history.setdefault(employee_id, {})[period] = won
+    losses = []
+    for employee_id in employee_ids:
+        record, streak = history.get(employee_id, {}), 0
+        for period in periods:
+            if record.get(period) != 0:
+                break
+            streak += 1
+        losses.append(streak)
+    return losses
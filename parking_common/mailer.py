@@ -0,0 +1,227 @@
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+####################################################################
+# SMTP 連線池
+####################################################################
+class SMTPConnectionPool:
+    """
+    保留已登入的 SMTP 連線重複使用，避免每封信都重新做 TLS 交握與登入。
+    use_ssl=False 時以一般 SMTP 連線（本機測試用，例如 aiosmtpd）。
+    """
+
+    def __init__(self, host, port, username=None, password=None, size=1,
+                 use_ssl=True, idle_timeout=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.username:
+            server.login(self.username, self.password)
+        return server
+
+    def _alive(self, server, last_used):
+        if time.monotonic() - last_used > self.idle_timeout:
+            return False
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        server = None
+        try:
+            with self._lock:
+                while self._idle and server is None:
+                    candidate, last_used = self._idle.pop()
+                    if self._alive(candidate, last_used):
+                        server = candidate
+                    else:
+                        self._close(candidate)
+            if server is None:
+                server = self._connect()
+            yield server
+        except Exception:
+            # 連線狀態不明，不放回池中
+            if server is not None:
+                self._close(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+            self._slots.release()
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop()[0])
+
+####################################################################
+# 寄信佇列
+####################################################################
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS 寄信佇列 (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    收件人 TEXT NOT NULL,
+    主旨 TEXT NOT NULL,
+    內容 TEXT NOT NULL,
+    狀態 TEXT NOT NULL DEFAULT '待寄送',
+    嘗試次數 INTEGER NOT NULL DEFAULT 0,
+    下次嘗試 REAL NOT NULL DEFAULT 0,
+    錯誤訊息 TEXT,
+    建立時間 TEXT,
+    寄送時間 TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_寄信佇列_狀態 ON 寄信佇列 (狀態, 下次嘗試);
+"""
+
+
+class Mailer:
+    """
+    UI 只呼叫 enqueue() 寫入寄信佇列（獨立的 SQLite 檔，不隨主資料庫上傳）；
+    背景執行緒每次取出一批到期的信件，以同一個 SMTP 連線寄出，
+    連線錯誤與暫時性錯誤（4xx）以指數退避重試，超過 max_attempts 次標記為失敗；
+    收件人被拒或其他永久性錯誤（5xx）第一次就標記為失敗。
+    """
+
+    def __init__(self, outbox_path, pool, sender, batch_size=50,
+                 max_attempts=5, backoff=30, poll_interval=5):
+        self.outbox_path = outbox_path
+        self.pool = pool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._worker = None
+        conn = self._connect()
+        try:
+            conn.executescript(OUTBOX_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.outbox_path, timeout=30)
+
+    def enqueue(self, recipient, subject, body):
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO 寄信佇列 (收件人, 主旨, 內容, 建立時間) VALUES (?, ?, ?, ?)",
+                    (recipient, subject, body, datetime.now().isoformat(timespec='seconds'))
+                )
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def _message(self, recipient, subject, body):
+        message = MIMEMultipart()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "plain"))
+        return message.as_string()
+
+    def send_pending(self):
+        """寄出一批到期的信件，回傳 (成功數, 失敗數)。"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, 收件人, 主旨, 內容, 嘗試次數 FROM 寄信佇列 "
+                "WHERE 狀態 = '待寄送' AND 下次嘗試 <= ? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+            if not rows:
+                return 0, 0
+
+            sent, failed = [], []
+            try:
+                with self.pool.connection() as server:
+                    for row in rows:
+                        message_id, recipient, subject, body, attempts = row
+                        try:
+                            server.sendmail(self.sender, recipient, self._message(recipient, subject, body))
+                            sent.append(message_id)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                            failed.append((row, e))
+            except Exception as e:
+                # 連線或登入失敗：本批尚未寄出的信件都排入重試
+                done = set(sent) | {row[0] for row, _ in failed}
+                failed.extend((row, e) for row in rows if row[0] not in done)
+
+            now = datetime.now().isoformat(timespec='seconds')
+            with conn:
+                conn.executemany("UPDATE 寄信佇列 SET 狀態 = '已寄送', 寄送時間 = ? WHERE id = ?",
+                                 [(now, message_id) for message_id in sent])
+                conn.executemany(
+                    "UPDATE 寄信佇列 SET 狀態 = ?, 嘗試次數 = ?, 下次嘗試 = ?, 錯誤訊息 = ? WHERE id = ?",
+                    [self._retry(row, error) for row, error in failed]
+                )
+            return len(sent), len(failed)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _permanent(error):
+        # 收件人被拒、信件內容被拒（5xx）重寄也不會成功；連線、登入錯誤一律重試
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return True
+        return isinstance(error, smtplib.SMTPDataError) and error.smtp_code >= 500
+
+    def _retry(self, row, error):
+        message_id, attempts = row[0], row[4] + 1
+        status = '失敗' if attempts >= self.max_attempts or self._permanent(error) else '待寄送'
+        next_attempt = time.time() + self.backoff * 2 ** (attempts - 1)
+        return status, attempts, next_attempt, str(error), message_id
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT 狀態, COUNT(*) FROM 寄信佇列 GROUP BY 狀態").fetchall())
+        finally:
+            conn.close()
+
+    def start(self):
+        """啟動背景寄信執行緒（重複呼叫無作用）。"""
+        if self._worker is not None:
+            return
+        def run():
+            while True:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                try:
+                    while self.send_pending()[0] == self.batch_size:
+                        pass
+                except Exception as e:
+                    print(f"寄信佇列處理失敗: {e}")
+        self._worker = threading.Thread(target=run, name='mailer', daemon=True)
+        self._worker.start()
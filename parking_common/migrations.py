@@ -0,0 +1,102 @@
+import sqlite3
+
+from parking_common.conflicts import create_occupancy
+from parking_common.roster import create_roster
+from parking_common.search import create_index
+
+####################################################################
+# 資料庫結構版本
+####################################################################
+# 版本號記錄在 PRAGMA user_version；每個版本只會套用一次，已存在的物件以 IF NOT EXISTS 略過
+# 每個步驟可以是 SQL 字串，或接受連線的函式（需要判斷環境、匯入資料時使用）
+MIGRATIONS = [
+    (1, [
+        # 申請紀錄：依期別+員工查詢、依員工查歷史身分、待審核清單
+        "CREATE INDEX IF NOT EXISTS idx_申請紀錄_期別_姓名代號 ON 申請紀錄 (期別, 姓名代號, 身分註記)",
+        "CREATE INDEX IF NOT EXISTS idx_申請紀錄_姓名代號_身分註記 ON 申請紀錄 (姓名代號, 身分註記, 期別)",
+        "CREATE INDEX IF NOT EXISTS idx_申請紀錄_待審核 ON 申請紀錄 (期別, 姓名代號) WHERE 車牌綁定 = 0",
+        # 繳費相關：(期別, 姓名代號) 並覆蓋常用欄位
+        "CREATE INDEX IF NOT EXISTS idx_抽籤繳費_期別_姓名代號 ON 抽籤繳費 (期別, 姓名代號, 繳費狀態, 車位編號)",
+        "CREATE INDEX IF NOT EXISTS idx_免申請繳費_期別_姓名代號 ON 免申請繳費 (期別, 姓名代號, 車位編號)",
+        "CREATE INDEX IF NOT EXISTS idx_繳費紀錄_期別_姓名代號 ON 繳費紀錄 (期別, 姓名代號, 車位編號)",
+        # 車牌審核與免申請
+        "CREATE INDEX IF NOT EXISTS idx_使用者車牌_姓名代號_車牌號碼 ON 使用者車牌 (姓名代號, 車牌號碼)",
+        "CREATE INDEX IF NOT EXISTS idx_免申請_車牌號碼 ON 免申請 (車牌號碼)",
+        "CREATE INDEX IF NOT EXISTS idx_免申請_姓名代號 ON 免申請 (姓名代號)",
+        "CREATE INDEX IF NOT EXISTS idx_免申請_車位編號 ON 免申請 (車位編號, 期別)",
+        "CREATE INDEX IF NOT EXISTS idx_停車位_車位編號 ON 停車位 (車位編號, 使用狀態, 車位排序)",
+        "CREATE INDEX IF NOT EXISTS idx_停車位_使用狀態 ON 停車位 (使用狀態, 車位編號)",
+    ]),
+    (2, [
+        # 抽籤稽核：記錄每次抽籤的種子與參與名單雜湊，可據以重現結果
+        """CREATE TABLE IF NOT EXISTS 抽籤紀錄 (
+            期別 TEXT NOT NULL,
+            抽籤時間 TEXT NOT NULL,
+            抽籤方式 TEXT NOT NULL,
+            種子 TEXT NOT NULL,
+            名單雜湊 TEXT NOT NULL,
+            參與人數 INTEGER NOT NULL,
+            車位數 INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_抽籤紀錄_期別 ON 抽籤紀錄 (期別, 抽籤時間)",
+    ]),
+    (3, [
+        # 姓名、員工編號、車牌的 trigram 全文檢索索引與同步觸發程序
+        create_index,
+    ]),
+    (4, [
+        # 各期車位由誰持有，由觸發程序維護，用來即時查詢並阻擋重複分配
+        create_occupancy,
+    ]),
+    (5, [
+        # 每期地下停車一覽表的實體化資料，來源資料異動時由觸發程序標記過期
+        create_roster,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """把資料庫升級到最新版本，回傳這次套用的版本清單。"""
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN")
+            for step in statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            # PRAGMA 不支援參數綁定，version 為程式內常數
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        applied.append(version)
+    if applied:
+        conn.execute("ANALYZE")
+    return applied
+
+
+def ensure_schema(database):
+    """
+    每次取得資料庫後呼叫：若本機副本版本落後則升級並立即上傳，
+    已是最新版本時只讀一次 PRAGMA。
+    """
+    conn = sqlite3.connect(database.local_path, isolation_level=None)
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        database.mark_dirty()
+        database.flush(force=True)
+    return applied
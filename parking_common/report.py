@@ -0,0 +1,141 @@
+import io
+import threading
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+####################################################################
+# 共用的 PDF 報表
+####################################################################
+FONT_SIZE = 12
+ROW_HEIGHT = 20
+CELL_PADDING = 12
+
+_registered = set()
+_register_lock = threading.Lock()
+
+
+def register_font(font_path=None, font_name='NotoSans'):
+    """
+    每個行程只解析一次字型檔（Noto Sans TC 解析一次就要數百毫秒）。
+    沒有字型檔時改用 reportlab 內建、不需字型檔的繁體中文字型 MSung-Light。
+    """
+    if font_path is None:
+        font_name = 'MSung-Light'
+    with _register_lock:
+        if font_name not in _registered:
+            font = TTFont(font_name, font_path) if font_path else UnicodeCIDFont(font_name)
+            pdfmetrics.registerFont(font)
+            _registered.add(font_name)
+    return font_name
+
+
+@lru_cache(maxsize=None)
+def styles(font_name):
+    return {
+        'title': ParagraphStyle(name='CustomTitle', fontName=font_name, fontSize=16, spaceAfter=20, alignment=1,
+                                textColor=colors.black),
+        'cell': ParagraphStyle(name='CustomTableData', fontName=font_name, fontSize=12, textColor=colors.black,
+                               alignment=1, leading=15),
+        'footer': ParagraphStyle(name='CustomFooter', fontName=font_name, fontSize=12, textColor=colors.black,
+                                 spaceBefore=20),
+    }
+
+
+@lru_cache(maxsize=None)
+def table_style(font_name):
+    return TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Center align all cells
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+
+
+def _cell(value, style, wrap_at):
+    # 只有長文字才需要 Paragraph 自動換行，其餘直接以字串繪製
+    text = '' if value is None else str(value)
+    if len(text) > wrap_at:
+        return Paragraph(escape(text), style)
+    return text
+
+
+def _column_widths(data, font_name, available, wrap_at):
+    """依各欄最長的字串決定欄寬，每一頁的表格共用同一組欄寬。"""
+    widths = []
+    for column in zip(*data):
+        plain = [cell for cell in column if isinstance(cell, str)]
+        width = max((pdfmetrics.stringWidth(cell, font_name, FONT_SIZE) for cell in plain), default=0)
+        if len(plain) < len(column):
+            width = max(width, wrap_at * FONT_SIZE)
+        widths.append(width + CELL_PADDING)
+    total = sum(widths)
+    if total > available:
+        widths = [width * available / total for width in widths]
+    return widths
+
+
+def _page_tables(data, widths, style, first_rows, page_rows):
+    """
+    固定列高時事先切成每頁一張表，避免 reportlab 對整張長表反覆 split（頁數越多越慢）；
+    每張表都帶表頭，且預留一列空間，下一張表一定從新的一頁開始。
+    """
+    header, rows = data[0], data[1:]
+    chunks, start, size = [], 0, first_rows
+    while start < len(rows) or not chunks:
+        chunks.append(rows[start:start + size])
+        start, size = start + size, page_rows
+    tables = []
+    for chunk in chunks:
+        table = LongTable([header] + chunk, colWidths=widths, rowHeights=ROW_HEIGHT, repeatRows=1)
+        table.setStyle(style)
+        tables.append(table)
+    return tables
+
+
+def table_pdf(title, header, rows, note=None, font_path=None, font_name='NotoSans',
+              pagesize=letter, wrap_at=20):
+    """
+    標題 + 表格 + 備註的 PDF，回傳 BytesIO。
+    表格每頁重複表頭；note 可含 <font color='red'> 等標記。
+    """
+    font_name = register_font(font_path, font_name)
+    style = styles(font_name)
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=pagesize)
+    frame_width = doc.width - 12      # Frame 左右各有 6pt padding
+    frame_height = doc.height - 12
+
+    data = [[str(cell) for cell in header]]
+    data += [[_cell(value, style['cell'], wrap_at) for value in row] for row in rows]
+    widths = _column_widths(data, font_name, frame_width, wrap_at)
+
+    title_paragraph = Paragraph(title, style['title'])
+    elements = [title_paragraph, Spacer(1, 12)]
+    if all(isinstance(cell, str) for row in data for cell in row):
+        title_height = title_paragraph.wrap(frame_width, frame_height)[1] + style['title'].spaceAfter + 12
+        first_rows = max(int((frame_height - title_height) // ROW_HEIGHT) - 2, 1)
+        page_rows = int(frame_height // ROW_HEIGHT) - 2
+        elements += _page_tables(data, widths, table_style(font_name), first_rows, page_rows)
+    else:
+        # 有需要換行的儲存格時列高不固定，交給 LongTable 自行分頁
+        table = LongTable(data, colWidths=widths, repeatRows=1)
+        table.setStyle(table_style(font_name))
+        elements.append(table)
+    elements.append(Spacer(1, 12))
+    if note:
+        elements.append(Paragraph(note, style['footer']))
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,259 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+####################################################################
+# 共用連線的資料存取層
+####################################################################
+# 本機副本在 sync 時會被整個檔案替換，WAL 的 -wal/-shm 檔會殘留並對不上新檔案，
+# 因此維持 rollback journal，只調整同步與快取設定。
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,       # 約 16MB
+    'temp_store': 'MEMORY',
+}
+
+
+class QueryStats:
+    """各查詢的執行次數與耗時（秒）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, elapsed, rows=0):
+        with self._lock:
+            stat = self._stats.setdefault(name, {'次數': 0, '總耗時': 0.0, '最長耗時': 0.0, '筆數': 0})
+            stat['次數'] += 1
+            stat['總耗時'] += elapsed
+            stat['最長耗時'] = max(stat['最長耗時'], elapsed)
+            stat['筆數'] += rows
+
+    def snapshot(self):
+        with self._lock:
+            rows = [dict(查詢=name, **stat) for name, stat in self._stats.items()]
+        for row in rows:
+            row['平均耗時'] = row['總耗時'] / row['次數']
+        return sorted(rows, key=lambda row: row['總耗時'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ResultCache:
+    """
+    以 (SQL, 參數, 資料版本) 為鍵的 LRU 查詢結果快取；資料版本改變後舊結果自然不再命中，
+    超過 max_entries 時淘汰最久未使用的結果。
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard_before(self, version):
+        """丟掉舊版本的結果，釋放記憶體。"""
+        with self._lock:
+            for key in [key for key in self._entries if key[-1] < version]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'命中': self.hits, '未命中': self.misses, '淘汰': self.evictions,
+                    '快取筆數': len(self._entries), '命中率': self.hits / total if total else 0.0}
+
+
+def _default_name(sql):
+    return re.sub(r'\s+', ' ', sql).strip()[:60]
+
+
+class Repository:
+    """
+    每個執行緒保留一個已設定好 pragma 的連線（sqlite3 會在連線內快取 prepared statement），
+    本機檔案被 sync 替換（inode 改變）時自動重新連線。
+    - query / query_df / execute / executemany 皆會累計耗時
+    - with repo.transaction(): 內的寫入同一個交易，離開時 commit，例外時 rollback
+    - cached_df 依資料版本快取查詢結果；版本在本身寫入、檔案被替換，
+      或其他連線修改資料（PRAGMA data_version 改變）時遞增
+    - 指定 database（SyncedDatabase）時，寫入在 database.writing() 內 commit，同時標記為待上傳；
+      transaction(pending=False) 只寫衍生資料，不標記為待上傳
+    """
+
+    def __init__(self, path, pragmas=None, cached_statements=256, timeout=30, cache_entries=32, database=None):
+        self.path = path
+        self.database = database
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.stats = QueryStats()
+        self.cache = ResultCache(cache_entries)
+        self._local = threading.local()
+        self._version = 0
+        self._version_lock = threading.Lock()
+
+    def _file_id(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_dev, stat.st_ino
+        except FileNotFoundError:
+            return None
+
+    def connection(self):
+        local = self._local
+        file_id = self._file_id()
+        conn = getattr(local, 'conn', None)
+        if conn is not None and local.file_id != file_id and not getattr(local, 'depth', 0):
+            conn.close()
+            conn = None
+            self.bump_version()
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   cached_statements=self.cached_statements)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            local.conn, local.file_id, local.depth = conn, file_id, 0
+            local.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return conn
+
+    def bump_version(self):
+        with self._version_lock:
+            self._version += 1
+            return self._version
+
+    def data_version(self):
+        """目前的資料版本；順便檢查其他連線（例如 ensure_schema、其他程序）是否改過資料。"""
+        conn = self.connection()
+        local = self._local
+        if not local.depth:
+            seen = conn.execute("PRAGMA data_version").fetchone()[0]
+            if seen != local.data_version:
+                local.data_version = seen
+                self.bump_version()
+        return self._version
+
+    def _written(self):
+        # 交易內的寫入在 commit 前其他連線看不到，等交易結束再遞增版本
+        if not self._local.depth:
+            self.bump_version()
+
+    def _writing(self, pending=True):
+        # 交易內的寫入由外層 transaction() 一併標記
+        if self.database is None or self._local.depth:
+            return nullcontext()
+        return self.database.writing(pending)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def transaction(self, pending=True):
+        conn = self.connection()
+        local = self._local
+        if local.depth:
+            # 巢狀交易併入外層
+            local.depth += 1
+            try:
+                yield self
+            finally:
+                local.depth -= 1
+            return
+        with self._writing(pending):
+            conn.execute("BEGIN IMMEDIATE")
+            local.depth = 1
+            try:
+                yield self
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                local.depth = 0
+                self.bump_version()
+
+    @contextmanager
+    def _timed(self, sql, name):
+        started = time.perf_counter()
+        result = {'rows': 0}
+        try:
+            yield result
+        finally:
+            self.stats.record(name or _default_name(sql), time.perf_counter() - started, result['rows'])
+
+    def query(self, sql, params=(), name=None):
+        with self._timed(sql, name) as result:
+            rows = self.connection().execute(sql, params).fetchall()
+            result['rows'] = len(rows)
+        return rows
+
+    def query_one(self, sql, params=(), name=None):
+        rows = self.query(sql, params, name)
+        return rows[0] if rows else None
+
+    def query_df(self, sql, params=(), name=None):
+        import pandas as pd
+
+        with self._timed(sql, name) as result:
+            df = pd.read_sql_query(sql, self.connection(), params=params)
+            result['rows'] = len(df)
+        return df
+
+    def cached_df(self, sql, params=(), name=None):
+        """同 query_df，但資料版本未變時直接回傳快取結果的複本。"""
+        version = self.data_version()
+        key = (sql, tuple(params), version)
+        df = self.cache.get(key)
+        if df is None:
+            self.cache.discard_before(version)
+            df = self.query_df(sql, params, name)
+            self.cache.put(key, df)
+        return df.copy()
+
+    def execute(self, sql, params=(), name=None):
+        with self._writing(), self._timed(sql, name) as result:
+            cursor = self.connection().execute(sql, params)
+            result['rows'] = max(cursor.rowcount, 0)
+        self._written()
+        return cursor
+
+    def executemany(self, sql, rows, name=None):
+        with self._writing(), self._timed(sql, name) as result:
+            cursor = self.connection().executemany(sql, rows)
+            result['rows'] = max(cursor.rowcount, 0)
+        self._written()
+        return cursor
+
+    def timings(self):
+        return self.stats.snapshot()
@@ -0,0 +1,206 @@
+"""
+地下停車一覽表的實體化資料。
+
+    python -m parking_common.roster check 資料庫路徑 期別 [期別 ...]
+    python -m parking_common.roster rebuild 資料庫路徑 [期別 ...]
+
+check 比對實體化資料與即時查詢的結果，有差異時以非 0 結束；rebuild 重算指定期別（未指定時為所有已實體化的期別）。
+"""
+import sqlite3
+import sys
+from datetime import datetime
+
+####################################################################
+# 停車一覽：每期的地下停車一覽表
+####################################################################
+# 一覽表要合併免申請、繳費紀錄（含申請紀錄的個人資料）與空車位三部分再依車位排序，每次查看都即時計算太慢。
+# 改為每期算一次存入停車一覽，依 (期別, 排序鍵, ...) 建索引，查看與分頁只讀索引範圍。
+# 來源資料表異動時由觸發程序在同一個交易內把受影響的期別標為過期（免申請、停車位不分期，所有期別都過期）；
+# 審核頁面的寫入在交易內直接重算該期，其他程式的寫入則在下次查看時重算。
+ROSTER_TABLE = '停車一覽'
+STATUS_TABLE = '停車一覽狀態'
+
+COLUMNS = ['姓名代號', '姓名', '單位', '車牌號碼', '聯絡電話', '身分註記', '車位編號', '車位備註', '使用狀態']
+KEY = ['排序鍵', '車位鍵', '人員鍵', '車牌鍵']
+
+# 即時計算一期的一覽表（?1 為期別）：免申請、本期繳費紀錄，以及沒有人使用的車位
+ROSTER_QUERY = """
+    SELECT
+        A.姓名代號,
+        A.姓名,
+        A.單位,
+        A.車牌號碼,
+        A.聯絡電話,
+        A.身分註記,
+        A.車位編號,
+        B.車位備註,
+        B.使用狀態,
+        COALESCE(B.車位排序, -1) AS 排序鍵,
+        COALESCE(A.車位編號, '') AS 車位鍵,
+        COALESCE(A.姓名代號, '') AS 人員鍵,
+        COALESCE(A.車牌號碼, '') AS 車牌鍵
+    FROM 免申請 A
+    LEFT JOIN 停車位 B ON A.車位編號 = B.車位編號
+    WHERE A.期別 IS NULL OR A.期別 = ?1
+    UNION
+    SELECT
+        C.姓名代號,
+        C.姓名,
+        C.單位,
+        C.車牌號碼,
+        C.聯絡電話,
+        C.身分註記,
+        D.車位編號,
+        B.車位備註,
+        B.使用狀態,
+        COALESCE(B.車位排序, -1) AS 排序鍵,
+        COALESCE(D.車位編號, '') AS 車位鍵,
+        COALESCE(C.姓名代號, '') AS 人員鍵,
+        COALESCE(C.車牌號碼, '') AS 車牌鍵
+    FROM 申請紀錄 C
+    INNER JOIN 繳費紀錄 D ON C.期別 = D.期別 AND C.姓名代號 = D.姓名代號
+    LEFT JOIN 停車位 B ON D.車位編號 = B.車位編號
+    WHERE C.期別 = ?1
+    UNION
+    SELECT
+        A.姓名代號,
+        A.姓名,
+        A.單位,
+        A.車牌號碼,
+        A.聯絡電話,
+        A.身分註記,
+        B.車位編號,
+        B.車位備註,
+        B.使用狀態,
+        COALESCE(B.車位排序, -1) AS 排序鍵,
+        COALESCE(B.車位編號, '') AS 車位鍵,
+        COALESCE(A.姓名代號, '') AS 人員鍵,
+        COALESCE(A.車牌號碼, '') AS 車牌鍵
+    FROM 停車位 B
+    LEFT JOIN 免申請 A ON A.車位編號 = B.車位編號
+    WHERE B.車位編號 NOT IN (SELECT 車位編號 FROM 免申請 UNION SELECT 車位編號 FROM 繳費紀錄 WHERE 期別 = ?1 )
+    """
+
+# 資料表: (觸發更新的欄位, 是否分期)
+SOURCE_TABLES = {
+    '免申請': (['期別', '姓名代號', '姓名', '單位', '車牌號碼', '聯絡電話', '身分註記', '車位編號'], False),
+    '停車位': (['車位編號', '車位備註', '使用狀態', '車位排序'], False),
+    '繳費紀錄': (['期別', '姓名代號', '車位編號'], True),
+    '申請紀錄': (['期別', '姓名代號', '姓名', '單位', '車牌號碼', '聯絡電話', '身分註記'], True),
+}
+
+
+def roster_statements():
+    """建立停車一覽、狀態表、索引，以及來源資料表異動時標記過期的觸發程序。"""
+    columns = ', '.join(f"{column} TEXT" for column in COLUMNS)
+    statements = [
+        f"""CREATE TABLE IF NOT EXISTS {ROSTER_TABLE} (
+            期別 TEXT NOT NULL, {columns},
+            排序鍵 INTEGER NOT NULL, 車位鍵 TEXT NOT NULL, 人員鍵 TEXT NOT NULL, 車牌鍵 TEXT NOT NULL
+        )""",
+        f"CREATE INDEX IF NOT EXISTS idx_{ROSTER_TABLE}_期別_排序 ON {ROSTER_TABLE} (期別, {', '.join(KEY)})",
+        f"CREATE TABLE IF NOT EXISTS {STATUS_TABLE} (期別 TEXT PRIMARY KEY, 更新時間 TEXT NOT NULL)",
+    ]
+    for table, (watched, periodic) in SOURCE_TABLES.items():
+        if periodic:
+            stale = {'新增': f"DELETE FROM {STATUS_TABLE} WHERE 期別 = new.期別;",
+                     '修改': f"DELETE FROM {STATUS_TABLE} WHERE 期別 IN (old.期別, new.期別);",
+                     '刪除': f"DELETE FROM {STATUS_TABLE} WHERE 期別 = old.期別;"}
+        else:
+            stale = dict.fromkeys(['新增', '修改', '刪除'], f"DELETE FROM {STATUS_TABLE};")
+        events = {'新增': 'INSERT', '修改': f"UPDATE OF {', '.join(watched)}", '刪除': 'DELETE'}
+        for label, event in events.items():
+            statements.append(f"""CREATE TRIGGER IF NOT EXISTS {ROSTER_TABLE}_{table}_{label} AFTER {event} ON {table} BEGIN
+                {stale[label]}
+            END""")
+    return statements
+
+
+def create_roster(conn):
+    """資料庫升級時呼叫；各期的資料在第一次查看或寫入時才計算。"""
+    for statement in roster_statements():
+        conn.execute(statement)
+
+
+def _query(target, sql, params=()):
+    # target 為 Repository 或 sqlite3 連線
+    if hasattr(target, 'query'):
+        return target.query(sql, params, name='roster')
+    return target.execute(sql, params).fetchall()
+
+
+def is_fresh(target, period):
+    return bool(_query(target, f"SELECT 1 FROM {STATUS_TABLE} WHERE 期別 = ?", (period,)))
+
+
+def refresh(target, period):
+    """重算一期的停車一覽；須在呼叫端的交易內執行。"""
+    target.execute(f"DELETE FROM {ROSTER_TABLE} WHERE 期別 = ?", (period,))
+    target.execute(f"""
+        INSERT INTO {ROSTER_TABLE} (期別, {', '.join(COLUMNS + KEY)})
+        SELECT ?1, {', '.join(COLUMNS + KEY)} FROM ({ROSTER_QUERY})
+        """, (period,))
+    target.execute(f"INSERT OR REPLACE INTO {STATUS_TABLE} (期別, 更新時間) VALUES (?, ?)",
+                   (period, datetime.now().isoformat(timespec='seconds')))
+
+
+def ensure(target, period):
+    """該期過期或尚未計算時重算，回傳是否重算；須在呼叫端的交易內執行。"""
+    if is_fresh(target, period):
+        return False
+    refresh(target, period)
+    return True
+
+
+def materialized(target):
+    return [period for (period,) in _query(target, f"SELECT DISTINCT 期別 FROM {ROSTER_TABLE} ORDER BY 期別")]
+
+
+def rebuild(target, periods=None):
+    """重算指定期別（未指定時為所有已實體化的期別），回傳重算的期別。"""
+    periods = list(periods) if periods else materialized(target)
+    for period in periods:
+        refresh(target, period)
+    return periods
+
+
+def check(target, period):
+    """比對停車一覽與即時查詢，回傳 {'缺少': 筆數, '多出': 筆數}；兩者皆 0 表示一致。"""
+    columns = ', '.join(COLUMNS + KEY)
+    stored = f"SELECT {columns} FROM {ROSTER_TABLE} WHERE 期別 = ?1"
+    live = f"SELECT {columns} FROM ({ROSTER_QUERY})"
+    missing = _query(target, f"SELECT COUNT(*) FROM ({live} EXCEPT {stored})", (period,))[0][0]
+    extra = _query(target, f"SELECT COUNT(*) FROM ({stored} EXCEPT {live})", (period,))[0][0]
+    # 即時查詢以 UNION 去除重複，停車一覽中重複的列也算多出
+    total, distinct = _query(target, f"""
+        SELECT (SELECT COUNT(*) FROM ({stored})), (SELECT COUNT(*) FROM (SELECT DISTINCT * FROM ({stored})))
+        """, (period,))[0]
+    return {'缺少': missing, '多出': extra + total - distinct}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ('check', 'rebuild') or (argv[0] == 'check' and len(argv) < 3):
+        print(__doc__)
+        return 2
+    command, path, periods = argv[0], argv[1], argv[2:]
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        if command == 'rebuild':
+            conn.execute("BEGIN IMMEDIATE")
+            periods = rebuild(conn, periods)
+            conn.execute("COMMIT")
+            print(f"已重算：{'、'.join(periods) or '無'}")
+            return 0
+        failed = 0
+        for period in periods:
+            result = check(conn, period)
+            fresh = '' if is_fresh(conn, period) else '（已過期，查看時會重算）'
+            print(f"{period}：缺少 {result['缺少']} 筆，多出 {result['多出']} 筆{fresh}")
+            failed += any(result.values())
+        return 1 if failed else 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+import sqlite3
+
+####################################################################
+# 姓名、員工編號、車牌的全文檢索
+####################################################################
+# 搜尋索引為 FTS5 表，以 trigram 斷詞：任何連續 3 個字以上的片段都查得到，中文姓名不需另外斷詞。
+# 索引的 rowid = 來源資料列 rowid * 4 + 資料表代號，觸發程序可直接以 rowid 更新、刪除。
+# 這些資料表沒有 INTEGER PRIMARY KEY，VACUUM 可能重新編排 rowid，之後需呼叫 rebuild_index()。
+INDEX_TABLE = '搜尋索引'
+SEARCH_TABLES = {
+    # 資料表: (代號, 姓名欄位)
+    '申請紀錄': (1, '姓名'),
+    '免申請': (2, '姓名'),
+    '使用者車牌': (3, None),
+}
+MIN_MATCH_LENGTH = 3    # trigram 索引最短可查詢的長度
+
+
+def _values(table, prefix):
+    code, name_column = SEARCH_TABLES[table]
+    name = f"COALESCE({prefix}.{name_column}, '')" if name_column else "''"
+    return f"{prefix}.rowid * 4 + {code}, {name}, COALESCE({prefix}.姓名代號, ''), COALESCE({prefix}.車牌號碼, '')"
+
+
+def index_statements():
+    """各資料表新增、修改、刪除時同步更新搜尋索引的觸發程序。"""
+    insert = f"INSERT OR REPLACE INTO {INDEX_TABLE} (rowid, 姓名, 姓名代號, 車牌號碼) VALUES"
+    statements = []
+    for table, (code, name_column) in SEARCH_TABLES.items():
+        columns = ', '.join(column for column in (name_column, '姓名代號', '車牌號碼') if column)
+        delete = f"DELETE FROM {INDEX_TABLE} WHERE rowid = old.rowid * 4 + {code};"
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_{table}_新增 AFTER INSERT ON {table} BEGIN
+                {insert} ({_values(table, 'new')});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_{table}_修改 AFTER UPDATE OF {columns} ON {table} BEGIN
+                {delete}
+                {insert} ({_values(table, 'new')});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_{table}_刪除 AFTER DELETE ON {table} BEGIN
+                {delete}
+            END""",
+        ]
+    return statements
+
+
+def rebuild_index(conn):
+    """清空後依各資料表現有資料重建搜尋索引。"""
+    conn.execute(f"DELETE FROM {INDEX_TABLE}")
+    for table in SEARCH_TABLES:
+        conn.execute(f"INSERT INTO {INDEX_TABLE} (rowid, 姓名, 姓名代號, 車牌號碼) "
+                     f"SELECT {_values(table, table)} FROM {table}")
+
+
+def create_index(conn):
+    """
+    建立搜尋索引與觸發程序並匯入現有資料（資料庫升級時呼叫）。
+    SQLite 未支援 FTS5 trigram（3.34 以前）時不建立，lookup() 改為逐列比對。
+    """
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} "
+                     f"USING fts5(姓名, 姓名代號, 車牌號碼, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    for statement in index_statements():
+        conn.execute(statement)
+    rebuild_index(conn)
+    return True
+
+
+def has_index(repository):
+    return repository.query_one("SELECT 1 FROM sqlite_master WHERE name = ?", (INDEX_TABLE,),
+                                name='search:has_index') is not None
+
+
+def _phrase(text):
+    # 整段當作一個片語，使用者輸入的引號、運算子都不具特殊意義
+    return '"' + text.replace('"', '""') + '"'
+
+
+def lookup(repository, text, limit=50):
+    """
+    以姓名、員工編號或車牌片段查詢三個資料表，回傳 {資料表: DataFrame}，只含有符合資料的表，
+    每個表最多 limit 筆（新資料在前）。
+    3 個字以上以 trigram 索引查詢；較短的片段（例如兩個字的姓名）索引無法查詢，改在 SQLite 內逐列比對，不必載入整表。
+    """
+    text = text.strip()
+    if not text:
+        return {}
+    if len(text) >= MIN_MATCH_LENGTH and has_index(repository):
+        condition, args = f"{INDEX_TABLE} MATCH ?", [_phrase(text)]
+    else:
+        condition, args = None, [text]
+
+    results = {}
+    for table, (code, name_column) in SEARCH_TABLES.items():
+        if condition:
+            sql = f"""
+                SELECT * FROM {table} WHERE rowid IN (
+                    SELECT rowid / 4 FROM {INDEX_TABLE} WHERE {condition} AND rowid % 4 = {code}
+                    ORDER BY rowid DESC LIMIT ?)
+                ORDER BY rowid DESC
+                """
+        else:
+            columns = [column for column in (name_column, '姓名代號', '車牌號碼') if column]
+            matches = ' OR '.join(f"instr(lower({column}), lower(?1))" for column in columns)
+            sql = f"SELECT * FROM {table} WHERE {matches} ORDER BY rowid DESC LIMIT ?2"
+        df = repository.cached_df(sql, args + [limit], name=f"search:{table}")
+        if len(df):
+            results[table] = df
+    return results
@@ -0,0 +1,65 @@
+import threading
+
+####################################################################
+# 延遲建立的 Google Drive 連線
+####################################################################
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class LazyDrive:
+    """
+    第一次呼叫 Drive API 時才載入 googleapiclient、解析憑證並建立 Drive v3 client：
+    - 使用套件內附的 discovery 文件（static_discovery），不向 Google 下載 API 描述
+    - 憑證每個行程只解析一次；service 不是 thread-safe，每個執行緒各自建立一個（約數毫秒）
+    - 可直接當成 service 傳給 DriveStorage、FolderCache（service.files() 會轉給目前執行緒的 service）
+    """
+
+    def __init__(self, info_loader):
+        self.info_loader = info_loader
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._local = threading.local()
+
+    def credentials(self):
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    from google.oauth2.service_account import Credentials
+
+                    self._credentials = Credentials.from_service_account_info(self.info_loader())
+        return self._credentials
+
+    def build(self):
+        """建立一個新的 service（給 UploadPipeline 等自行管理執行緒的呼叫端使用）。"""
+        from googleapiclient.discovery import build
+
+        return build('drive', 'v3', credentials=self.credentials(), static_discovery=True, cache_discovery=False)
+
+    def service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.build()
+        return service
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.service(), name)
+
+
+def drive_service(info_loader, name='drive'):
+    """
+    回傳 name 對應的 LazyDrive；Streamlit 每次 rerun 都會重新執行 script，
+    同一個行程內拿到的都是第一次登記的物件。
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LazyDrive(info_loader)
+        return _registry[name]
+
+
+def register(name, service):
+    """預先登記 service（例如效能測試以本機假的 Drive 取代），之後 drive_service(name) 直接回傳它。"""
+    with _registry_lock:
+        _registry[name] = service
@@ -0,0 +1,157 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from parking_common.lottery import STRATEGIES
+
+####################################################################
+# 多期分配政策的蒙地卡羅模擬
+####################################################################
+# 依 eligibility.decide 與抽籤流程簡化而成，每期以向量運算處理所有員工：
+# - 身心障礙、孕婦（前兩期）、保障（前兩期皆未中籤）優先分配車位
+# - 上期以一般／保障身分中籤並繳費者本期不得申請
+# - 其餘一般申請者以指定的抽籤方式分配剩餘車位
+KINDS = ['一般', '保障', '孕婦', '身心障礙']
+GENERAL, GUARANTEED, PREGNANT, DISABLED = range(len(KINDS))
+# 繳費狀態：沒有紀錄、未繳費（未中籤）、已繳費、放棄（中籤未繳費）
+NONE, LOST, PAID, FORFEIT = range(4)
+MAX_WAIT = 12
+
+
+@dataclass
+class Policy:
+    employees: int = 600
+    spaces: int = 200
+    quarters: int = 40
+    burn_in: int = 4              # 前幾期不計入統計
+    apply_rate: float = 0.6       # 每期想申請的機率
+    pregnant_rate: float = 0.01   # 每期開始懷孕的機率
+    disabled_rate: float = 0.01   # 具身障資格的比例
+    pay_rate: float = 0.95        # 中籤後繳費的機率
+    strategy: str = 'uniform'
+    units: list = field(default_factory=lambda: ['秘書處', '公眾服務處', '資訊處', '財務處'])
+
+
+def simulate(policy, seed):
+    """跑一次模擬，回傳各項累計次數（可直接相加合併）。"""
+    rng = np.random.default_rng(seed)
+    n = policy.employees
+    units = rng.choice(policy.units, size=n)
+    disabled = rng.random(n) < policy.disabled_rate
+    pregnant_left = np.zeros(n, dtype=int)      # 孕婦身分剩餘期數（孕婦申請前兩期優先，之後轉一般）
+    status1 = np.full(n, NONE)                  # 上期繳費狀態
+    status2 = np.full(n, NONE)                  # 上上期繳費狀態
+    kind1 = np.full(n, -1)                      # 上期申請身分
+    streak = np.zeros(n, dtype=int)             # 連續未中籤期數
+    waiting = np.zeros(n, dtype=int)            # 本輪已等待期數
+
+    totals = {
+        'applications': np.zeros(len(KINDS), dtype=np.int64),
+        'wins': np.zeros(len(KINDS), dtype=np.int64),
+        'waits': np.zeros(MAX_WAIT + 1, dtype=np.int64),
+        'rejected': 0,
+        'requests': 0,
+        'used_spaces': 0,
+        'offered_spaces': 0,
+    }
+
+    for quarter in range(policy.quarters):
+        starts = (pregnant_left == 0) & (rng.random(n) < policy.pregnant_rate)
+        pregnant_left[starts] = 2
+        applying = rng.random(n) < policy.apply_rate
+
+        kind = np.full(n, GENERAL)
+        kind[(status1 == LOST) & (status2 == LOST)] = GUARANTEED
+        kind[pregnant_left > 0] = PREGNANT
+        kind[disabled] = DISABLED
+        rejected = applying & (kind == GENERAL) & (status1 == PAID) & np.isin(kind1, [GENERAL, GUARANTEED])
+        applicant = applying & ~rejected
+
+        # 優先身分依身障、孕婦、保障的順序分配，同身分內隨機
+        priority = np.flatnonzero(applicant & (kind != GENERAL))
+        priority = priority[np.lexsort((rng.random(len(priority)), -kind[priority]))]
+        winners = priority[:policy.spaces]
+        remaining = policy.spaces - len(winners)
+
+        pool = np.flatnonzero(applicant & (kind == GENERAL))
+        if remaining > 0 and len(pool):
+            order = STRATEGIES[policy.strategy](rng, units[pool][:, None], spaces=remaining, losses=streak[pool])
+            winners = np.concatenate((winners, pool[order[:remaining]]))
+
+        won = np.zeros(n, dtype=bool)
+        won[winners] = True
+        paid = won & (rng.random(n) < policy.pay_rate)
+        lost = applicant & ~won
+
+        if quarter >= policy.burn_in:
+            totals['applications'] += np.bincount(kind[applicant], minlength=len(KINDS))
+            totals['wins'] += np.bincount(kind[won], minlength=len(KINDS))
+            totals['waits'] += np.bincount(np.minimum(waiting[won], MAX_WAIT), minlength=MAX_WAIT + 1)
+            totals['rejected'] += int(rejected.sum())
+            totals['requests'] += int(applying.sum())
+            totals['used_spaces'] += int(won.sum())
+            totals['offered_spaces'] += policy.spaces
+
+        status2 = status1
+        status1 = np.select([paid, won, lost], [PAID, FORFEIT, LOST], NONE)
+        kind1 = np.where(applicant, kind, -1)
+        streak = np.where(lost & (kind == GENERAL), streak + 1, np.where(applicant, 0, streak))
+        waiting = np.where(won, 0, waiting + lost)
+        pregnant_left = np.maximum(pregnant_left - 1, 0)
+
+    return totals
+
+
+def _merge(results):
+    merged = None
+    for result in results:
+        if merged is None:
+            merged = {key: np.copy(value) if isinstance(value, np.ndarray) else value for key, value in result.items()}
+        else:
+            for key, value in result.items():
+                merged[key] = merged[key] + value
+    return merged
+
+
+def run(policy, replications=16, workers=None, seed=None):
+    """以多個行程平行跑 replications 次模擬並合併結果。"""
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [simulate(policy, s) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(simulate, [policy] * replications, seeds))
+    return _merge(results)
+
+
+def summarize(totals):
+    """整理成可直接顯示的指標。"""
+    applications, wins, waits = totals['applications'], totals['wins'], totals['waits']
+    by_kind = {
+        KINDS[i]: {'申請次數': int(applications[i]), '中籤次數': int(wins[i]),
+                   '中籤率': float(wins[i] / applications[i]) if applications[i] else 0.0}
+        for i in range(len(KINDS))
+    }
+    total_waits = waits.sum()
+    return {
+        '身分註記': by_kind,
+        '等待期數分布': {(f"{k}+" if k == MAX_WAIT else str(k)): float(waits[k] / total_waits) if total_waits else 0.0
+                    for k in range(MAX_WAIT + 1)},
+        '平均等待期數': float((np.arange(MAX_WAIT + 1) * waits).sum() / total_waits) if total_waits else 0.0,
+        '不得申請比例': totals['rejected'] / totals['requests'] if totals['requests'] else 0.0,
+        '車位使用率': totals['used_spaces'] / totals['offered_spaces'] if totals['offered_spaces'] else 0.0,
+    }
+
+
+def compare(policy, variants, replications=16, workers=None, seed=None):
+    """
+    variants 為 {名稱: {欄位: 值}}，例如 {'車位增加 20%': {'spaces': 300}}；
+    每個版本使用相同的 seed，差異只來自政策本身。
+    """
+    reports = {'現行': summarize(run(policy, replications, workers, seed))}
+    for name, changes in variants.items():
+        reports[name] = summarize(run(replace(policy, **changes), replications, workers, seed))
+    return reports
@@ -0,0 +1,232 @@
+import io
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+####################################################################
+# 遠端儲存後端
+####################################################################
+class DriveStorage:
+    """以 Google Drive 上的檔案作為遠端資料庫。"""
+
+    def __init__(self, service, file_id):
+        self.service = service
+        self.file_id = file_id
+
+    def revision(self):
+        # 只取檔案中繼資料，不下載內容
+        meta = self.service.files().get(
+            fileId=self.file_id,
+            fields='headRevisionId,md5Checksum,modifiedTime'
+        ).execute()
+        return meta.get('headRevisionId') or meta.get('md5Checksum') or meta.get('modifiedTime')
+
+    def download(self, destination):
+        from googleapiclient.http import MediaIoBaseDownload
+
+        tmp_path = destination + '.download'
+        request = self.service.files().get_media(fileId=self.file_id)
+        with io.FileIO(tmp_path, 'wb') as fh:
+            downloader = MediaIoBaseDownload(fh, request)
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+        os.replace(tmp_path, destination)
+
+    def upload(self, source):
+        from googleapiclient.http import MediaFileUpload
+
+        media = MediaFileUpload(source, mimetype='application/x-sqlite3')
+        meta = self.service.files().update(
+            fileId=self.file_id,
+            media_body=media,
+            fields='headRevisionId,md5Checksum,modifiedTime'
+        ).execute()
+        return meta.get('headRevisionId') or meta.get('md5Checksum') or meta.get('modifiedTime')
+
+
+class LocalStorage:
+    """以本機檔案模擬遠端資料庫（開發、測試用），以 mtime 作為版本。"""
+
+    def __init__(self, remote_path):
+        self.remote_path = remote_path
+
+    def revision(self):
+        stat = os.stat(self.remote_path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def download(self, destination):
+        tmp_path = destination + '.download'
+        shutil.copyfile(self.remote_path, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def upload(self, source):
+        tmp_path = self.remote_path + '.upload'
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, self.remote_path)
+        return self.revision()
+
+####################################################################
+# 本機副本與批次上傳
+####################################################################
+class RevisionConflict(RuntimeError):
+    """本機副本所依據的遠端版本已被其他程式更新，拒絕覆蓋。"""
+
+    def __init__(self, base_revision, remote_revision):
+        super().__init__(f"遠端資料庫已更新（本機依據 {base_revision}，遠端為 {remote_revision}）")
+        self.base_revision = base_revision
+        self.remote_revision = remote_revision
+
+
+def read_local_revision(local_path):
+    try:
+        with open(local_path + '.rev', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_local_revision(local_path, revision):
+    with open(local_path + '.rev', 'w', encoding='utf-8') as f:
+        f.write(revision or '')
+
+
+class SyncedDatabase:
+    """
+    本機 SQLite 檔案與遠端儲存的同步。
+    - sync(): 先比對遠端版本，與本機相同時略過下載
+    - mark_dirty(): 記錄一筆本機寫入，累積成一個 changeset
+    - flush(): 距上次上傳超過 push_interval 秒時才整批上傳
+    上傳採樂觀鎖：上傳前確認遠端仍是本機所依據的版本（記錄在 .rev）。
+    遠端已被其他程式更新時，有 merge 就先把遠端最新版下載到暫存檔交給 merge
+    套用本機變更並替換本機檔案，再上傳；沒有 merge 則丟出 RevisionConflict。
+    check_interval 秒內重複呼叫 sync() 不再查詢遠端版本。
+    同一個行程內的所有 session 應共用同一個實例（st.cache_resource）。
+    """
+
+    def __init__(self, storage, local_path, push_interval=0, check_interval=0, merge=None):
+        self.storage = storage
+        self.local_path = local_path
+        self.push_interval = push_interval
+        self.check_interval = check_interval
+        self.merge = merge
+        self.pending_changes = 0
+        self.last_push = 0.0
+        self.last_check = None
+        self._lock = threading.RLock()
+        self._upload_lock = threading.Lock()
+        self._scheduler = None
+
+    @property
+    def dirty(self):
+        return self.pending_changes > 0
+
+    @property
+    def base_revision(self):
+        return read_local_revision(self.local_path)
+
+    def sync(self, force=False):
+        """遠端有新版本時才下載，回傳是否真的下載。"""
+        with self._lock:
+            exists = os.path.exists(self.local_path)
+            if self.dirty and exists:
+                # 本機尚有未上傳的變更，不可被遠端覆蓋
+                return False
+            if (not force and exists and self.last_check is not None
+                    and time.monotonic() - self.last_check < self.check_interval):
+                return False
+            remote_revision = self.storage.revision()
+            self.last_check = time.monotonic()
+            if exists and self.base_revision == remote_revision:
+                return False
+            self.storage.download(self.local_path)
+            write_local_revision(self.local_path, remote_revision)
+            return True
+
+    def discard(self):
+        """放棄本機未上傳的變更，改用遠端最新版。"""
+        with self._lock:
+            self.pending_changes = 0
+            return self.sync(force=True)
+
+    def mark_dirty(self, count=1):
+        with self._lock:
+            self.pending_changes += count
+
+    @contextmanager
+    def writing(self, pending=True):
+        """
+        包住一次本機寫入：期間 sync() 不會替換本機檔案，寫入成功後立即標記為待上傳，
+        commit 與 mark_dirty() 之間不會被 sync() 以遠端版本覆蓋。
+        pending=False 用於可由資料重算的衍生資料（例如停車一覽）：只防止寫入期間被替換，
+        不標記為待上傳，之後 sync() 仍可下載遠端新版本。
+        """
+        with self._lock:
+            yield
+            if pending:
+                self.mark_dirty()
+
+    def flush(self, force=False, inspect=None):
+        """上傳累積的 changeset，回傳是否有上傳。inspect(快照路徑) 在上傳前以實際要上傳的快照呼叫。"""
+        with self._upload_lock:
+            with self._lock:
+                if not self.dirty:
+                    return False
+                if not force and time.monotonic() - self.last_push < self.push_interval:
+                    return False
+                base_revision = self.base_revision
+            remote_revision = self.storage.revision()
+            if base_revision is not None and remote_revision != base_revision:
+                if self.merge is None:
+                    raise RevisionConflict(base_revision, remote_revision)
+                self._rebase(remote_revision)
+            with self._lock:
+                # 先在鎖內複製一份一致的快照，上傳期間不阻擋其他寫入
+                snapshot_path = self._snapshot()
+                pushed = self.pending_changes
+            if inspect is not None:
+                inspect(snapshot_path)
+            # Drive 沒有條件式更新，查版本到上傳之間仍有極短的空窗
+            revision = self.storage.upload(snapshot_path)
+            with self._lock:
+                write_local_revision(self.local_path, revision)
+                self.pending_changes -= pushed
+                self.last_push = time.monotonic()
+                self.last_check = time.monotonic()
+            return True
+
+    def _rebase(self, remote_revision):
+        remote_path = self.local_path + '.remote'
+        self.storage.download(remote_path)
+        # merge 負責把本機尚未上傳的變更套用到 remote_path，並以它替換本機檔案
+        self.merge(remote_path)
+        with self._lock:
+            write_local_revision(self.local_path, remote_revision)
+
+    def _snapshot(self):
+        snapshot_path = self.local_path + '.snapshot'
+        source = sqlite3.connect(self.local_path)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        return snapshot_path
+
+    def start_scheduler(self, interval=None):
+        """啟動背景執行緒，定期上傳累積的 changeset。"""
+        interval = interval or self.push_interval or 5
+        if self._scheduler is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush(force=True)
+                except Exception as e:
+                    print(f"資料庫排程上傳失敗: {e}")
+        self._scheduler = threading.Thread(target=run, name='db-flush', daemon=True)
+        self._scheduler.start()
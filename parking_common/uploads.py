@@ -0,0 +1,141 @@
+import io
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+####################################################################
+# 附件上傳
+####################################################################
+CHUNK_SIZE = 1024 * 1024            # 須為 256KB 的倍數
+RESUMABLE_THRESHOLD = 1024 * 1024   # 超過 1MB 的檔案以可續傳方式分段上傳
+
+
+@dataclass
+class UploadJob:
+    name: str
+    data: bytes
+    mimetype: str
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+@dataclass
+class UploadResult:
+    name: str
+    file_id: str = None
+    error: str = None
+    attempts: int = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _media_upload(fh, mimetype, chunksize, resumable):
+    from googleapiclient.http import MediaIoBaseUpload
+
+    return MediaIoBaseUpload(fh, mimetype=mimetype, chunksize=chunksize, resumable=resumable)
+
+
+class UploadPipeline:
+    """
+    以有上限的執行緒池同時上傳同一位申請人的多個檔案：
+    - 大檔以 resumable 分段上傳，連線中斷時從最後一個已確認的分段續傳
+    - 小檔直接上傳，失敗時整檔重傳
+    - 進度由背景執行緒放進佇列，在呼叫端執行緒回呼 on_progress(檔名, 已上傳, 總大小)
+      （Streamlit 元件只能在 script 執行緒更新）
+    googleapiclient 的 service 不是 thread-safe，service_factory 會在每個執行緒各呼叫一次。
+    """
+
+    def __init__(self, service_factory, workers=3, chunk_size=CHUNK_SIZE,
+                 resumable_threshold=RESUMABLE_THRESHOLD, max_retries=5, backoff=1.0,
+                 media_factory=_media_upload):
+        self.service_factory = service_factory
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.resumable_threshold = resumable_threshold
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.media_factory = media_factory
+        self._local = threading.local()
+
+    def _service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        return service
+
+    def _retry_wait(self, attempt):
+        time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def _upload(self, folder_id, job, progress):
+        result = UploadResult(job.name)
+        metadata = {'name': job.name, 'parents': [folder_id]}
+        resumable = job.size > self.resumable_threshold
+        request = None
+        failures = 0        # 連續失敗次數；分段有進展就重新計算
+        while True:
+            result.attempts += 1
+            try:
+                if request is None:
+                    media = self.media_factory(io.BytesIO(job.data), job.mimetype, self.chunk_size, resumable)
+                    request = self._service().files().create(body=metadata, media_body=media, fields='id')
+                if resumable:
+                    response = None
+                    while response is None:
+                        status, response = request.next_chunk()
+                        failures = 0
+                        if status is not None:
+                            progress.put((job.name, status.resumable_progress, job.size))
+                else:
+                    response = request.execute()
+                progress.put((job.name, job.size, job.size))
+                result.file_id = response.get('id')
+                return result
+            except Exception as e:
+                if not resumable:
+                    # 整檔上傳失敗時需重建請求；resumable 請求會自行查詢已上傳位置後續傳
+                    request = None
+                failures += 1
+                if failures > self.max_retries:
+                    result.error = str(e)
+                    return result
+                self._retry_wait(failures)
+
+    def upload(self, folder_id, jobs, on_progress=None):
+        """上傳所有檔案，回傳與 jobs 同順序的 UploadResult。"""
+        progress = queue.Queue()
+
+        def drain():
+            while True:
+                try:
+                    event = progress.get_nowait()
+                except queue.Empty:
+                    return
+                if on_progress is not None:
+                    on_progress(*event)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='drive-upload') as executor:
+            futures = [executor.submit(self._upload, folder_id, job, progress) for job in jobs]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                drain()
+        drain()
+        return [future.result() for future in futures]
+
+
+class UploadProgress:
+    """把各檔案的進度彙總成整體百分比（給 st.progress 使用）。"""
+
+    def __init__(self, jobs):
+        self.total = sum(job.size for job in jobs) or 1
+        self.done = {job.name: 0 for job in jobs}
+
+    def update(self, name, uploaded, size):
+        self.done[name] = uploaded
+        return min(sum(self.done.values()) / self.total, 1.0)
@@ -0,0 +1,221 @@
+from dataclasses import dataclass, field
+
+from parking_common.conflicts import CONFLICT_SPACES
+from parking_common.roster import COLUMNS as ROSTER_COLUMNS, KEY as ROSTER_KEY, ROSTER_TABLE
+
+####################################################################
+# 以 SQL 篩選、分頁的資料檢視
+####################################################################
+PAGE_SIZE = 50
+
+# 車位在該期被兩人以上持有的列（查詢車位佔用，不限於目前檢視的資料）；使用的檢視第一個參數必須是期別
+DUPLICATES = f"車位編號 IN ({CONFLICT_SPACES})"
+
+
+def contains(column):
+    """欄位包含輸入文字（同 str.contains，但 % 和 _ 不當萬用字元）。"""
+    return f"instr({column}, ?) > 0"
+
+
+@dataclass
+class Page:
+    df: object
+    next_key: tuple = None      # 下一頁的起點；None 表示已是最後一頁
+
+
+@dataclass
+class View:
+    """
+    sql：基本查詢，可含 ? 參數
+    key：排序與分頁的欄位，組合起來必須唯一且不為 NULL（keyset 分頁：下一頁從上一頁最後一列之後開始）
+    filters：{名稱: 條件}，條件中的 ? 代入篩選值；也可以是 {選項: 條件}
+    hidden：只用來排序的欄位，回傳前移除
+    """
+    name: str
+    sql: str
+    key: list
+    filters: dict = field(default_factory=dict)
+    hidden: list = field(default_factory=list)
+
+    def _source(self, params, values):
+        conditions, args = [], list(params)
+        for name, value in (values or {}).items():
+            if value is None or value == '' or value is False:
+                continue
+            condition = self.filters[name]
+            if isinstance(condition, dict):
+                conditions.append(condition[value])
+            else:
+                conditions.append(condition)
+                args += [value] * condition.count('?')
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f"WITH 檢視 AS (SELECT * FROM ({self.sql}){where})", args
+
+    def _query(self, params, values, duplicates, after=None):
+        sql, args = self._source(params, values)
+        conditions = [DUPLICATES] if duplicates else []
+        if after is not None:
+            conditions.append(f"({', '.join(self.key)}) > ({', '.join('?' * len(self.key))})")
+            args += list(after)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f"{sql} SELECT * FROM 檢視{where} ORDER BY {', '.join(self.key)}", args
+
+    def _clean(self, df):
+        return df.drop(columns=[column for column in self.hidden if column in df.columns]).reset_index(drop=True)
+
+    def page(self, repository, params=(), values=None, after=None, size=PAGE_SIZE, duplicates=False):
+        """只查詢 after 之後的 size 列（多取一列判斷是否還有下一頁）。"""
+        sql, args = self._query(params, values, duplicates, after)
+        df = repository.cached_df(f"{sql} LIMIT ?", args + [size + 1], name=self.name)
+        next_key = None
+        if len(df) > size:
+            last = df.iloc[size - 1]
+            next_key = tuple(value.item() if hasattr(value, 'item') else value for value in last[self.key])
+            df = df.iloc[:size]
+        return Page(self._clean(df), next_key)
+
+    def count(self, repository, params=(), values=None, duplicates=False):
+        sql, args = self._source(params, values)
+        where = f" WHERE {DUPLICATES}" if duplicates else ''
+        df = repository.cached_df(f"{sql} SELECT COUNT(*) AS 筆數 FROM 檢視{where}", args, name=f"{self.name}:count")
+        return int(df.iloc[0, 0])
+
+    def all(self, repository, params=(), values=None, duplicates=False):
+        """篩選後的所有列（產生報表等需要完整名單時使用）。"""
+        sql, args = self._query(params, values, duplicates)
+        return self._clean(repository.cached_df(sql, args, name=f"{self.name}:all"))
+
+
+####################################################################
+# 審核頁面的資料檢視
+####################################################################
+NAME_FILTER = contains('姓名')
+
+# 停車申請待審核（所有期別尚未綁定車牌的申請），依待審核部分索引的順序分頁
+PENDING_VIEW = View('load_data1', """
+    SELECT rowid AS 列號, * FROM 申請紀錄 WHERE 車牌綁定 = 0
+    """, key=['期別', '姓名代號', '列號'], hidden=['列號'])
+
+APPLICATION_VIEW = View('load_data2', """
+    SELECT rowid AS 列號, * FROM 申請紀錄 WHERE 期別 = ?
+    """, key=['姓名代號', '列號'], filters={'姓名': NAME_FILTER}, hidden=['列號'])
+
+SPACE_VIEW = View('load_data3', """
+    SELECT rowid AS 列號, 車位編號, 使用狀態, 車位備註 FROM 停車位
+    """, key=['列號'], filters={'使用狀態': "使用狀態 = ?"}, hidden=['列號'])
+
+GUARANTEED_VIEW = View('load_data4', """
+    SELECT 
+        A.期別,
+        A.單位,
+        A.姓名代號,
+        A.姓名,
+        A.聯絡電話,
+        A.身分註記,
+        A.車牌號碼,
+        B.車位編號,
+        C.車位備註,
+        B.繳費狀態,
+        B.rowid AS 列號
+    FROM 申請紀錄 A
+    INNER JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
+    LEFT JOIN 停車位 C ON B.車位編號 = C.車位編號
+    WHERE A.期別 = ? AND  A.身分註記 != '一般'
+    """, key=['姓名代號', '列號'], hidden=['列號'])
+
+PAYMENT_VIEW = View('load_data5', """
+    SELECT 
+        A.期別,
+        A.單位,
+        A.姓名代號,
+        A.姓名,
+        A.聯絡電話,
+        A.身分註記,
+        A.車牌號碼,
+        B.車位編號,
+        C.車位備註,
+        B.繳費狀態,
+        B.發票號碼,
+        COALESCE(C.車位排序, B.車位編號, '') AS 排序鍵,
+        '抽籤' AS 來源,
+        B.rowid AS 列號
+    FROM 申請紀錄 A
+    INNER JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
+    LEFT JOIN 停車位 C ON B.車位編號 = C.車位編號
+    WHERE A.期別 = ?1
+    UNION
+    SELECT
+        E.期別,
+        D.單位,
+        D.姓名代號,
+        D.姓名,
+        D.聯絡電話,
+        D.身分註記,
+        D.車牌號碼,
+        D.車位編號,
+        C.車位備註,
+        E.繳費狀態,
+        E.發票號碼,
+        COALESCE(C.車位排序, D.車位編號, '') AS 排序鍵,
+        '免申請' AS 來源,
+        E.rowid AS 列號
+    FROM 免申請 D
+    INNER JOIN 免申請繳費 E ON D.姓名代號 = E.姓名代號
+    LEFT JOIN 停車位 C ON D.車位編號 = C.車位編號
+    WHERE E.期別 = ?1
+    """, key=['排序鍵', '姓名代號', '來源', '列號'], filters={
+        '姓名': NAME_FILTER,
+        '繳費狀態': "繳費狀態 = ?",
+        '車位': {'正取': "車位編號 LIKE 'B%'", '備取': "車位編號 LIKE '備取%'"},
+    }, hidden=['排序鍵', '來源', '列號'])
+
+# 本期地下停車場員工自用車停車名單
+ROSTER_VIEW = View('load_data6', """
+    SELECT 
+        A.姓名代號,
+        A.姓名,
+        A.單位,
+        A.車牌號碼,
+        A.聯絡電話,
+        A.身分註記,
+        A.車位編號,
+        B.車位備註,
+        B.使用狀態,
+        COALESCE(B.車位排序, -1) AS 排序鍵,
+        COALESCE(A.姓名代號, '') AS 人員鍵,
+        COALESCE(A.車牌號碼, '') AS 車牌鍵,
+        '免申請' AS 來源,
+        A.rowid AS 列號
+    FROM 免申請 A
+    LEFT JOIN 停車位 B ON A.車位編號 = B.車位編號
+    WHERE  A.期別 = ?1
+    UNION
+    SELECT 
+        C.姓名代號,
+        C.姓名,
+        C.單位,
+        C.車牌號碼,
+        C.聯絡電話,
+        C.身分註記,
+        D.車位編號,
+        B.車位備註,
+        B.使用狀態,
+        COALESCE(B.車位排序, -1) AS 排序鍵,
+        COALESCE(C.姓名代號, '') AS 人員鍵,
+        COALESCE(C.車牌號碼, '') AS 車牌鍵,
+        '繳費' AS 來源,
+        D.rowid AS 列號
+    FROM 申請紀錄 C
+    INNER JOIN 繳費紀錄 D ON C.期別 = D.期別 AND C.姓名代號 = D.姓名代號
+    LEFT JOIN 停車位 B ON D.車位編號 = B.車位編號
+    WHERE C.期別 = ?1
+    """, key=['排序鍵', '人員鍵', '車牌鍵', '來源', '列號'], filters={'姓名': NAME_FILTER},
+    hidden=['排序鍵', '人員鍵', '車牌鍵', '來源', '列號'])
+
+# 地下停車一覽表：所有車位（含空位）與本期使用者，讀取實體化的停車一覽（查看前先以 roster.ensure 確保該期為最新）
+OVERVIEW_VIEW = View('load_data7', f"""
+    SELECT {', '.join(ROSTER_COLUMNS + ROSTER_KEY)} FROM {ROSTER_TABLE} WHERE 期別 = ?1
+    """, key=ROSTER_KEY, filters={
+        '姓名': NAME_FILTER,
+        '使用狀態': "使用狀態 = ?",
+    }, hidden=ROSTER_KEY)
@@ -0,0 +1,74 @@
+import threading
+import time
+from datetime import datetime
+
+####################################################################
+# 預熱與健康檢查
+####################################################################
+class Warmup:
+    """
+    在背景執行緒依序執行預熱步驟（同步資料庫、建立 Drive 連線、載入字型等），
+    之後每 interval 秒再跑一次，閒置後第一個請求不必重新下載資料庫或更新 Drive 權杖。
+    由應用程式頁面第一次執行時啟動；keep_alive.py 每小時以 WebSocket session 執行 ?health=1 頁面，
+    行程重新啟動後不必等使用者開啟頁面就會開始預熱。
+    steps 為 {名稱: 無參數函式}；步驟不可呼叫 st.*（背景執行緒沒有 Streamlit session）。
+    每個步驟的耗時與錯誤記在 status()，給 ?health=1 頁面與 keep_alive.py 檢查。
+    """
+
+    def __init__(self, steps, interval=600):
+        self.steps = steps
+        self.interval = interval
+        self.started = datetime.now()
+        self.runs = 0
+        self.last_run = None
+        self.results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+
+    def run(self):
+        """執行一輪所有步驟；單一步驟失敗不影響其他步驟。"""
+        for name, step in self.steps.items():
+            start = time.perf_counter()
+            try:
+                step()
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            with self._lock:
+                self.results[name] = {'耗時': round(time.perf_counter() - start, 3), '錯誤': error}
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now()
+        self._ready.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='warmup', daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            self.run()
+            time.sleep(self.interval)
+
+    def wait(self, timeout=None):
+        """等第一輪預熱完成，回傳是否已完成。"""
+        return self._ready.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            if self.runs == 0:
+                state = 'warming'
+            elif any(result['錯誤'] for result in self.results.values()):
+                state = 'degraded'
+            else:
+                state = 'ok'
+            return {
+                'status': state,
+                '啟動時間': self.started.isoformat(timespec='seconds'),
+                '最近預熱': self.last_run.isoformat(timespec='seconds') if self.last_run else None,
+                '預熱次數': self.runs,
+                '步驟': dict(self.results),
+            }
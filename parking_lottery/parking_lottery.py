@@ -1,98 +1,134 @@
 import streamlit as st
 import sqlite3
-import random
 from datetime import datetime
-import pandas as pd
-import io
+import os
+import sys
 import time
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+# 讓三個應用程式共用 parking_common 模組
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.lottery import (STRATEGY_LABELS, LotteryAlreadyDrawn, consecutive_losses, draw,
+                                    previous_periods, waitlist_label, write_results)
+from parking_common.migrations import ensure_schema
+from parking_common.services import drive_service
+from parking_common.storage import DriveStorage, RevisionConflict, SyncedDatabase
+from parking_common.warmup import Warmup
 
 # 获取字体文件路径
 FONT_PATH = 'parking_lottery/NotoSansTC-SemiBold.ttf'  # 确保将字体文件上传到 Streamlit Cloud 的文件夹
 
-# 设置 Google Drive API 凭据
-creds = Credentials.from_service_account_info(st.secrets["google_drive"])
-service = build('drive', 'v3', credentials=creds)
+# 设置 Google Drive API 凭据：第一次调用 Drive 时才建立连接
+service = drive_service(lambda: st.secrets["google_drive"])
+
+db_file_id = '1_TArAUZyzzZuLX3y320VpytfBlaoUGBB'  # 替换为你的数据库文件 ID
+db_file_path = '/tmp/test.db'
 
-def download_db(file_id, destination):
-    request = service.files().get_media(fileId=file_id)
-    fh = io.FileIO(destination, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
+@st.cache_resource
+def get_database(file_id, local_path):
+    # 30 秒内的重跑不再查询远端版本；抽签前会强制确认一次
+    return SyncedDatabase(DriveStorage(service, file_id), local_path, check_interval=30)
+
+def download_db(file_id, destination, force=False):
+    # 远端版本未变时不重新下载
+    database = get_database(file_id, destination)
+    database.sync(force=force)
+    ensure_schema(database)
+    return database.base_revision
 
 def upload_db(source, file_id):
-    file_metadata = {'name': 'test.db'}
-    media = MediaFileUpload(source, mimetype='application/x-sqlite3')
-    updated_file = service.files().update(
-        fileId=file_id,
-        media_body=media
-    ).execute()
+    # 写入时已在 database.writing() 内标记为待上传，这里只负责上传
+    database = get_database(file_id, source)
+    try:
+        database.flush()
+    except RevisionConflict:
+        # 其他程序已更新远端数据库：放弃本次变更并重新下载，避免覆盖对方的数据
+        database.discard()
+        st.error("数据库已被其他程序更新，本次变更未保存，请确认最新数据后重新操作。")
+        st.stop()
+
+@st.cache_resource
+def get_warmup(file_id, local_path):
+    # 后台预热：同步数据库（顺便更新 Drive 权杖）、载入 pandas 与报表字型，之后每 10 分钟同步一次
+    database = get_database(file_id, local_path)
+
+    def sync_database():
+        database.sync(force=True)
+        ensure_schema(database)
+
+    def load_report():
+        from parking_common.report import register_font, styles
+        styles(register_font(FONT_PATH))
+
+    def load_pandas():
+        import pandas
+
+    return Warmup({'資料庫': sync_database, '報表字型': load_report, 'pandas': load_pandas}).start()
 
 def get_db_connection():
-    # 使用本地 SQLite 数据库文件
-    db_file_path = '/tmp/test.db'
-    # 确保下载数据库文件到临时路径
-    download_db('1_TArAUZyzzZuLX3y320VpytfBlaoUGBB', db_file_path)  # 替换为你的数据库文件 ID
-    conn = sqlite3.connect(db_file_path)
-    return conn
-
-def perform_lottery(current):
+    # 使用本地 SQLite 数据库文件（由 load_snapshot 负责同步）
+    return sqlite3.connect(db_file_path)
+
+def load_snapshot(current, force=False):
+    """
+    本次 session 使用的数据快照：车位、抽签名单与人数。
+    远端版本未变时直接沿用 session_state 中的快照，页面显示的人数与实际抽签的名单一致。
+    """
+    revision = download_db(db_file_id, db_file_path, force=force)
+    snapshot = st.session_state.get('snapshot')
+    if snapshot is not None and snapshot['revision'] == revision and snapshot['current'] == current:
+        return snapshot
+
     conn = get_db_connection()
     cursor = conn.cursor()
-
-    cursor.execute("SELECT 車位編號 FROM 停車位 WHERE 使用狀態 = '抽籤'")
+    # 名单与车位都以固定顺序取出，同一个种子才能重现相同结果
+    cursor.execute("SELECT 車位編號 FROM 停車位 WHERE 使用狀態 = '抽籤' ORDER BY COALESCE(車位排序, 車位編號), 車位編號")
     spaces = [space[0] for space in cursor.fetchall()]
-
-    cursor.execute("SELECT 單位, 姓名, 姓名代號 FROM 申請紀錄 WHERE 期別 = ? AND 身分註記 = '一般'", (current,))
+    cursor.execute("SELECT 單位, 姓名, 姓名代號 FROM 申請紀錄 WHERE 期別 = ? AND 身分註記 = '一般' ORDER BY 姓名代號", (current,))
     participants = cursor.fetchall()
+    conn.close()
 
-    random.shuffle(participants)
+    snapshot = {'revision': revision, 'current': current, 'spaces': spaces, 'participants': participants}
+    st.session_state['snapshot'] = snapshot
+    return snapshot
 
-    results, waitlist = [], []
+def perform_lottery(snapshot, strategy='uniform', seed=None):
+    current, spaces, participants = snapshot['current'], snapshot['spaces'], snapshot['participants']
 
-    for i in range(len(participants)):
-        if i < len(spaces):
-            results.append((spaces[i], participants[i]))
-        else:
-            waitlist.append(participants[i])
+    context = {}
+    if strategy == 'weighted':
+        # 连续未中签期数，最多往前看 8 期
+        conn = get_db_connection()
+        context['losses'] = consecutive_losses(conn, [employee_id for _, _, employee_id in participants],
+                                               current, previous_periods(current, 8))
+        conn.close()
 
-    conn.close()
+    lottery = draw(participants, spaces, strategy=strategy, seed=seed, **context)
+    results, waitlist = lottery.results, lottery.waitlist
+
+    # pandas 只有抽签后显示结果时才需要，不拖慢首次加载页面
+    import pandas as pd
 
     results_df = pd.DataFrame([(unit, mask_name(name), space) for space, (unit, name, employee_id) in results],
                               columns=['單位', '姓名', '車位號碼'])
-    waitlist_df = pd.DataFrame([(unit, mask_name(name), f"備取{str(i+1).zfill(2)}") for i, (unit, name, employee_id) in enumerate(waitlist)],
+    waitlist_df = pd.DataFrame([(unit, mask_name(name), waitlist_label(i)) for i, (unit, name, employee_id) in enumerate(waitlist)],
                                columns=['單位', '姓名', '車位號碼'])
 
     combined_df = pd.concat([results_df, waitlist_df], ignore_index=True)
-    return results, waitlist, results_df, waitlist_df, combined_df
-
-def insert_lottery_results(current, results, waitlist):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        for space, (unit, name, employee_id) in results:
-            cursor.execute("INSERT INTO 抽籤繳費 (期別, 姓名代號, 車位編號, 繳費狀態) VALUES (?, ?, ?, '未繳費')",
-                        (current, employee_id, space))
-
-        for i, (unit, name, employee_id) in enumerate(waitlist):
-            backup_space_id = f"備取{str(i+1).zfill(2)}" if i < 9 else f"備取{i+1}"
-            cursor.execute("INSERT INTO 抽籤繳費 (期別, 姓名代號, 車位編號, 繳費狀態) VALUES (?, ?, ?, '未繳費')",
-                        (current, employee_id, backup_space_id))
-    finally:
-        conn.commit()
-        db_file_path = '/tmp/test.db'
-        upload_db(db_file_path, '1_TArAUZyzzZuLX3y320VpytfBlaoUGBB')  # 替换为你的数据库文件 ID
-        conn.close()
+    return lottery, results_df, waitlist_df, combined_df
+
+def insert_lottery_results(current, lottery, replace=False):
+    # 抽签前已取得最新数据库，这里直接写入本地文件，不再重新下载；
+    # 在 writing() 内提交并标记待上传，预热线程的 sync() 不会在提交后、上传前以远端版本覆盖
+    with get_database(db_file_id, db_file_path).writing():
+        conn = get_db_connection()
+        try:
+            # 同一个事务写入抽签纪录（种子、名单杂凑）与全部结果，失败时整批回滚
+            count = write_results(conn, current, lottery, datetime.now().isoformat(timespec='seconds'), replace)
+        finally:
+            conn.close()
+    # 提交成功后才上传一次
+    upload_db(db_file_path, db_file_id)
+    return count
 
 def generate_title(year, quarter):
     if quarter == 1:
@@ -106,64 +142,19 @@ def generate_title(year, quarter):
     return text
 
 def convert_df_to_pdf(df):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
+    # reportlab 只有产生 PDF 时才载入
+    from parking_common.report import table_pdf
+
     year, quarter = get_quarter(today.year, today.month)
     Taiwan_year = year - 1911
     date = f"{Taiwan_year:03d}年{today.month:02d}月{today.day:02d}日"
     title_text = generate_title(Taiwan_year, quarter)
 
-    # 注册字体
-    pdfmetrics.registerFont(TTFont('NotoSans', FONT_PATH))
-
-    # 自定义样式
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='CustomTitle', fontName='NotoSans', fontSize=16, spaceAfter=20, alignment=1, textColor=colors.black))
-    styles.add(ParagraphStyle(name='CustomTableHeader', fontName='NotoSans', fontSize=12, textColor=colors.white, alignment=1))
-    styles.add(ParagraphStyle(name='CustomTableData', fontName='NotoSans', fontSize=12, textColor=colors.black, alignment=1))
-    styles.add(ParagraphStyle(name='CustomFooter', fontName='NotoSans', fontSize=12, textColor=colors.black, spaceBefore=20))
-
-    # Add title
-    title = Paragraph(f'{title_text}', styles['CustomTitle'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    # Convert dataframe to table data
-    table_data = [df.columns.tolist()] + df.values.tolist()
-
-    # Style table header and data
-    styled_table_data = []
-    for i, row in enumerate(table_data):
-        styled_row = []
-        for cell in row:
-            if i == 0:  # Header
-                styled_row.append(Paragraph(str(cell), styles['CustomTableHeader']))
-            else:
-                styled_row.append(Paragraph(str(cell), styles['CustomTableData']))
-        styled_table_data.append(styled_row)
-
-    # Create a Table
-    table = Table(styled_table_data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Center align all cells
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Add notes with part of the text in red
+    # 字体与样式每个进程只建立一次，表格以 LongTable 分页并重复表头
     note_text = (
         f"備註：此為{date}抽籤結果，<font color='red'>不代表</font>{Taiwan_year:03d}年第{quarter}期最後停車名單。"
     )
-    note = Paragraph(note_text, styles['CustomFooter'])
-    elements.append(note)
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return table_pdf(title_text, df.columns.tolist(), df.values.tolist(), note_text, FONT_PATH)
 
 def mask_name(name):
     return name[0] + '○' + name[2:] if len(name) > 1 else name
@@ -186,17 +177,21 @@ year, quarter = get_quarter(today.year, today.month)
 Taiwan_year = year - 1911
 current = f"{Taiwan_year}{quarter:02}"
 document_text = generate_title(Taiwan_year, quarter)
+
+# 健康检查：?health=1 等第一轮预热完成后回报状态，不显示页面
+warmup = get_warmup(db_file_id, db_file_path)
+if st.query_params.get('health'):
+    warmup.wait(timeout=60)
+    st.json(warmup.status())
+    st.stop()
+
 st.title('停車位抽籤系統')
 
-# 连接到数据库
-conn = get_db_connection()
-cursor = conn.cursor()
-spaces_number = cursor.execute("SELECT COUNT(車位編號) FROM 停車位 WHERE 使用狀態 = '抽籤'").fetchone()[0]
-participants_number = cursor.execute("SELECT COUNT(姓名代號) FROM 申請紀錄 WHERE 期別 = ? AND 身分註記 = '一般'", (current,)).fetchone()[0]
-conn.close()
+# 取得本次 session 的数据快照（远端版本未变时不重新下载、不重新查询）
+snapshot = load_snapshot(current)
 
-st.write(f"##### 本期停車位數量: {spaces_number}")
-st.write(f"##### 本期停車位抽籤人數: {participants_number}")
+st.write(f"##### 本期停車位數量: {len(snapshot['spaces'])}")
+st.write(f"##### 本期停車位抽籤人數: {len(snapshot['participants'])}")
 
 # 使用 Streamlit 的会话状态来存储抽籤结果
 if 'results_df' not in st.session_state:
@@ -206,16 +201,32 @@ if 'waitlist_df' not in st.session_state:
 if 'combined_df' not in st.session_state:
     st.session_state['combined_df'] = None
 
+strategy = st.selectbox('抽籤方式', list(STRATEGY_LABELS), format_func=STRATEGY_LABELS.get)
+replace_previous = st.checkbox('本期已抽過籤時，重新抽籤並取代先前結果')
+
 if st.button('進行抽籤'):
+    # 抽签前强制确认远端版本，确保抽签名单就是画面上显示的人数
+    latest = load_snapshot(current, force=True)
+    if latest is not snapshot:
+        st.warning(f"資料已更新：本期停車位數量 {len(latest['spaces'])}、抽籤人數 {len(latest['participants'])}，"
+                   "請確認後再按一次進行抽籤。")
+        st.stop()
     with st.spinner('系統抽籤中，請稍候...'):
         time.sleep(5)
-        results, waitlist, results_df, waitlist_df, combined_df = perform_lottery(current)
-        st.session_state['results_df'] = results_df
-        st.session_state['waitlist_df'] = waitlist_df
-        st.session_state['combined_df'] = combined_df
-        st.write('### 車位分配結果')
-        st.dataframe(combined_df)
-        insert_lottery_results(current, results, waitlist)
+        lottery, results_df, waitlist_df, combined_df = perform_lottery(snapshot, strategy)
+        try:
+            count = insert_lottery_results(current, lottery, replace_previous)
+        except LotteryAlreadyDrawn as e:
+            st.error(f"{e}，本次結果未寫入。")
+        else:
+            # 写入成功的结果才能产生抽签结果档案
+            st.session_state['results_df'] = results_df
+            st.session_state['waitlist_df'] = waitlist_df
+            st.session_state['combined_df'] = combined_df
+            st.write('### 車位分配結果')
+            st.caption(f"抽籤種子：{lottery.seed}（已記錄於抽籤紀錄，可據以重現本次結果）")
+            st.dataframe(combined_df)
+            st.success(f"已寫入 {count} 筆抽籤結果")
 
 if st.session_state['combined_df'] is not None:
     if st.button('產生抽籤結果檔案'):
@@ -1,22 +1,25 @@
-import sqlite3
-import pandas as pd
 import streamlit as st
 from datetime import datetime
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-import io
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
+import sys
 import time
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+# 讓三個應用程式共用 parking_common 模組
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parking_common.batch import Batch, changed_rows, format_summary, records
+from parking_common.conflicts import SpaceConflict, conflicts, guard
+from parking_common.imports import (COLUMNS as IMPORT_COLUMNS, INSERT_NO_APPLICATION, ImportFormatError, read_rows,
+                                     template_csv, validate)
+from parking_common.mailer import Mailer, SMTPConnectionPool
+from parking_common.migrations import ensure_schema
+from parking_common.repository import Repository
+from parking_common.roster import check as check_roster, ensure as ensure_roster, is_fresh, refresh as refresh_roster
+from parking_common.search import lookup
+from parking_common.services import drive_service
+from parking_common.storage import DriveStorage, RevisionConflict, SyncedDatabase
+from parking_common.views import (APPLICATION_VIEW, GUARANTEED_VIEW, OVERVIEW_VIEW, PAGE_SIZE, PAYMENT_VIEW,
+                                   PENDING_VIEW, ROSTER_VIEW, SPACE_VIEW)
+from parking_common.warmup import Warmup
 
 # 获取字体文件路径
 FONT_PATH = 'parking_review/NotoSansTC-SemiBold.ttf'  # 确保将字体文件上传到 Streamlit Cloud 的文件夹
@@ -25,35 +28,38 @@ FONT_PATH = 'parking_review/NotoSansTC-SemiBold.ttf'  # 确保将字体文件上
 st.set_page_config(layout="wide",page_title="停車申請管理系統")
 
 
-# 设置 Google Drive API 凭据
-creds = Credentials.from_service_account_info(st.secrets["google_drive"])
-
-# 连接到 Google Drive API
-service = build('drive', 'v3', credentials=creds)
+# 设置 Google Drive API 凭据：第一次调用 Drive 时才建立连接，同一个进程共用
+service = drive_service(lambda: st.secrets["google_drive"])
 
 # 下载和上传 SQLite 数据库文件的函数
 
-def connect_db():
-    local_db_path = '/tmp/test.db'
-    conn = sqlite3.connect(local_db_path)
-    return conn
-    
-@st.cache_data(ttl=600, show_spinner="正在加載資料...")   
+@st.cache_resource
+def get_database(file_id, local_path):
+    # 上传前会检查远端版本，读取时可放宽为 60 秒内不重复查询远端版本
+    return SyncedDatabase(DriveStorage(service, file_id), local_path, check_interval=60)
+
+@st.cache_resource
+def get_repository(local_path='/tmp/test.db'):
+    # 每个线程共用一个设定好的连接，并统计各查询耗时；
+    # 写入在提交的同时标记数据库待上传，提交后、upload_db 前的 sync() 不会以远端版本覆盖
+    return Repository(local_path, database=get_database(db_file_id, local_path))
+
 def download_db(file_id, destination):
-    request = service.files().get_media(fileId=file_id)
-    fh = io.FileIO(destination, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-        
+    # 远端版本未变时不重新下载
+    database = get_database(file_id, destination)
+    database.sync()
+    ensure_schema(database)
+
 def upload_db(source, file_id):
-    file_metadata = {'name': 'test.db'}
-    media = MediaFileUpload(source, mimetype='application/x-sqlite3')
-    updated_file = service.files().update(
-        fileId=file_id,
-        media_body=media
-    ).execute()
+    # 写入已在 Repository 提交时标记为待上传，这里只负责上传
+    database = get_database(file_id, source)
+    try:
+        database.flush()
+    except RevisionConflict:
+        # 其他程序已更新远端数据库：放弃本次变更并重新下载，避免覆盖对方的数据
+        database.discard()
+        st.error("資料庫已被其他程式更新，本次變更未儲存，請確認最新資料後再操作一次。")
+        st.stop()
 
 def get_quarter(year, month):
     if 1 <= month <= 3:
@@ -97,543 +103,267 @@ def generate_title(year, quarter):
     return text
 
 def convert_custom_df_to_pdf(df):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
+    # reportlab 只有产生 PDF 时才载入
+    from parking_common.report import table_pdf
+
     year, quarter = get_quarter(today.year, today.month)
     Taiwan_year = year - 1911
     title_text = generate_title(Taiwan_year, quarter)
 
-    # 注册字体
-    pdfmetrics.registerFont(TTFont('NotoSans', FONT_PATH))
-
-    # 自定义样式
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='CustomTitle', fontName='NotoSans', fontSize=16, spaceAfter=20, alignment=1, textColor=colors.black))
-    styles.add(ParagraphStyle(name='CustomTableHeader', fontName='NotoSans', fontSize=12, textColor=colors.white, alignment=1))
-    styles.add(ParagraphStyle(name='CustomTableData', fontName='NotoSans', fontSize=12, textColor=colors.black, alignment=1))
-    styles.add(ParagraphStyle(name='CustomFooter', fontName='NotoSans', fontSize=12, textColor=colors.black, spaceBefore=20))
-
-    # Add title
-    title = Paragraph(f'{title_text}', styles['CustomTitle'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    # Convert dataframe to table data
-    table_data = [['單位', '姓名', '車位編號']] + df.values.tolist()
-
-    # Style table header and data
-    styled_table_data = []
-    for i, row in enumerate(table_data):
-        styled_row = []
-        for cell in row:
-            if i == 0:  # Header
-                styled_row.append(Paragraph(str(cell), styles['CustomTableHeader']))
-            else:
-                styled_row.append(Paragraph(str(cell), styles['CustomTableData']))
-        styled_table_data.append(styled_row)
-
-    # Create a Table
-    table = Table(styled_table_data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Center align all cells
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Add notes with part of the text in red
+    # 字体与样式每个进程只建立一次，表格以 LongTable 分页并重复表头
     note_text = (
         f"備註：本處<font color='red'>審核申請</font>時會<font color='red'>扣除前期停過</font>人員<font color='red'>名單</font>，故<font color='red'>本期已停車</font>之同仁<font color='red'>下期無須申請</font>。"
     )
-    note = Paragraph(note_text, styles['CustomFooter'])
-    elements.append(note)
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-def load_data1():
-    conn = connect_db()
-    query = "SELECT * FROM 申請紀錄 WHERE 車牌綁定 = 0"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-def load_data2(current):
-    conn = connect_db()
-    query = "SELECT * FROM 申請紀錄 WHERE 期別 = ?"
-    df = pd.read_sql_query(query, conn, params=(current,))
-    conn.close()
-    return df
+    return table_pdf(title_text, ['單位', '姓名', '車位編號'], df.values.tolist(), note_text, FONT_PATH)
 
-def load_data3():
-    conn = connect_db()
-    query = "SELECT 車位編號,使用狀態,車位備註 FROM 停車位 "
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-def load_data4(current):
-    conn = connect_db()
-    query = """
-    SELECT 
-        A.期別,
-        A.單位,
-        A.姓名代號,
-        A.姓名,
-        A.聯絡電話,
-        A.身分註記,
-        A.車牌號碼,
-        B.車位編號,
-        C.車位備註,
-        B.繳費狀態 
-    FROM 申請紀錄 A
-    INNER JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
-    LEFT JOIN 停車位 C ON B.車位編號 = C.車位編號
-    WHERE A.期別 = ? AND  A.身分註記 != '一般'
+def paged(view, key, params=(), values=None, duplicates=False):
     """
-    df = pd.read_sql_query(query, conn, params=(current,))
-    conn.close()
-    return df
-
-
-def load_data5(current):
-    conn = connect_db()
-    query = """
-    SELECT * FROM(
-        SELECT 
-            A.期別,
-            A.單位,
-            A.姓名代號,
-            A.姓名,
-            A.聯絡電話,
-            A.身分註記,
-            A.車牌號碼,
-            B.車位編號,
-            C.車位備註,
-            B.繳費狀態,
-            B.發票號碼,
-            C.車位排序
-        FROM 申請紀錄 A
-        INNER JOIN 抽籤繳費 B ON A.期別 = B.期別 AND A.姓名代號 = B.姓名代號
-        LEFT JOIN 停車位 C ON B.車位編號 = C.車位編號
-        WHERE A.期別 = ?
-        UNION
-        SELECT
-            E.期別,
-            D.單位,
-            D.姓名代號,
-            D.姓名,
-            D.聯絡電話,
-            D.身分註記,
-            D.車牌號碼,
-            D.車位編號,
-            C.車位備註,
-            E.繳費狀態,
-            E.發票號碼,
-            C.車位排序
-        FROM 免申請 D
-        INNER JOIN 免申請繳費 E ON D.姓名代號 = E.姓名代號
-        LEFT JOIN 停車位 C ON D.車位編號 = C.車位編號
-        WHERE E.期別 = ?)subquery
-        ORDER BY COALESCE(車位排序,車位編號)
+    显示翻页按钮并回传目前这一页的 DataFrame；筛选条件改变时回到第一页。
+    session_state 保存已看过各页的起点，上一页直接取回前一页的起点。
     """
-    df = pd.read_sql_query(query, conn, params=(current,current))
-    conn.close()
-    # 如果 '車位排序編號' 列存在则删除
-    if '車位排序' in df.columns:
-        df.drop(columns=['車位排序'], inplace=True)
-    return df
-
-def load_data6(current):
-    conn = connect_db()
-    query = """
-    SELECT * FROM (
-        SELECT 
-            A.姓名代號,
-            A.姓名,
-            A.單位,
-            A.車牌號碼,
-            A.聯絡電話,
-            A.身分註記,
-            A.車位編號,
-            B.車位備註,
-            B.使用狀態,
-            B.車位排序
-        FROM 免申請 A
-        LEFT JOIN 停車位 B ON A.車位編號 = B.車位編號
-        WHERE  A.期別 = ?
-        UNION
-        SELECT 
-            C.姓名代號,
-            C.姓名,
-            C.單位,
-            C.車牌號碼,
-            C.聯絡電話,
-            C.身分註記,
-            D.車位編號,
-            B.車位備註,
-            B.使用狀態,
-            B.車位排序
-        FROM 申請紀錄 C
-        INNER JOIN 繳費紀錄 D ON C.期別 = D.期別 AND C.姓名代號 = D.姓名代號
-        LEFT JOIN 停車位 B ON D.車位編號 = B.車位編號
-        WHERE C.期別 = ?
-    ) subquery
-    ORDER BY 車位排序 
-    """
-
-    try:
-        df = pd.read_sql_query(query, conn, params=(current,current))
-    except Exception as e:
-        st.error(f"SQL query failed: {e}")
-    finally:
-        conn.close()
-    
-    # 如果 '車位排序編號' 列存在则删除
-    if '車位排序' in df.columns:
-        df.drop(columns=['車位排序'], inplace=True)
-    
-    return df
-
-def load_data7(current):
-    conn = connect_db()
-    query = """
-    SELECT * FROM (
-        SELECT 
-            A.姓名代號,
-            A.姓名,
-            A.單位,
-            A.車牌號碼,
-            A.聯絡電話,
-            A.身分註記,
-            A.車位編號,
-            B.車位備註,
-            B.使用狀態,
-            B.車位排序
-        FROM 免申請 A
-        LEFT JOIN 停車位 B ON A.車位編號 = B.車位編號
-        WHERE A.期別 IS NULL OR A.期別 = ?
-        UNION
-        SELECT 
-            C.姓名代號,
-            C.姓名,
-            C.單位,
-            C.車牌號碼,
-            C.聯絡電話,
-            C.身分註記,
-            D.車位編號,
-            B.車位備註,
-            B.使用狀態,
-            B.車位排序
-        FROM 申請紀錄 C
-        INNER JOIN 繳費紀錄 D ON C.期別 = D.期別 AND C.姓名代號 = D.姓名代號
-        LEFT JOIN 停車位 B ON D.車位編號 = B.車位編號
-        WHERE C.期別 = ?
-        UNION
-        SELECT 
-            A.姓名代號,
-            A.姓名,
-            A.單位,
-            A.車牌號碼,
-            A.聯絡電話,
-            A.身分註記,
-            B.車位編號,
-            B.車位備註,
-            B.使用狀態,
-            B.車位排序
-        FROM 停車位 B
-        LEFT JOIN 免申請 A ON A.車位編號 = B.車位編號
-        WHERE B.車位編號 NOT IN (SELECT 車位編號 FROM 免申請 UNION SELECT 車位編號 FROM 繳費紀錄 WHERE 期別 = ? )
-    ) subquery
-    ORDER BY 車位排序
-    """
-
-    try:
-        df = pd.read_sql_query(query, conn, params=(current,current,current))
-    except Exception as e:
-        st.error(f"SQL query failed: {e}")
-    finally:
-        conn.close()
-    
-    # 如果 '車位排序編號' 列存在则删除
-    if '車位排序' in df.columns:
-        df.drop(columns=['車位排序'], inplace=True)
-    
-    return df
-# 更新数据库中的记录
-def update_record(period, name_code, plate_binding):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 申請紀錄
-    SET 車牌綁定 = ?
-    WHERE 期別 = ? AND 姓名代號 = ?
-    """
-    cursor.execute(update_query, (plate_binding, period, name_code))
-    conn.commit()
-    conn.close()
-
-def update_application_record(period, name, unit, name_code, car_id, contact_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 申請紀錄
-    SET 姓名 = ? , 單位 = ? , 車牌號碼 = ? , 聯絡電話 = ? 
-    WHERE 期別 = ? AND 姓名代號 = ?
-    """
-    cursor.execute(update_query, (name, unit, car_id, contact_number, period, name_code))
-    conn.commit()
-    conn.close()
-
-def update_no_lottery(name, unit, contact_number, identity_note, space_id, car_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 免申請
-    SET 姓名 = ? , 單位 = ? , 聯絡電話 = ? , 身分註記 = ?, 車位編號 = ?
-    WHERE 車牌號碼 = ? 
-    """
-    cursor.execute(update_query, (name, unit, contact_number, identity_note, space_id, car_id))
-    conn.commit()
-    conn.close()
+    repository = get_repository()
+    signature = (tuple(params), tuple(sorted((values or {}).items())), duplicates)
+    state = st.session_state.setdefault(f'{key}_pages', {'signature': signature, 'starts': [None]})
+    if state['signature'] != signature:
+        state['signature'], state['starts'] = signature, [None]
+    page = view.page(repository, params, values, state['starts'][-1], duplicates=duplicates)
+    total = view.count(repository, params, values, duplicates)
+
+    previous_column, info_column, next_column = st.columns([1, 4, 1])
+    if previous_column.button('上一頁', key=f'{key}_previous', disabled=len(state['starts']) == 1):
+        state['starts'].pop()
+        st.rerun()
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    info_column.caption(f"第 {len(state['starts'])} / {pages} 頁，共 {total} 筆")
+    if next_column.button('下一頁', key=f'{key}_next', disabled=page.next_key is None):
+        state['starts'].append(page.next_key)
+        st.rerun()
+    return page.df
 
 # 删除数据库中的记录
-def delete_no_application(car_number):
-    conn = connect_db()
-    cursor = conn.cursor()
+def delete_no_application(car_number, period):
     delete_query = """
     DELETE FROM 免申請
     WHERE 車牌號碼 = ?
     """
-    cursor.execute(delete_query, (car_number,))
-    conn.commit()
-    conn.close()
+    repository = get_repository()
+    with repository.transaction():
+        repository.execute(delete_query, (car_number,), name='delete_no_application')
+        ensure_roster(repository, period)
 
 def delete_record(period, name_code):
-    conn = connect_db()
-    cursor = conn.cursor()
     delete_query = """
     DELETE FROM 申請紀錄
     WHERE 期別 = ? AND 姓名代號 = ?
     """
-    cursor.execute(delete_query, (period, name_code))
-    conn.commit()
-    conn.close() 
+    get_repository().execute(delete_query, (period, name_code), name='delete_record')
 
 def delete_payment(period, name_code):
-    conn = connect_db()
-    cursor = conn.cursor()
     delete_query = """
     DELETE FROM 繳費紀錄
     WHERE 期別 = ? AND 姓名代號 = ?
     """
-    cursor.execute(delete_query, (period, name_code))
-    conn.commit()
-    conn.close() 
-
-def new_approved_car_record(employee_id, car_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM 使用者車牌 WHERE 姓名代號 = ? AND 車牌號碼 = ?", (employee_id, car_number))
-    output = cursor.fetchone()
-    conn.commit()
-    conn.close()
-    return output is None
-
-def new_no_application_payment(current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM 免申請繳費 WHERE 期別 = ? AND 姓名代號 = ?", (current, employee_id))
-    output = cursor.fetchone()
-    conn.commit()
-    conn.close()
-    return output is None
-
-def new_payment_record(current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM 免申請繳費 WHERE 期別 = ? AND 姓名代號 = ?", (current, employee_id))
-    output = cursor.fetchone()
-    conn.commit()
-    conn.close()
-    return output is None
+    repository = get_repository()
+    with repository.transaction():
+        repository.execute(delete_query, (period, name_code), name='delete_payment')
+        ensure_roster(repository, period)
 
 def exist_no_lottery(car_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM 免申請 WHERE 車牌號碼 = ?", (car_number,))
-    output = cursor.fetchone()
-    conn.commit()
-    conn.close()
-    return output is not None
-
-def exist_lottery_payment(current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM 抽籤繳費 WHERE 期別 = ? AND 姓名代號 = ?", (current, employee_id))
-    output = cursor.fetchone()
-    conn.commit()
-    conn.close()
+    output = get_repository().query_one("SELECT 1 FROM 免申請 WHERE 車牌號碼 = ?", (car_number,), name='exist_no_lottery')
     return output is not None
 
-def insert_car_approved_record(employee_id, car_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO 使用者車牌 (姓名代號,車牌號碼)
-    VALUES (?,?)
-    """
-    cursor.execute(insert_query, (employee_id, car_number))
-    conn.commit()
-    conn.close()
-
-def insert_parking_fee(current,employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO 抽籤繳費 (期別,姓名代號,繳費狀態)
-    VALUES (?,?,'未繳費')
-    """
-    cursor.execute(insert_query, (current,employee_id))
-    conn.commit()
-    conn.close()
-
-    # 新增数据库中的记录
-def insert_no_application(current, employee_id, name, unit, car_number, contact_info, special_needs, place_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO 免申請 (期別,姓名代號,姓名,單位,車牌號碼,聯絡電話,身分註記,車位編號)
-    VALUES (?,?,?,?,?,?,?,?)
-    """
-    cursor.execute(insert_query, (current, employee_id, name, unit, car_number, contact_info, special_needs, place_id))
-    conn.commit()
-    conn.close()
-
-def insert_no_application_payment(current, employee_id, space_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO 免申請繳費 (期別,姓名代號,車位編號,繳費狀態)
-    VALUES (?,?,?,'未繳費')
-    """
-    cursor.execute(insert_query, (current, employee_id, space_number))
-    conn.commit()
-    conn.close()
+# 批次更新：每次按鈕只開一個連線、一個交易，回傳各表異動筆數
+# 指定 period 時，寫入會造成該期車位重複分配就丟出 SpaceConflict 并整批回滚，
+# 并在同一交易内重算该期的停车一览（其他期别已由触发程序标为过期，查看时再重算）
+def run_batch(batch, period=None):
+    if not batch:
+        return {}
+    repository = get_repository()
+    with repository.transaction():
+        if period is None:
+            return batch.execute(repository)
+        with guard(repository, period):
+            summary = batch.execute(repository)
+        ensure_roster(repository, period)
+        return summary
+
+def load_roster(period):
+    # 停车一览过期（例如申请、抽签程序写入过来源数据表）时先重算该期，否则直接读取；
+    # 一览可由来源数据重算，不算待上传的变更，否则本机副本一直是 dirty，sync() 不再下载远端新数据
+    repository = get_repository()
+    if not is_fresh(repository, period):
+        with repository.transaction(pending=False):
+            ensure_roster(repository, period)
+
+def show_conflicts(period):
+    # 车位占用由触发程序维护，直接查询即可，不必载入各表比对
+    found = conflicts(get_repository(), period)
+    if found:
+        st.warning('；'.join(f"{space} 重複分配：{'、'.join(holders)}" for space, holders in found.items()))
+
+# 同一期同一人只新增一筆抽籤繳費
+INSERT_PARKING_FEE = """
+INSERT INTO 抽籤繳費 (期別,姓名代號,繳費狀態)
+SELECT ?1, ?2, '未繳費'
+WHERE NOT EXISTS (SELECT 1 FROM 抽籤繳費 WHERE 期別 = ?1 AND 姓名代號 = ?2)
+"""
+
+def approve_applications(rows, current):
+    non_general = rows[rows['身分註記'] != '一般']
+    batch = Batch()
+    batch.add('申請紀錄', "UPDATE 申請紀錄 SET 車牌綁定 = 1 WHERE 期別 = ? AND 姓名代號 = ?",
+              records(rows, ['期別', '姓名代號']))
+    batch.add('使用者車牌', """
+        INSERT INTO 使用者車牌 (姓名代號,車牌號碼)
+        SELECT ?1, ?2
+        WHERE NOT EXISTS (SELECT 1 FROM 使用者車牌 WHERE 姓名代號 = ?1 AND 車牌號碼 = ?2)
+        """, records(rows, ['姓名代號', '車牌號碼']))
+    batch.add('抽籤繳費', INSERT_PARKING_FEE,
+              [(current, employee_id) for (employee_id,) in records(non_general, ['姓名代號'])])
+    return run_batch(batch)
+
+def delete_records(rows):
+    batch = Batch().add('申請紀錄', "DELETE FROM 申請紀錄 WHERE 期別 = ? AND 姓名代號 = ?",
+                        records(rows, ['期別', '姓名代號']))
+    return run_batch(batch)
+
+def prepare_guaranteed_parking(rows):
+    rows = rows[(rows['身分註記'] != '一般') & (rows['車牌綁定'] == True)]
+    batch = Batch().add('抽籤繳費', INSERT_PARKING_FEE, records(rows, ['期別', '姓名代號']))
+    return run_batch(batch)
+
+def update_application_records(rows):
+    batch = Batch().add('申請紀錄', """
+        UPDATE 申請紀錄
+        SET 姓名 = ? , 單位 = ? , 車牌號碼 = ? , 聯絡電話 = ?
+        WHERE 期別 = ? AND 姓名代號 = ?
+        """, records(rows, ['姓名', '單位', '車牌號碼', '聯絡電話', '期別', '姓名代號']))
+    return run_batch(batch)
+
+def update_parking_spaces(rows):
+    batch = Batch().add('停車位', "UPDATE 停車位 SET 使用狀態 = ? , 車位備註 = ? WHERE 車位編號 = ?",
+                        records(rows, ['使用狀態', '車位備註', '車位編號']))
+    return run_batch(batch)
+
+def parking_distribution(rows, current):
+    batch = Batch().add('抽籤繳費', "UPDATE 抽籤繳費 SET 車位編號 = ? WHERE 期別 = ? AND 姓名代號 = ?",
+                        records(rows, ['車位編號', '期別', '姓名代號']))
+    return run_batch(batch, current)
+
+def update_payment_info(rows, current):
+    lottery_ids = {employee_id for (employee_id,) in
+                   get_repository().query("SELECT 姓名代號 FROM 抽籤繳費 WHERE 期別 = ?", (current,))}
+    lottery = rows[rows['姓名代號'].isin(lottery_ids)]
+    paid = lottery[lottery['繳費狀態'] == '已繳費']
+    no_lottery = rows[~rows['姓名代號'].isin(lottery_ids)]
+
+    batch = Batch()
+    batch.add('停車位', "UPDATE 停車位 SET 車位備註 = ? WHERE 車位編號 = ?",
+              records(rows, ['車位備註', '車位編號']))
+    batch.add('抽籤繳費', """
+        UPDATE 抽籤繳費
+        SET 車位編號 = ? , 繳費狀態 = ? , 發票號碼 = ?
+        WHERE 期別 = ? AND 姓名代號 = ?
+        """, [(space, status, bill, current, employee_id) for space, status, bill, employee_id in
+              records(lottery, ['車位編號', '繳費狀態', '發票號碼', '姓名代號'])])
+    batch.add('繳費紀錄', """
+        INSERT INTO 繳費紀錄 (期別,姓名代號,車位編號)
+        SELECT ?1, ?2, ?3
+        WHERE NOT EXISTS (SELECT 1 FROM 繳費紀錄 WHERE 期別 = ?1 AND 姓名代號 = ?2)
+        """, [(current, employee_id, space) for employee_id, space in
+              records(paid, ['姓名代號', '車位編號'])])
+    batch.add('免申請繳費', """
+        UPDATE 免申請繳費
+        SET 車位編號 = ? , 繳費狀態 = ? , 發票號碼 = ?
+        WHERE 期別 = ? AND 姓名代號 = ?
+        """, [(space, status, bill, current, employee_id) for space, status, bill, employee_id in
+              records(no_lottery, ['車位編號', '繳費狀態', '發票號碼', '姓名代號'])])
+    batch.add('免申請', """
+        UPDATE 免申請
+        SET 姓名 = ? , 單位 = ? , 聯絡電話 = ? , 身分註記 = ?, 車位編號 = ?
+        WHERE 車牌號碼 = ?
+        """, records(no_lottery, ['姓名', '單位', '聯絡電話', '身分註記', '車位編號', '車牌號碼']))
+    return run_batch(batch, current)
+
+def update_parking_overview(rows, actual_current):
+    no_lottery_cars = {car for (car,) in get_repository().query("SELECT 車牌號碼 FROM 免申請")}
+    no_lottery = rows[rows['車牌號碼'].isin(no_lottery_cars)]
+    applicants = rows[~rows['車牌號碼'].isin(no_lottery_cars)]
+
+    batch = Batch()
+    batch.add('停車位', "UPDATE 停車位 SET 使用狀態 = ? , 車位備註 = ? WHERE 車位編號 = ?",
+              records(rows, ['使用狀態', '車位備註', '車位編號']))
+    batch.add('免申請', """
+        UPDATE 免申請
+        SET 姓名 = ? , 單位 = ? , 聯絡電話 = ? , 身分註記 = ?, 車位編號 = ?
+        WHERE 車牌號碼 = ?
+        """, records(no_lottery, ['姓名', '單位', '聯絡電話', '身分註記', '車位編號', '車牌號碼']))
+    batch.add('申請紀錄', """
+        UPDATE 申請紀錄
+        SET 姓名 = ? , 單位 = ? , 車牌號碼 = ? , 聯絡電話 = ?
+        WHERE 期別 = ? AND 姓名代號 = ?
+        """, [(name, unit, car, phone, actual_current, employee_id) for name, unit, car, phone, employee_id in
+              records(applicants, ['姓名', '單位', '車牌號碼', '聯絡電話', '姓名代號'])])
+    batch.add('繳費紀錄', "UPDATE 繳費紀錄 SET 車位編號 = ? WHERE 期別 = ? AND 姓名代號 = ?",
+              [(space, actual_current, employee_id) for space, employee_id in
+               records(applicants, ['車位編號', '姓名代號'])])
+    return run_batch(batch, actual_current)
+
+def import_no_application(rows, identities, period):
+    # 检查与写入在同一交易内：有效的列一次写入（含车位重复检查与停车一览重算），错误逐列回报
+    repository = get_repository()
+    with repository.transaction():
+        report = validate(repository, rows, identities, period)
+        run_batch(Batch().add('免申請', INSERT_NO_APPLICATION, report.rows), period)
+    return report
+
+def insert_no_application_payments(current):
+    # 高階主管、值班一次轉入本期免申請繳費，已存在者略過
+    batch = Batch().add('免申請繳費', """
+        INSERT INTO 免申請繳費 (期別,姓名代號,車位編號,繳費狀態)
+        SELECT ?1, A.姓名代號, A.車位編號, '未繳費'
+        FROM 免申請 A
+        WHERE A.身分註記 IN ('高階主管', '值班')
+          AND NOT EXISTS (SELECT 1 FROM 免申請繳費 B WHERE B.期別 = ?1 AND B.姓名代號 = A.姓名代號)
+        """, [(current,)])
+    return run_batch(batch)
 
-def insert_payment_record(current, employee_id, space_number):
-    conn = connect_db()
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO 繳費紀錄 (期別,姓名代號,車位編號)
-    VALUES (?,?,?)
-    """
-    cursor.execute(insert_query, (current, employee_id, space_number))
-    conn.commit()
-    conn.close()
+# 寄信佇列
+outbox_path = '/tmp/outbox.db'
 
-def update_parking_space(space_id, status, note):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 停車位
-    SET 使用狀態 = ? , 車位備註 = ?
-    WHERE 車位編號 = ? 
-    """
-    cursor.execute(update_query, (status, note, space_id))
-    conn.commit()
-    conn.close()
+@st.cache_resource
+def get_mailer():
+    # 审核一次通过多笔时共用同一个 SMTP 连接，由后台线程分批寄出
+    sender_email = os.getenv("EMAIL_USER")
+    pool = SMTPConnectionPool("smtp.gmail.com", 465, sender_email, os.getenv("EMAIL_PASS"))
+    mailer = Mailer(outbox_path, pool, sender_email)
+    mailer.start()
+    return mailer
 
-def update_parking_note(space_id, note):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 停車位
-    SET  車位備註 = ? 
-    WHERE 車位編號 = ? 
-    """
-    cursor.execute(update_query, (note, space_id))
-    conn.commit()
-    conn.close()
+@st.cache_resource
+def get_warmup(file_id, local_path):
+    # 后台预热：同步数据库（顺便更新 Drive 权杖）、载入 pandas 与报表字型，之后每 10 分钟同步一次
+    database = get_database(file_id, local_path)
 
-def parking_distribution(space_id, current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 抽籤繳費
-    SET 車位編號 = ? 
-    WHERE 期別 = ?  AND 姓名代號 = ?
-    """
-    cursor.execute(update_query, (space_id, current, employee_id))
-    conn.commit()
-    conn.close()
+    def sync_database():
+        database.sync(force=True)
+        ensure_schema(database)
 
-def update_lottery_payment(car_id, payment_status, bill_number, current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 抽籤繳費
-    SET 車位編號 = ? , 繳費狀態 = ? , 發票號碼 = ?
-    WHERE 期別 = ?  AND 姓名代號 = ?
-    """
-    cursor.execute(update_query, (car_id, payment_status, bill_number, current, employee_id))
-    conn.commit()
-    conn.close()
+    def load_report():
+        from parking_common.report import register_font, styles
+        styles(register_font(FONT_PATH))
 
-def update_no_application_payment(car_id, payment_status, bill_number, current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 免申請繳費
-    SET 車位編號 = ? , 繳費狀態 = ? , 發票號碼 = ?
-    WHERE 期別 = ?  AND 姓名代號 = ?
-    """
-    cursor.execute(update_query, (car_id, payment_status, bill_number, current, employee_id))
-    conn.commit()
-    conn.close()
+    def load_pandas():
+        import pandas
 
-def update_confirm_parking(space_id, actual_current, employee_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    update_query = """
-    UPDATE 繳費紀錄
-    SET 車位編號 = ? 
-    WHERE 期別 = ? AND 姓名代號 = ? 
-    """
-    cursor.execute(update_query, (space_id, actual_current, employee_id))
-    conn.commit()
-    conn.close()
+    return Warmup({'資料庫': sync_database, '報表字型': load_report, 'pandas': load_pandas}).start()
 
-# 函數來發送電子郵件
+# 函數來發送電子郵件（只排入佇列）
 def send_email(employee_id, name, text, subject_text):
-    sender_email = os.getenv("EMAIL_USER")
-    sender_password = os.getenv("EMAIL_PASS")
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 465
-
-    subject = subject_text
     body = f"{name}您好,\n{text}\n秘書處 大樓管理組 敬上\n聯絡電話:(02)2366-6395"
-
-    # 建立 MIMEText 物件
-    message = MIMEMultipart()
-    message["From"] = sender_email
-    message["To"] = f"u{employee_id}@taipower.com.tw"
-    message["Subject"] = subject
-
-    # 附加郵件內容
-    message.attach(MIMEText(body, "plain"))
-
-    # 使用 smtplib 發送郵件
     try:
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email,f"u{employee_id}@taipower.com.tw",message.as_string())
-        server.close()
-        return "郵件已發送成功！"
+        get_mailer().enqueue(f"u{employee_id}@taipower.com.tw", subject_text, body)
+        return "郵件已排入寄送佇列！"
     except Exception as e:
         return f"發送郵件時發生錯誤: {e}"
 today = datetime.today()
@@ -646,6 +376,14 @@ db_file_id = '1_TArAUZyzzZuLX3y320VpytfBlaoUGBB'
 
 # 下载数据库文件到本地
 local_db_path = '/tmp/test.db'
+
+# 健康检查：?health=1 等第一轮预热完成后回报状态，不显示页面
+warmup = get_warmup(db_file_id, local_db_path)
+if st.query_params.get('health'):
+    warmup.wait(timeout=60)
+    st.json(warmup.status())
+    st.stop()
+
 download_db(db_file_id, local_db_path)
 
 # 設定有效的帳號和密碼
@@ -678,13 +416,34 @@ if not st.session_state['logged_in']:
 
 # 若已登入，顯示主頁內容
 else:
+    # 登录页面不需要 pandas，登录后才载入
+    import pandas as pd
+
     st.title("停車申請管理系統")
+    with st.sidebar.expander("快速查詢", expanded=True):
+        # 跨期別、跨资料表以姓名、员工编号或车牌片段查询，走全文检索索引
+        keyword = st.text_input("姓名、員工編號或車牌", key="search_keyword")
+        if keyword.strip():
+            results = lookup(get_repository(), keyword)
+            if not results:
+                st.caption("查無資料")
+            for table, df in results.items():
+                st.caption(f"{table}（{len(df)} 筆）")
+                st.dataframe(df, hide_index=True)
+    with st.sidebar.expander("查詢耗時統計"):
+        timings = get_repository().timings()
+        if timings:
+            st.dataframe(pd.DataFrame(timings), hide_index=True)
+        st.caption("查詢結果快取")
+        st.json(get_repository().cache.metrics())
+        if st.button("重設統計"):
+            get_repository().stats.reset()
     # 创建选项卡
     tab1, tab2, tab4, tab5, tab6= st.tabs(["停車申請待審核", f"{current}停車申請一覽表", "保障停車分配車位", f"{current}員工停車繳費維護", "地下停車一覽表"])
     
     with tab1:
         st.header("停車申請待審核")
-        df1 = load_data1()
+        df1 = paged(PENDING_VIEW, 'tab1')
         df1['通過'] = False
         df1['不通過'] = False
         editable_columns = ['通過', '不通過']
@@ -697,26 +456,16 @@ else:
         #測試中關閉寄信功能
         if st.button('審核確認'):
             try:
-                for index, row in edited_df1.iterrows():
-                    if row['通過'] and row['不通過']:
-                        st.error("欄位有誤，請調整後再試")
-                    elif row['通過']:
-                        update_record(row['期別'], row['姓名代號'], True)
-                        if new_approved_car_record(row['姓名代號'], row['車牌號碼']):
-                            insert_car_approved_record(row['姓名代號'], row['車牌號碼'])
-                            subject_text = '本期停車抽籤申請文件審核通過通知'
-                            text = '本期停車抽籤申請資料審核通過，謝謝您。'
-                            #send_email(row['姓名代號'], row['姓名'], text, subject_text)
-                            st.success("審核完成")
-                        else:
-                            subject_text = '本期停車申請文件審核通過通知'
-                            text = '本期停車申請資料審核通過，謝謝您。'
-                            #send_email(row['姓名代號'], row['姓名'], text, subject_text)
-                            st.success("審核完成")
-                        if row['身分註記'] != '一般':
-                            insert_parking_fee(current, row['姓名代號'])
-                    elif row['不通過']:
-                        st.session_state.not_passed_list.append(row.to_dict())
+                conflicted = edited_df1['通過'] & edited_df1['不通過']
+                if conflicted.any():
+                    st.error("欄位有誤，請調整後再試")
+                approved = edited_df1[edited_df1['通過'] & ~conflicted]
+                summary = approve_applications(approved, current)
+                #for index, row in approved.iterrows():
+                #    send_email(row['姓名代號'], row['姓名'], '本期停車申請資料審核通過，謝謝您。', '本期停車申請文件審核通過通知')
+                st.success(f"審核完成：{format_summary(summary)}")
+                rejected = edited_df1[edited_df1['不通過'] & ~conflicted]
+                st.session_state.not_passed_list.extend(rejected.to_dict('records'))
             finally:
                 upload_db(local_db_path, db_file_id)
                 st.rerun()
@@ -737,9 +486,7 @@ else:
     with tab2:
         st.header(f"{current}停車申請一覽表")
         name = st.text_input("請輸入要篩選的姓名", key="name_input_tab2") 
-        df2 = load_data2(current)
-        if name:
-            df2 = df2[df2['姓名'].str.contains(name)]
+        df2 = paged(APPLICATION_VIEW, 'tab2', (current,), {'姓名': name})
         df2['更新資料'] = False
         df2['刪除資料'] = False
         editable_columns = ['車牌號碼','聯絡電話','更新資料','刪除資料']
@@ -751,10 +498,8 @@ else:
         with button1:
             if st.button('刪除確認', key="delete_confirm_button"):
                 try:
-                    for index, row in edited_df2.iterrows():
-                        if row['刪除資料']:
-                            delete_record(row['期別'], row['姓名代號'])
-                            st.success("資料刪除成功")
+                    summary = delete_records(edited_df2[edited_df2['刪除資料']])
+                    st.success(f"資料刪除成功：{format_summary(summary)}")
                 finally:
                     upload_db(local_db_path, db_file_id)
                     st.rerun()  # 重新運行腳本，刷新頁面
@@ -762,12 +507,11 @@ else:
         with button2:
             if st.button('保障停車準備分配車位', key="prepare_parking_button"):
                 try:
-                    for index, row in edited_df2.iterrows():
-                        if row['身分註記'] != '一般' and row['車牌綁定'] == True:
-                            insert_parking_fee(row['期別'], row['姓名代號'])
-                    st.success('免抽籤資料匯入成功')
-                except:
-                    st.error('本期免抽籤資料已經匯入進繳費表')
+                    summary = prepare_guaranteed_parking(edited_df2)
+                    if summary:
+                        st.success(f'免抽籤資料匯入成功：{format_summary(summary)}')
+                    else:
+                        st.error('本期免抽籤資料已經匯入進繳費表')
                 finally:
                     upload_db(local_db_path, db_file_id)
                     st.rerun()  # 重新運行腳本，刷新頁面
@@ -775,28 +519,23 @@ else:
         with button3:
             if st.button('更新確認', key="update_confirm_button"):
                 try:
-                    for index, row in edited_df2.iterrows():
-                        if row['更新資料']:
-                            update_application_record(row['期別'], row['姓名'], row['單位'], row['姓名代號'], row['車牌號碼'], row['聯絡電話'])
-                    st.success('車牌更新成功')
+                    rows = changed_rows(df2, edited_df2, ['車牌號碼', '聯絡電話'], flag='更新資料')
+                    summary = update_application_records(rows)
+                    st.success(f'車牌更新成功：{format_summary(summary)}')
                 finally:
                     upload_db(local_db_path, db_file_id)
                     st.rerun()  # 重新運行腳本，刷新頁面
     with tab4:
         st.header("地下停車位使用狀態維護")  
-        # 加載數據
-        df4 = load_data3()
-        df4['更新資料'] = False
-    
         # 定義下拉選單選項
         options = ["公務車", "公務車(電動)", "值班", "高階主管", "獨董", "公務保留", "身心障礙", "孕婦", "保障", "抽籤"]
     
         # 添加篩選條件選擇框
         filter_option = st.selectbox("篩選使用狀態", ["所有"] + options)
     
-        # 根據篩選條件過濾數據框
-        if filter_option != "所有":
-            df4 = df4[df4['使用狀態'] == filter_option]
+        # 依篩選條件查詢這一頁的數據
+        df4 = paged(SPACE_VIEW, 'tab4', values={'使用狀態': None if filter_option == "所有" else filter_option})
+        df4['更新資料'] = False
     
         # 禁用的列
         column1 = ['車位編號']
@@ -819,27 +558,22 @@ else:
         # 更新確認按鈕
         if st.button('更新確認'):
             try:
-                for index, row in edited_df4.iterrows():
-                    if row['更新資料']:
-                        update_parking_space(row['車位編號'], row['使用狀態'], row['車位備註'])
-                        st.success('資料更新成功')
+                rows = changed_rows(df4, edited_df4, ['使用狀態', '車位備註'], flag='更新資料')
+                summary = update_parking_spaces(rows)
+                st.success(f'資料更新成功：{format_summary(summary)}')
             finally:
                 upload_db(local_db_path, db_file_id)
                 st.rerun()  # 重新運行腳本，刷新頁面
     
         st.header("保障停車分配車位")
-        df5 = load_data4(current)
-        df5['分配車位'] = False
-        editable_column = ['車位編號','分配車位']
-        disabled_columns2 = [col for col in df5.columns if col not in editable_column]
-    
         # 添加"是否重複車位"選項
         show_duplicate = st.checkbox('確認重複車位', key = 'df5')
+        show_conflicts(current)
     
-        if show_duplicate:
-            # 找出重複的車位編號
-            duplicated_values = df5[df5.duplicated(subset='車位編號', keep=False)]
-            df5 = duplicated_values
+        df5 = paged(GUARANTEED_VIEW, 'df5', (current,), duplicates=show_duplicate)
+        df5['分配車位'] = False
+        editable_column = ['車位編號','分配車位']
+        disabled_columns2 = [col for col in df5.columns if col not in editable_column]
     
         edited_df5 = st.data_editor(
             df5,
@@ -848,11 +582,13 @@ else:
     
         if st.button('分配車位確認'):
             try:
-                for index, row in edited_df5.iterrows():
-                    if row['分配車位']:
-                        parking_distribution(row['車位編號'], row['期別'], row['姓名代號'])
-                        st.success('車位分配成功')
-            finally:
+                rows = changed_rows(df5, edited_df5, ['車位編號'], flag='分配車位')
+                summary = parking_distribution(rows, current)
+                st.success(f'車位分配成功：{format_summary(summary)}')
+            except SpaceConflict as e:
+                # 整批已回滚，留在页面上显示原因
+                st.error(f'未更新：{e}')
+            else:
                 upload_db(local_db_path, db_file_id)
                 st.rerun()  # 重新運行腳本，刷新頁面
     with tab5:
@@ -861,8 +597,6 @@ else:
         # 姓名输入框
         name = st.text_input("請輸入要篩選的姓名", key="text_input_name_tab5")
     
-        df6 = load_data5(current)
-    
         # 篩選條件下拉選單
         filter_option1 = st.selectbox(
             "選擇車位篩選條件",
@@ -873,30 +607,16 @@ else:
         # 添加篩選條件選擇框
         filter_option2 = st.selectbox("篩選繳費狀態", ["所有"] + options, key="filter_option2")
     
-        # 根據篩選條件過濾數據框
-        if filter_option2 != "所有":
-            df6 = df6[df6['繳費狀態'] == filter_option2]
-    
-        # 根據姓名篩選數據
-        if name:
-            df6 = df6[df6['姓名'].str.contains(name)]
-    
-        # 确保 '車位編號' 列为字符串，并填充 NaN 值
-        df6['車位編號'] = df6['車位編號'].astype(str).fillna('')
-    
-        # 根據選擇的篩選條件進行進一步篩選
-        if filter_option1 == "正取":
-            df6 = df6[df6['車位編號'].str.startswith('B')]
-        elif filter_option1 == "備取":
-            df6 = df6[df6['車位編號'].str.startswith('備取')]
-    
         # 添加"是否重複車位"選項
         show_duplicate = st.checkbox('確認重複車位', key = 'df6')
+        show_conflicts(current)
     
-        if show_duplicate:
-            # 找出重複的車位編號
-            duplicated_values = df6[df6.duplicated(subset='車位編號', keep=False)]
-            df6 = duplicated_values
+        # 姓名、繳費狀態、正取／備取都在查詢中篩選
+        df6 = paged(PAYMENT_VIEW, 'df6', (current,), {
+            '姓名': name,
+            '繳費狀態': None if filter_option2 == "所有" else filter_option2,
+            '車位': None if filter_option1 == "所有" else filter_option1,
+        }, duplicates=show_duplicate)
     
         # 添加電子郵件列
         df6['電子郵件'] = df6['姓名代號'].apply(lambda x: f"u{x}@taipower.com.tw")
@@ -922,22 +642,12 @@ else:
     
         if st.button('更新資訊確認', key="update_info_button"):
             try:
-                for index, row in edited_df6.iterrows():
-                    if row['更新資訊']:
-                        update_parking_note(row['車位編號'], row['車位備註'])
-                        if exist_lottery_payment(current, row['姓名代號']):
-                            if row['繳費狀態'] == '已繳費' and new_payment_record(current, row['姓名代號']):
-                                update_lottery_payment(row['車位編號'], row['繳費狀態'], row['發票號碼'], current, row['姓名代號'])
-                                insert_payment_record(current, row['姓名代號'], row['車位編號'])
-                                st.success('資料更新成功')
-                            else:
-                                update_lottery_payment(row['車位編號'], row['繳費狀態'], row['發票號碼'], current, row['姓名代號'])
-                                st.success('資料更新成功')
-                        else:
-                            update_no_application_payment(row['車位編號'], row['繳費狀態'], row['發票號碼'], current, row['姓名代號'])
-                            update_no_lottery(row['姓名'], row['單位'], row['聯絡電話'], row['身分註記'], row['車位編號'], row['車牌號碼'])
-                            st.success('資料更新成功')
-            finally:
+                rows = changed_rows(df6, edited_df6, ['車位編號', '車位備註', '繳費狀態', '發票號碼'], flag='更新資訊')
+                summary = update_payment_info(rows, current)
+                st.success(f'資料更新成功：{format_summary(summary)}')
+            except SpaceConflict as e:
+                st.error(f'未更新：{e}')
+            else:
                 upload_db(local_db_path, db_file_id)
                 st.rerun()
     
@@ -946,18 +656,9 @@ else:
         # 姓名输入框
         name = st.text_input("請輸入要篩選的姓名", key="text_input_name_df7")
     
-        df7 = load_data6(current)
-    
-        # 根據姓名篩選數據
-        if name:
-            df7 = df7[df7['姓名'].str.contains(name)]
-            # 添加"是否重複車位"選項
-        
+        # 添加"是否重複車位"選項
         show_duplicate = st.checkbox('確認重複車位', key = 'df7')
-        if show_duplicate:
-            # 找出重複的車位編號
-            duplicated_values = df7[df7.duplicated(subset='車位編號', keep=False)]
-            df7 = duplicated_values
+        df7 = paged(ROSTER_VIEW, 'df7', (current,), {'姓名': name}, duplicates=show_duplicate)
     
         df7['刪除資訊'] = False
         editable_columns = ['刪除資訊']
@@ -983,17 +684,17 @@ else:
                 if st.button(f"確認刪除 - {row['姓名']} ({row['車牌號碼']})", key=f"confirm_delete_parking_button_{i}"):
                     st.session_state.delete_parking_list.pop(i)
                     if exist_no_lottery(row['車牌號碼']):
-                        delete_no_application(row['車牌號碼'])
+                        delete_no_application(row['車牌號碼'], current)
                     else:
                         delete_payment(current, row['姓名代號'])
                     st.success('資料刪除成功')
                     upload_db(local_db_path, db_file_id)
                     st.rerun()
-        # 產生pdf，只保留'單位', '姓名', '車位編號'三欄
-        df7_for_pdf = df7[df7['身分註記'].isin(['一般', '一般(轉讓)'])][['單位', '姓名', '車位編號']].copy()
-        df7_for_pdf['姓名'] = df7_for_pdf['姓名'].apply(mask_name)  # 遮蔽姓名
-    
         if st.button(f"產生{current}地下停車場員工自用車停車名冊電子檔"):
+            # 名冊需要完整名單（不分頁），只保留'單位', '姓名', '車位編號'三欄
+            df7_all = ROSTER_VIEW.all(get_repository(), (current,), {'姓名': name}, duplicates=show_duplicate)
+            df7_for_pdf = df7_all[df7_all['身分註記'].isin(['一般', '一般(轉讓)'])][['單位', '姓名', '車位編號']].copy()
+            df7_for_pdf['姓名'] = df7_for_pdf['姓名'].apply(mask_name)  # 遮蔽姓名
             pdf_file = convert_custom_df_to_pdf(df7_for_pdf)
             st.download_button(
                 label="下載電子檔",
@@ -1011,23 +712,19 @@ else:
         options1 = ["公務車", "公務車(電動)", "值班", "高階主管", "獨董", "公務保留", "身心障礙", "孕婦", "保障", "一般", "一般(轉讓)", "專案"]
         options2 = ["公務車", "公務車(電動)", "值班", "高階主管", "獨董", "公務保留", "身心障礙", "孕婦", "保障", "抽籤"]
     
-        df7 = load_data7(actual_current)
-        df7['更新資訊'] = False
-        df7['刪除資訊'] = False
-    
         name = st.text_input("請輸入要篩選的姓名", key="text_input_name_tab6")
-        if name:
-            df7['姓名'] = df7['姓名'].astype(str)  # 确保 '姓名' 列是字符串类型
-            df7 = df7[df7['姓名'].str.contains(name)]
         filter_option = st.selectbox("篩選車位使用狀態", ["所有"] + options2, key="filter_option_tab6")
-        if filter_option != "所有":
-            df7 = df7[df7['使用狀態'] == filter_option]
-            
         show_duplicate = st.checkbox('確認重複車位', key = 'df7-1')
-        if show_duplicate:
-            # 找出重複的車位編號
-            duplicated_values = df7[df7.duplicated(subset='車位編號', keep=False)]
-            df7 = duplicated_values
+        show_conflicts(actual_current)
+    
+        # 读取实体化的停车一览，只扫描该期的索引范围
+        load_roster(actual_current)
+        df7 = paged(OVERVIEW_VIEW, 'tab6', (actual_current,), {
+            '姓名': name,
+            '使用狀態': None if filter_option == "所有" else filter_option,
+        }, duplicates=show_duplicate)
+        df7['更新資訊'] = False
+        df7['刪除資訊'] = False
     
         uneditable_columns = ['姓名代號', '車牌號碼']
         disabled_columns = [col for col in df7.columns if col in uneditable_columns]
@@ -1052,21 +749,32 @@ else:
             key="data_editor_df7_tab6"
         )
     
+        with st.expander("停車一覽表維護"):
+            st.caption("一覽表為每期預先計算的結果，資料異動時自動更新；若懷疑不一致可檢查或重新計算。")
+            if st.button("檢查一致性", key="roster_check_button"):
+                result = check_roster(get_repository(), actual_current)
+                if any(result.values()):
+                    st.error(f"與即時查詢不一致：缺少 {result['缺少']} 筆，多出 {result['多出']} 筆")
+                else:
+                    st.success("與即時查詢一致")
+            if st.button("重新計算", key="roster_rebuild_button"):
+                # 手动重算视为修正资料，上传后其他程序也取得重算结果
+                with get_repository().transaction():
+                    refresh_roster(get_repository(), actual_current)
+                upload_db(local_db_path, db_file_id)
+                st.rerun()
+
         button1, button2, button3 = st.columns(3)
     
         with button1:
             if st.button('彙整更新確認', key="update_button_tab6"):
                 try:
-                    for index, row in edited_df7.iterrows():
-                        if row['更新資訊']:
-                            update_parking_space(row['車位編號'], row['使用狀態'], row['車位備註'])
-                            if exist_no_lottery(row['車牌號碼']):
-                                update_no_lottery(row['姓名'], row['單位'], row['聯絡電話'], row['身分註記'], row['車位編號'], row['車牌號碼'])
-                            else:
-                                update_application_record(actual_current, row['姓名'], row['單位'], row['姓名代號'], row['車牌號碼'], row['聯絡電話'])
-                                update_confirm_parking(row['車位編號'], actual_current, row['姓名代號'])
-                    st.success('資料更新成功')
-                finally:
+                    rows = changed_rows(df7, edited_df7, ['姓名', '單位', '聯絡電話', '身分註記', '車位編號', '車位備註', '使用狀態'], flag='更新資訊')
+                    summary = update_parking_overview(rows, actual_current)
+                    st.success(f'資料更新成功：{format_summary(summary)}')
+                except SpaceConflict as e:
+                    st.error(f'未更新：{e}')
+                else:
                     upload_db(local_db_path, db_file_id)
                     st.rerun()
     
@@ -1085,7 +793,7 @@ else:
                     if st.button(f"確認刪除 - {row['姓名']} ({row['車牌號碼']})", key=f"confirm_delete_button_tab6_{i}"):
                         st.session_state.delete_data_list.pop(i)
                         if exist_no_lottery(row['車牌號碼']):
-                            delete_no_application(row['車牌號碼'])
+                            delete_no_application(row['車牌號碼'], actual_current)
                         else:
                             delete_payment(actual_current, row['姓名代號'])
                         st.success('資料刪除成功')
@@ -1095,31 +803,30 @@ else:
         with button3:
             if st.button(f'{current}免申請停車進繳費表', key="payment_table_button"):
                 try:
-                    # 先从数据库中获取满足条件的 姓名代號 和 車位編號
-                    conn = connect_db()
-                    query = """
-                    SELECT 姓名代號, 車位編號 
-                    FROM 免申請 
-                    WHERE 身分註記 IN ('高階主管', '值班')
-                    """
-                    df_high_level = pd.read_sql_query(query, conn)
-                    conn.close()
-    
-                    # 对每一行数据执行 insert_no_application_payment 操作
-                    for index, row in df_high_level.iterrows():
-                        if new_no_application_payment(current, row['姓名代號']):
-                            insert_no_application_payment(current, row['姓名代號'], row['車位編號'])
-    
-                    st.success(f'{current}免申請停車進繳費表成功')
-    
+                    summary = insert_no_application_payments(current)
+                    st.success(f'{current}免申請停車進繳費表成功：{format_summary(summary)}')
                 finally:
                     upload_db(local_db_path, db_file_id)
                     st.rerun()
     
         st.header("免申請停車資料新增")
-        columns = ['期別', '姓名代號', '姓名', '單位', '車牌號碼', '聯絡電話', '身分註記', '車位編號']
         options = ["公務車", "公務車(電動)", "值班", "高階主管", "獨董", "公務保留", "孕婦", "一般(轉讓)", "專案"]
-        df8 = pd.DataFrame(columns=columns)
+        # 上一次新增的结果（写入后重新执行脚本，结果暂存在 session_state）
+        report = st.session_state.pop('import_report', None)
+        if report is not None:
+            if not report.total:
+                st.info("沒有可新增的資料")
+            if report.rows:
+                st.success(f"資料新增成功：{len(report.rows)} 筆（共 {report.total} 筆）")
+            if report.errors:
+                st.error(f"{len(report.errors)} 筆未新增，請修正後重新上傳這些列")
+                st.dataframe(pd.DataFrame(report.errors, columns=['列號', '姓名代號', '錯誤說明']), hide_index=True)
+
+        # 大量资料（例如换季时重新登录公务车、高阶主管）以 CSV／Excel 汇入，少量资料直接在下表输入
+        uploaded_file = st.file_uploader("上傳 CSV 或 Excel 檔（欄位同下表，第一列為標題）", type=['csv', 'xlsx'],
+                                         key="no_application_file")
+        st.download_button("下載匯入範本", template_csv(), file_name="免申請匯入範本.csv", mime="text/csv")
+        df8 = pd.DataFrame(columns=IMPORT_COLUMNS)
         edited_df8 = st.data_editor(df8, num_rows="dynamic", column_config={
             "身分註記": st.column_config.SelectboxColumn(
                 "身分註記",
@@ -1130,12 +837,17 @@ else:
         }, key="data_editor_df8")
     
         if st.button('新增確認', key="insert_confirm_button"):
-            for index, row in edited_df8.iterrows():
-                try:
-                    insert_no_application(row['期別'], row['姓名代號'], row['姓名'], row['單位'], row['車牌號碼'], row['聯絡電話'], row['身分註記'], row['車位編號'])
-                    st.success("資料新增成功")
-                except Exception as e:
-                    st.error(f"資料新增失敗: {e}")
-                finally:
+            if uploaded_file is not None:
+                rows = read_rows(uploaded_file, uploaded_file.name)
+            else:
+                rows = enumerate(records(edited_df8, IMPORT_COLUMNS), 1)
+            try:
+                report = import_no_application(rows, options, actual_current)
+            except (ImportFormatError, SpaceConflict) as e:
+                st.error(f'未新增：{e}')
+            else:
+                # 全部写入后只上传一次
+                if report.rows:
                     upload_db(local_db_path, db_file_id)
-                    st.rerun()
+                st.session_state['import_report'] = report
+                st.rerun()